@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'drf_spectacular',
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,14 +82,85 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+DATABASE_POOL_ENABLED=bool(int(os.environ.get('DATABASE_POOL_ENABLED', 0)))
+
 DATABASES ={
     'default':{
-        'ENGINE' : 'django.db.backends.postgresql',
+        'ENGINE' : 'core.db.backends.postgresql',
         'HOST' : os.environ.get('DATABASE_HOST'),
         'NAME' : os.environ.get('DATABASE_NAME'),
         'USER' : os.environ.get('DATABASE_USER'),
-        'PASSWORD' : os.environ.get('DATABASE_PASS')
+        'PASSWORD' : os.environ.get('DATABASE_PASS'),
+        # pooled connections go back to the pool at the end of each request
+        'CONN_MAX_AGE' : 0 if DATABASE_POOL_ENABLED else int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS' : True,
+        'POOL' : {
+            'ENABLED':DATABASE_POOL_ENABLED,
+            'MIN_SIZE':int(os.environ.get('DATABASE_POOL_MIN_SIZE', 0)),
+            'MAX_SIZE':int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+            'TIMEOUT':float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+        },
+    }
+}
+
+# comma separated hosts of streaming replicas of the default database
+DATABASE_REPLICA_HOSTS=list(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')))
+
+for number, host in enumerate(DATABASE_REPLICA_HOSTS, 1):
+    DATABASES[f'replica{number}']={
+        **DATABASES['default'],
+        'HOST':host,
+        # an unreachable replica fails its lag check fast instead of stalling the request
+        'OPTIONS':{
+            **DATABASES['default'].get('OPTIONS', {}),
+            'connect_timeout':int(os.environ.get('DATABASE_REPLICA_CONNECT_TIMEOUT', 2)),
+        },
+        'TEST':{'MIRROR':'default'},
     }
+
+DATABASE_ROUTERS=['core.db.routers.ReplicaRouter']
+
+READ_REPLICAS={
+    'ALIASES':[alias for alias in DATABASES if alias != 'default'],
+    # pins have to be seen by every worker, not just the one that took the write
+    'PIN_BACKEND':os.environ.get('READ_REPLICAS_PIN_BACKEND',
+                                 'django' if DATABASE_REPLICA_HOSTS else 'lru'),
+    'PIN_SECONDS':float(os.environ.get('READ_REPLICAS_PIN_SECONDS', 5)),
+    'MAX_LAG':float(os.environ.get('READ_REPLICAS_MAX_LAG', 2)),
+}
+
+
+# Password hashing
+# the preferred hasher comes first, the others only verify older passwords,
+# which are rehashed with the preferred one on login
+
+try:
+    import argon2
+    DEFAULT_PASSWORD_HASHER='argon2'
+except ImportError:
+    DEFAULT_PASSWORD_HASHER='scrypt'
+
+PASSWORD_HASHER_CLASSES={
+    'argon2':'user.hashers.TunedArgon2PasswordHasher',
+    'scrypt':'user.hashers.TunedScryptPasswordHasher',
+    'pbkdf2':'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+
+PASSWORD_HASHER=os.environ.get('PASSWORD_HASHER', DEFAULT_PASSWORD_HASHER)
+
+PASSWORD_HASHERS=[
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    *(path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+PASSWORD_HASHING={
+    'ARGON2_TIME_COST':int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST':int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456)),
+    'ARGON2_PARALLELISM':int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)),
+    'SCRYPT_WORK_FACTOR':int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'WORKERS':int(os.environ.get('PASSWORD_HASHING_WORKERS', 2)),
+    'QUEUE_SIZE':int(os.environ.get('PASSWORD_HASHING_QUEUE_SIZE', 32)),
 }
 
 
@@ -136,6 +209,15 @@ AUTH_USER_MODEL='core.User'
 
 REST_FRAMEWORK={
     'DEFAULT_SCHEMA_CLASS':'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES':[
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES':[
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 STATIC_URL='/static/static/'
@@ -144,6 +226,49 @@ MEDIA_URL='/static/media/'
 STATIC_ROOT='/vol/web/static'
 MEDIA_ROOT='/vol/web/media'
 
+AUTH_TOKENS={
+    'TTL':int(os.environ.get('AUTH_TOKEN_TTL', 7 * 24 * 3600)),
+    'MAX_AGE':int(os.environ.get('AUTH_TOKEN_MAX_AGE', 30 * 24 * 3600)),
+    'TOUCH_INTERVAL':int(os.environ.get('AUTH_TOKEN_TOUCH_INTERVAL', 3600)),
+}
+
+# a cache shared by every worker process, so revoked tokens and
+# deactivated users stop authenticating everywhere at once
+if os.environ.get('REDIS_URL'):
+    CACHES={
+        'default':{
+            'BACKEND':'django.core.cache.backends.redis.RedisCache',
+            'LOCATION':os.environ['REDIS_URL'],
+        }
+    }
+
+TOKEN_AUTH_CACHE={
+    'BACKEND':os.environ.get('TOKEN_AUTH_CACHE_BACKEND',
+                             'django' if os.environ.get('REDIS_URL') else 'lru'),
+    'TTL':int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 300)),
+}
+
+RESPONSE_CACHE={
+    'BACKEND':os.environ.get('RESPONSE_CACHE_BACKEND', 'lru'),
+    'MAX_SIZE':int(os.environ.get('RESPONSE_CACHE_MAX_SIZE', 1000)),
+    'MAX_BYTES':int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+}
+
+IMAGE_PIPELINE={
+    'EXECUTOR':os.environ.get('IMAGE_PIPELINE_EXECUTOR', 'thread'),
+    'WORKERS':int(os.environ.get('IMAGE_PIPELINE_WORKERS', 2)),
+    'FORMAT':'WEBP',
+}
+
+PERFORMANCE_METRICS={
+    'ENABLED':bool(int(os.environ.get('PERFORMANCE_METRICS_ENABLED', 0))),
+    'SERVER_TIMING':bool(int(os.environ.get('PERFORMANCE_SERVER_TIMING', 1))),
+}
+
+ASYNC_READS={
+    'ENABLED':bool(int(os.environ.get('ASYNC_READS_ENABLED', 0))),
+}
+
 SPECTACULAR_SETTINGS={
     'COMPONENT_SPLIT_REQUEST':True
 }
\ No newline at end of file
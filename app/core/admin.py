@@ -34,3 +34,8 @@ admin.site.register(models.User, UserModelAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Recipe)
 admin.site.register(models.Ingredient)
+admin.site.register(models.ImageJob)
+admin.site.register(models.RecipeImageDerivative)
+admin.site.register(models.ImageUpload)
+admin.site.register(models.Tombstone)
+admin.site.register(models.AuthToken)
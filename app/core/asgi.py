@@ -0,0 +1,72 @@
+"""asgi handler streaming sync iterators from a thread of their own"""
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+
+_END=object()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """asgi handler pulling the parts of streaming responses off the loop.
+
+    django 4.1 iterates streaming responses on the event loop, where the
+    orm refuses to run, so a response reading the database while it
+    streams, like the recipe export, fails once its headers went out.
+    every part is pulled on one dedicated thread instead, so a server side
+    cursor stays on the connection that opened it, and the connections of
+    that thread are closed when the stream ends.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        await send({
+            'type':'http.response.start',
+            'status':response.status_code,
+            'headers':self.get_response_headers(response),
+        })
+
+        loop=asyncio.get_running_loop()
+        executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream')
+        parts=iter(response)
+
+        try:
+            while True:
+                part=await loop.run_in_executor(executor, next, parts, _END)
+
+                if part is _END:
+                    break
+
+                for chunk, last in self.chunk_bytes(part):
+                    await send({'type':'http.response.body', 'body':chunk, 'more_body':True})
+
+            await send({'type':'http.response.body'})
+        finally:
+            await loop.run_in_executor(executor, _close_stream, response)
+            executor.shutdown(wait=False)
+
+    def get_response_headers(self, response):
+        """returns the headers and cookies of response as asgi expects them."""
+        headers=[]
+
+        for header, value in response.items():
+            if isinstance(header, str):
+                header=header.encode('ascii')
+            if isinstance(value, str):
+                value=value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+
+        for cookie in response.cookies.values():
+            headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+
+        return headers
+
+
+def _close_stream(response):
+    try:
+        response.close()
+    finally:
+        connections.close_all()
@@ -0,0 +1 @@
+"""load testing and benchmarks of the api endpoints, see `benchapi`"""
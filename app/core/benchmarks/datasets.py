@@ -0,0 +1,126 @@
+"""seeding of realistic benchmark users"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from core.models import AuthToken, Recipe, Tag, Ingredient
+from recipe.search import update_search_vectors
+from decimal import Decimal
+import random
+
+
+EMAIL_DOMAIN='api.local'
+PASSWORD='bench-password'
+BATCH_SIZE=5000
+
+
+class Dataset:
+    """a seeded benchmark user with their token and the ids of their rows."""
+
+    def __init__(self, user, token, recipe_ids, tag_ids, ingredient_ids):
+        self.user=user
+        self.token=token
+        self.recipe_ids=recipe_ids
+        self.tag_ids=tag_ids
+        self.ingredient_ids=ingredient_ids
+        self.password=PASSWORD
+
+    @property
+    def size(self):
+        return len(self.recipe_ids)
+
+
+def get_bench_email(name):
+    return f'bench-{name}@{EMAIL_DOMAIN}'
+
+
+def get_skewed_weights(count, skew):
+    """returns zipf like weights, the first names being the most used."""
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def seed_dataset(recipes, tags=50, ingredients=200, skew=1.1, seed=0, reseed=False):
+    """returns the benchmark user owning `recipes` recipes, creating it
+    unless one with as many recipes is already there.
+
+    a few tags and ingredients are on most recipes and the rest trail off,
+    the way names are spread over a real catalogue.
+    """
+    email=get_bench_email(recipes)
+    user=get_user_model().objects.filter(email=email).first()
+
+    if user is not None and (reseed or Recipe.objects.filter(user=user).count() != recipes):
+        delete_users([user.pk])
+        user=None
+
+    if user is None:
+        with transaction.atomic():
+            user=get_user_model().objects.create(email=email, password=PASSWORD,
+                                                 name=f'bench {recipes}')
+            _seed_rows(user, recipes, tags, ingredients, skew, random.Random(seed))
+
+    token, key=AuthToken.objects.create_token(user)
+
+    return Dataset(
+        user,
+        key,
+        list(Recipe.objects.filter(user=user).order_by('id').values_list('id', flat=True)),
+        list(Tag.objects.filter(user=user).order_by('id').values_list('id', flat=True)),
+        list(Ingredient.objects.filter(user=user).order_by('id').values_list('id', flat=True)),
+    )
+
+
+def _seed_rows(user, total, tag_count, ingredient_count, skew, rng):
+    """bulk inserts the recipes of user along with their skewed links."""
+    recipes=Recipe.objects.bulk_create(
+        (Recipe(user=user, title=f'recipe {i}', time_minute=rng.randint(5, 240),
+                price=Decimal(rng.randint(100, 99999)) / 100,
+                description=f'step by step recipe number {i}',
+                link=f'https://example.com/{i}')
+         for i in range(total)),
+        batch_size=BATCH_SIZE,
+    )
+    tags=Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag {i}') for i in range(tag_count))
+    ingredients=Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'ingredient {i}') for i in range(ingredient_count))
+
+    tag_weights=get_skewed_weights(tag_count, skew)
+    ingredient_weights=get_skewed_weights(ingredient_count, skew)
+
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+         for recipe in recipes
+         for tag in _sample(rng, tags, tag_weights, rng.randint(1, 4))),
+        batch_size=BATCH_SIZE,
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        (Recipe.ingredients.through(recipe_id=recipe.id, ingredient_id=ingredient.id)
+         for recipe in recipes
+         for ingredient in _sample(rng, ingredients, ingredient_weights, rng.randint(3, 8))),
+        batch_size=BATCH_SIZE,
+    )
+
+    # bulk inserts send no signals, so the search documents are built here
+    ids=[recipe.id for recipe in recipes]
+    for start in range(0, len(ids), BATCH_SIZE):
+        update_search_vectors(ids[start:start + BATCH_SIZE])
+
+
+def _sample(rng, population, weights, count):
+    """returns up to count distinct items drawn by weight."""
+    return {item.id:item for item in rng.choices(population, weights, k=count)}.values()
+
+
+def delete_users(user_ids):
+    """deletes benchmark users along with their recipes."""
+    Recipe.objects.filter(user_id__in=user_ids).delete()
+    get_user_model().objects.filter(pk__in=user_ids).delete()
+
+
+def delete_bench_users():
+    """deletes every benchmark user, including those the scenarios signed up."""
+    user_ids=list(get_user_model().objects
+                  .filter(email__startswith='bench-', email__endswith=f'@{EMAIL_DOMAIN}')
+                  .values_list('pk', flat=True))
+    delete_users(user_ids)
+
+    return len(user_ids)
@@ -0,0 +1,145 @@
+"""in process load generator driving the api through the test client"""
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
+import time
+import tracemalloc
+
+
+def percentile(values, fraction):
+    """returns the nearest rank percentile of values, fraction in [0, 1]."""
+    if not values:
+        return None
+
+    ordered=sorted(values)
+    rank=max(1, math.ceil(fraction * len(ordered)))
+
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    """returns the count, mean, p50, p90, p99 and max of values."""
+    if not values:
+        return {'count':0}
+
+    return {
+        'count':len(values),
+        'mean':sum(values) / len(values),
+        'p50':percentile(values, 0.5),
+        'p90':percentile(values, 0.9),
+        'p99':percentile(values, 0.99),
+        'max':max(values),
+    }
+
+
+def get_client(dataset):
+    """returns an api client authenticated as the benchmark user."""
+    client=APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+
+    return client
+
+
+def read_body(response):
+    """returns the whole body of a response, draining streamed ones."""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+
+    return response.content
+
+
+def run_load(scenario, dataset, requests, concurrency):
+    """sends the requests of scenario from `concurrency` threads at once.
+
+    every thread has its own client and database connection. returns the
+    latency, status and body size of each request with the wall time.
+    """
+    count=scenario.get_request_count(requests)
+    items=scenario.prepare(dataset, count)
+    indexes=iter(range(count))
+    lock=threading.Lock()
+
+    def worker():
+        client=get_client(dataset)
+        samples=[]
+
+        try:
+            while True:
+                with lock:
+                    index=next(indexes, None)
+
+                if index is None:
+                    return samples
+
+                start=time.perf_counter()
+                response=scenario.send(client, dataset, items[index], index)
+                body=read_body(response)
+                samples.append(((time.perf_counter() - start) * 1000,
+                                response.status_code, len(body)))
+        finally:
+            connections.close_all()
+
+    start=time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as pool:
+        futures=[pool.submit(worker) for _ in range(concurrency)]
+        samples=[sample for future in futures for sample in future.result()]
+
+    return samples, time.perf_counter() - start
+
+
+def run_profile(scenario, dataset, requests):
+    """sends the requests of scenario one by one from this thread and
+    records the queries and peak allocations of each.
+
+    tracing allocations slows requests down, so their latency is left to
+    `run_load`.
+    """
+    count=scenario.get_request_count(requests)
+    items=scenario.prepare(dataset, count)
+    client=get_client(dataset)
+    samples=[]
+
+    for index in range(count):
+        tracemalloc.start()
+
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                read_body(scenario.send(client, dataset, items[index], index))
+
+            current, peak=tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        query_ms=sum(float(query['time']) for query in queries.captured_queries) * 1000
+        samples.append((len(queries), query_ms, peak))
+
+    return samples
+
+
+def run_scenario(scenario, dataset, requests, concurrency, profile_requests):
+    """returns the measurements of scenario against dataset."""
+    load, elapsed=run_load(scenario, dataset, requests, concurrency)
+    profile=run_profile(scenario, dataset, profile_requests)
+
+    latencies=[latency for latency, status, size in load]
+    statuses={}
+    for latency, status, size in load:
+        statuses[str(status)]=statuses.get(str(status), 0) + 1
+
+    return {
+        'route':scenario.url_name,
+        'requests':len(load),
+        'concurrency':concurrency,
+        'errors':sum(1 for latency, status, size in load if status >= 400),
+        'statuses':statuses,
+        'throughput_rps':len(load) / elapsed if elapsed else None,
+        'latency_ms':summarize(latencies),
+        'response_bytes':summarize([size for latency, status, size in load]),
+        'queries':summarize([queries for queries, query_ms, peak in profile]),
+        'query_ms':summarize([query_ms for queries, query_ms, peak in profile]),
+        'allocated_bytes':summarize([peak for queries, query_ms, peak in profile]),
+    }
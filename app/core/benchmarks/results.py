@@ -0,0 +1,90 @@
+"""benchmark result files and their comparison between commits"""
+from django.conf import settings
+import django
+import json
+import os
+import platform
+import subprocess
+
+
+COMPARED_METRICS=[
+    ('latency_ms', 'p50'),
+    ('latency_ms', 'p99'),
+    ('queries', 'p50'),
+    ('query_ms', 'p50'),
+    ('allocated_bytes', 'p50'),
+]
+
+
+def get_git_commit():
+    """returns the commit the tree is checked out at, if it is a git tree."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_meta(options):
+    """returns where and how a benchmark was run."""
+    return {
+        'commit':get_git_commit(),
+        'python':platform.python_version(),
+        'django':django.get_version(),
+        'machine':platform.machine(),
+        'cpus':os.cpu_count(),
+        'options':options,
+    }
+
+
+def write_results(path, results):
+    directory=os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """returns the change of every compared metric between two result files.
+
+    a metric regressed when it grew by more than `threshold`, relative to
+    the baseline. scenarios missing from either file are skipped.
+    """
+    rows=[]
+
+    for dataset, scenarios in current['datasets'].items():
+        for name, result in scenarios.items():
+            before_result=baseline['datasets'].get(dataset, {}).get(name)
+
+            if before_result is None:
+                continue
+
+            for metric, stat in COMPARED_METRICS:
+                before=before_result.get(metric, {}).get(stat)
+                after=result.get(metric, {}).get(stat)
+
+                if before is None or after is None:
+                    continue
+
+                change=(after - before) / before if before else (1.0 if after else 0.0)
+                rows.append({
+                    'dataset':dataset,
+                    'scenario':name,
+                    'metric':f'{metric}.{stat}',
+                    'before':before,
+                    'after':after,
+                    'change':change,
+                    'regressed':change > threshold,
+                })
+
+    return rows
@@ -0,0 +1,279 @@
+"""request scenarios covering every route of the recipe and user apps"""
+from django.urls import reverse
+from core.models import AuthToken, Recipe, Tag, Ingredient
+from rest_framework.test import APIClient
+from recipe.uploads import start_upload, append_chunk
+from .datasets import get_bench_email
+from decimal import Decimal
+from PIL import Image
+import io
+import uuid
+
+
+class Scenario:
+    """a request pattern against one named route.
+
+    `send` issues a single request with the client of a benchmark user.
+    `prepare` creates, before the clock starts, whatever each request
+    consumes, like the recipe a delete request removes.
+    """
+
+    def __init__(self, name, url_name, send, prepare=None, max_requests=None):
+        self.name=name
+        self.url_name=url_name
+        self.send=send
+        self.prepare=prepare or (lambda dataset, count: [None] * count)
+        self.max_requests=max_requests
+
+    def get_request_count(self, requests):
+        if self.max_requests is None:
+            return requests
+        return min(requests, self.max_requests)
+
+
+SCENARIOS={}
+
+
+def scenario(name, url_name, prepare=None, max_requests=None):
+    """registers the decorated function as the sender of a scenario."""
+    def register(send):
+        SCENARIOS[name]=Scenario(name, url_name, send, prepare, max_requests)
+        return send
+
+    return register
+
+
+def get_scenarios(names=None):
+    """returns the scenarios with the given names, all of them by default."""
+    if not names:
+        return list(SCENARIOS.values())
+
+    unknown=set(names) - set(SCENARIOS)
+    if unknown:
+        raise KeyError(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    return [SCENARIOS[name] for name in names]
+
+
+def get_image_bytes(size=64):
+    """returns a small png image to upload."""
+    buffer=io.BytesIO()
+    Image.new('RGB', (size, size), (200, 120, 40)).save(buffer, format='PNG')
+
+    return buffer.getvalue()
+
+
+def _pick(ids, index):
+    return ids[index % len(ids)]
+
+
+def _create_recipes(dataset, count):
+    recipes=Recipe.objects.bulk_create(
+        Recipe(user=dataset.user, title=f'disposable {i}', time_minute=10,
+               price=Decimal('5.00')) for i in range(count))
+
+    return [recipe.id for recipe in recipes]
+
+
+def _create_names(model):
+    def prepare(dataset, count):
+        objects=model.objects.bulk_create(
+            model(user=dataset.user, name=f'disposable {uuid.uuid4().hex}')
+            for i in range(count))
+
+        return [obj.id for obj in objects]
+
+    return prepare
+
+
+def _start_uploads(complete):
+    def prepare(dataset, count):
+        content=get_image_bytes()
+        uploads=[]
+
+        for index in range(count):
+            recipe=Recipe.objects.get(pk=_pick(dataset.recipe_ids, index))
+            upload=start_upload(recipe, len(content))
+
+            if complete:
+                upload=append_chunk(upload, 0, io.BytesIO(content), len(content))
+
+            uploads.append((recipe.id, upload.id, content))
+
+        return uploads
+
+    return prepare
+
+
+@scenario('api-root', 'recipe:api-root')
+def api_root(client, dataset, item, index):
+    return client.get(reverse('recipe:api-root'))
+
+
+@scenario('recipe-list', 'recipe:recipe-list')
+def recipe_list(client, dataset, item, index):
+    return client.get(reverse('recipe:recipe-list'))
+
+
+@scenario('recipe-list-filtered', 'recipe:recipe-list')
+def recipe_list_filtered(client, dataset, item, index):
+    tags=','.join(str(tag_id) for tag_id in dataset.tag_ids[:2])
+
+    return client.get(reverse('recipe:recipe-list'),
+                      {'tags':tags, 'price_max':'50', 'ordering':'price'})
+
+
+@scenario('recipe-search', 'recipe:recipe-list')
+def recipe_search(client, dataset, item, index):
+    return client.get(reverse('recipe:recipe-list'), {'search':f'recipe {index}'})
+
+
+@scenario('recipe-create', 'recipe:recipe-list')
+def recipe_create(client, dataset, item, index):
+    return client.post(reverse('recipe:recipe-list'), {
+        'title':f'created {index}',
+        'time_minute':15,
+        'price':'7.50',
+        'tags':[{'name':'tag 0'}, {'name':'tag 1'}],
+        'ingredients':[{'name':'ingredient 0'}],
+    }, format='json')
+
+
+@scenario('recipe-detail', 'recipe:recipe-detail')
+def recipe_detail(client, dataset, item, index):
+    return client.get(reverse('recipe:recipe-detail', args=[_pick(dataset.recipe_ids, index)]))
+
+
+@scenario('recipe-update', 'recipe:recipe-detail')
+def recipe_update(client, dataset, item, index):
+    url=reverse('recipe:recipe-detail', args=[_pick(dataset.recipe_ids, index)])
+
+    return client.patch(url, {'title':f'updated {index}'}, format='json')
+
+
+@scenario('recipe-delete', 'recipe:recipe-detail', prepare=_create_recipes)
+def recipe_delete(client, dataset, item, index):
+    return client.delete(reverse('recipe:recipe-detail', args=[item]))
+
+
+@scenario('recipe-batch', 'recipe:recipe-batch')
+def recipe_batch(client, dataset, item, index):
+    ids=[_pick(dataset.recipe_ids, index * 50 + offset) for offset in range(50)]
+    items=[{'id':recipe_id, 'title':f'batched {index}'} for recipe_id in dict.fromkeys(ids)]
+
+    return client.post(reverse('recipe:recipe-batch'), items, format='json')
+
+
+@scenario('recipe-export', 'recipe:recipe-export', max_requests=10)
+def recipe_export(client, dataset, item, index):
+    return client.get(reverse('recipe:recipe-export'))
+
+
+@scenario('recipe-upload-image', 'recipe:recipe-upload-image', max_requests=50)
+def recipe_upload_image(client, dataset, item, index):
+    url=reverse('recipe:recipe-upload-image', args=[_pick(dataset.recipe_ids, index)])
+    image=io.BytesIO(get_image_bytes())
+    image.name='bench.png'
+
+    return client.post(url, {'image':image}, format='multipart')
+
+
+@scenario('recipe-image-upload', 'recipe:recipe-image-upload')
+def recipe_image_upload(client, dataset, item, index):
+    url=reverse('recipe:recipe-image-upload', args=[_pick(dataset.recipe_ids, index)])
+
+    return client.post(url, {'size':4096}, format='json')
+
+
+@scenario('recipe-image-upload-chunk', 'recipe:recipe-image-upload-chunk',
+          prepare=_start_uploads(complete=False), max_requests=50)
+def recipe_image_upload_chunk(client, dataset, item, index):
+    recipe_id, upload_id, content=item
+    url=reverse('recipe:recipe-image-upload-chunk', args=[recipe_id, upload_id])
+
+    return client.generic('PUT', url, content, content_type='application/octet-stream',
+                          HTTP_UPLOAD_OFFSET='0')
+
+
+@scenario('recipe-image-upload-finalize', 'recipe:recipe-image-upload-finalize',
+          prepare=_start_uploads(complete=True), max_requests=50)
+def recipe_image_upload_finalize(client, dataset, item, index):
+    recipe_id, upload_id, content=item
+
+    return client.post(reverse('recipe:recipe-image-upload-finalize',
+                               args=[recipe_id, upload_id]))
+
+
+@scenario('sync', 'recipe:sync')
+def sync(client, dataset, item, index):
+    return client.get(reverse('recipe:sync'))
+
+
+def _name_scenarios(prefix, model):
+    """registers the list, autocomplete, update and delete scenarios of the
+    tag or ingredient routes."""
+
+    @scenario(f'{prefix}-list', f'recipe:{prefix}-list')
+    def names_list(client, dataset, item, index):
+        return client.get(reverse(f'recipe:{prefix}-list'))
+
+    @scenario(f'{prefix}-list-assigned', f'recipe:{prefix}-list')
+    def names_list_assigned(client, dataset, item, index):
+        return client.get(reverse(f'recipe:{prefix}-list'), {'assigned_only':1})
+
+    @scenario(f'{prefix}-autocomplete', f'recipe:{prefix}-autocomplete')
+    def names_autocomplete(client, dataset, item, index):
+        return client.get(reverse(f'recipe:{prefix}-autocomplete'), {'q':f'{prefix} {index % 10}'})
+
+    @scenario(f'{prefix}-update', f'recipe:{prefix}-detail', prepare=_create_names(model))
+    def names_update(client, dataset, item, index):
+        return client.patch(reverse(f'recipe:{prefix}-detail', args=[item]),
+                            {'name':f'renamed {uuid.uuid4().hex}'}, format='json')
+
+    @scenario(f'{prefix}-delete', f'recipe:{prefix}-detail', prepare=_create_names(model))
+    def names_delete(client, dataset, item, index):
+        return client.delete(reverse(f'recipe:{prefix}-detail', args=[item]))
+
+
+_name_scenarios('tag', Tag)
+_name_scenarios('ingredient', Ingredient)
+
+
+@scenario('user-create', 'user:create')
+def user_create(client, dataset, item, index):
+    return client.post(reverse('user:create'), {
+        'email':get_bench_email(f'signup-{uuid.uuid4().hex}'),
+        'password':dataset.password,
+        'name':'signup',
+    }, format='json')
+
+
+@scenario('user-token', 'user:token')
+def user_token(client, dataset, item, index):
+    return client.post(reverse('user:token'), {
+        'email':dataset.user.email,
+        'password':dataset.password,
+    }, format='json')
+
+
+def _create_tokens(dataset, count):
+    return [AuthToken.objects.create_token(dataset.user)[1] for _ in range(count)]
+
+
+@scenario('user-token-rotate', 'user:token-rotate', prepare=_create_tokens)
+def user_token_rotate(client, dataset, item, index):
+    # every rotation revokes its token, so each request brings its own
+    client=APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {item}')
+
+    return client.post(reverse('user:token-rotate'))
+
+
+@scenario('user-myaccount', 'user:myaccount')
+def user_myaccount(client, dataset, item, index):
+    return client.get(reverse('user:myaccount'))
+
+
+@scenario('user-myaccount-update', 'user:myaccount')
+def user_myaccount_update(client, dataset, item, index):
+    return client.patch(reverse('user:myaccount'), {'name':f'bench {index}'}, format='json')
@@ -0,0 +1,108 @@
+"""raw http load against a running server, with deliberately slow clients"""
+from .loadgen import summarize
+import asyncio
+import time
+
+
+def build_request(host, port, path, token):
+    return (f'GET {path} HTTP/1.1\r\n'
+            f'Host: {host}:{port}\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'Accept: application/json\r\n'
+            f'Connection: close\r\n\r\n').encode()
+
+
+def get_status(response):
+    """returns the status code of a raw http response, 0 when it has none."""
+    try:
+        return int(response.split(b' ', 2)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+async def send_request(host, port, request, timeout):
+    """sends request in one go and reads the whole response.
+
+    returns its latency in milliseconds and status, 0 on a timeout or a
+    dropped connection.
+    """
+    start=time.perf_counter()
+
+    try:
+        reader, writer=await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return (time.perf_counter() - start) * 1000, 0
+
+    try:
+        writer.write(request)
+        await writer.drain()
+        response=await asyncio.wait_for(reader.read(), timeout - (time.perf_counter() - start))
+        status=get_status(response)
+    except (OSError, ValueError, asyncio.TimeoutError):
+        status=0
+    finally:
+        writer.close()
+
+    return (time.perf_counter() - start) * 1000, status
+
+
+async def slow_client(host, port, request, delay, chunk_size, stop):
+    """keeps sending request a few bytes at a time and reading the response
+    just as slowly, until stop is set, like a client on a poor network."""
+    while not stop.is_set():
+        try:
+            reader, writer=await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(delay)
+            continue
+
+        try:
+            for start in range(0, len(request), chunk_size):
+                writer.write(request[start:start + chunk_size])
+                await writer.drain()
+                await asyncio.sleep(delay)
+
+            while not stop.is_set() and await reader.read(chunk_size):
+                await asyncio.sleep(delay)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+
+async def run_slow_client_load(host, port, path, token, requests, concurrency,
+                               slow_clients, delay=0.1, chunk_size=16, timeout=10):
+    """measures `requests` fast requests sent `concurrency` at a time while
+    `slow_clients` slow clients keep connections busy."""
+    request=build_request(host, port, path, token)
+    stop=asyncio.Event()
+    slow=[asyncio.create_task(slow_client(host, port, request, delay, chunk_size, stop))
+          for _ in range(slow_clients)]
+
+    # let the slow clients take their connections first
+    await asyncio.sleep(delay * 5 if slow_clients else 0)
+
+    remaining=iter(range(requests))
+    samples=[]
+
+    async def fast_client():
+        for _ in remaining:
+            samples.append(await send_request(host, port, request, timeout))
+
+    start=time.perf_counter()
+    await asyncio.gather(*(fast_client() for _ in range(concurrency)))
+    elapsed=time.perf_counter() - start
+
+    stop.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    return {
+        'slow_clients':slow_clients,
+        'requests':len(samples),
+        'concurrency':concurrency,
+        'errors':sum(1 for latency, status in samples if not 200 <= status < 400),
+        'throughput_rps':len(samples) / elapsed if elapsed else None,
+        'latency_ms':summarize([latency for latency, status in samples]),
+    }
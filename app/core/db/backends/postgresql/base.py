@@ -0,0 +1,52 @@
+"""postgresql backend checking connections out of an in process pool"""
+from django.db.backends.postgresql import base, creation
+from core.db.pool import close_pools, get_pool, get_pool_settings
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would keep the test database from being dropped
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """postgresql wrapper taking its connections from a pool shared by the
+    threads of the process when POOL is enabled for the database.
+
+    closing the wrapper hands the connection back instead, rolled back if
+    it was left in a transaction. set CONN_MAX_AGE to 0 with a pool, so
+    connections go back at the end of every request.
+    """
+
+    creation_class=DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool=None
+
+    def get_new_connection(self, conn_params):
+        options=get_pool_settings(self.settings_dict)
+
+        if not options['ENABLED']:
+            return super().get_new_connection(conn_params)
+
+        pool=get_pool(self.alias, conn_params, options,
+                      lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        connection=pool.getconn()
+
+        self.isolation_level=self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        self._pool=pool
+
+        return connection
+
+    def _close(self):
+        pool, self._pool=self._pool, None
+
+        if pool is None or self.connection is None:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
@@ -0,0 +1,283 @@
+"""in process pool of database connections shared by worker threads"""
+from core.metrics import format_labels, metrics_registry
+from collections import deque
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+import psycopg2
+import threading
+import time
+
+
+DEFAULT_POOL={
+    'ENABLED':False,
+    'MIN_SIZE':0,
+    'MAX_SIZE':10,
+    'TIMEOUT':10,
+    'MAX_IDLE':300,
+    'MAX_LIFETIME':3600,
+    'CHECK_AFTER':30,
+}
+
+
+def get_pool_settings(settings_dict):
+    """returns the POOL entry of a database merged over the defaults."""
+    return {**DEFAULT_POOL, **settings_dict.get('POOL', {})}
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """raised when no connection is handed back to a full pool in time."""
+
+
+class PoolStats:
+    """counters of a pool, updated under its lock."""
+
+    def __init__(self):
+        self.checkouts=0
+        self.waits=0
+        self.wait_time=0.0
+        self.timeouts=0
+        self.created=0
+        self.discarded=0
+
+
+class ConnectionPool:
+    """bounded pool of open connections.
+
+    a thread checking out a connection gets the most recently returned
+    idle one, opens a new one while the pool is below `max_size`, or waits
+    up to `timeout` seconds for one to be returned. a connection idle for
+    more than `check_after` seconds is checked with a query before it is
+    handed out. connections open for more than `max_lifetime`, or idle for
+    more than `max_idle` while more than `min_size` are open, are closed.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=10, max_idle=300,
+                 max_lifetime=3600, check_after=30):
+        self.connect=connect
+        self.min_size=min_size
+        self.max_size=max_size
+        self.timeout=timeout
+        self.max_idle=max_idle
+        self.max_lifetime=max_lifetime
+        self.check_after=check_after
+
+        self.stats=PoolStats()
+        self._size=0
+        self._idle=deque()
+        self._opened_at={}
+        self._condition=threading.Condition()
+
+    @property
+    def size(self):
+        """number of open connections, idle or checked out."""
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def in_use(self):
+        return self._size - len(self._idle)
+
+    def getconn(self):
+        start=time.monotonic()
+
+        while True:
+            conn, idle_since=self._take(start)
+
+            if conn is None:
+                return self._open()
+
+            if self._is_usable(conn, idle_since):
+                return conn
+
+            self._discard(conn)
+
+    def putconn(self, conn):
+        """takes a connection back, rolling back what it left open."""
+        if conn.closed or self._is_expired(conn) or not self._reset(conn):
+            self._discard(conn)
+            return
+
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        """closes the idle connections, checked out ones close when returned."""
+        with self._condition:
+            idle=[conn for conn, idle_since in self._idle]
+            self._idle.clear()
+
+        for conn in idle:
+            self._discard(conn)
+
+    def _take(self, start):
+        """returns the latest idle connection with the time it was returned,
+        or (None, None) once room for a new connection is reserved."""
+        deadline=start + self.timeout
+        waited=False
+
+        with self._condition:
+            try:
+                while True:
+                    if self._idle:
+                        self.stats.checkouts+=1
+                        return self._idle.pop()
+
+                    if self._size < self.max_size:
+                        self.stats.checkouts+=1
+                        self._size+=1
+                        return None, None
+
+                    remaining=deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        self.stats.timeouts+=1
+                        raise PoolTimeout(
+                            f'no database connection was free within {self.timeout} seconds')
+
+                    waited=True
+                    self._condition.wait(remaining)
+            finally:
+                if waited:
+                    self.stats.waits+=1
+                    self.stats.wait_time+=time.monotonic() - start
+
+    def _open(self):
+        try:
+            conn=self.connect()
+        except BaseException:
+            with self._condition:
+                self._size-=1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._opened_at[id(conn)]=time.monotonic()
+            self.stats.created+=1
+
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+        with self._condition:
+            self._opened_at.pop(id(conn), None)
+            self._size-=1
+            self.stats.discarded+=1
+            self._condition.notify()
+
+    def _is_expired(self, conn):
+        opened_at=self._opened_at.get(id(conn))
+
+        return opened_at is None or time.monotonic() - opened_at > self.max_lifetime
+
+    def _is_usable(self, conn, idle_since):
+        idle_for=time.monotonic() - idle_since
+
+        if conn.closed or self._is_expired(conn):
+            return False
+
+        if idle_for > self.max_idle and self._size > self.min_size:
+            return False
+
+        if idle_for <= self.check_after:
+            return True
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return self._reset(conn)
+        except psycopg2.Error:
+            return False
+
+    def _reset(self, conn):
+        status=conn.info.transaction_status
+
+        if status == TRANSACTION_STATUS_IDLE:
+            return True
+
+        if status == TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+
+        return True
+
+
+_pools={}
+_pools_lock=threading.Lock()
+
+
+def get_pool(alias, conn_params, options, connect):
+    """returns the pool of the database alias for these connection params,
+    creating it on first use."""
+    key=(alias, tuple(sorted((name, repr(value)) for name, value in conn_params.items())))
+
+    with _pools_lock:
+        pool=_pools.get(key)
+
+        if pool is None:
+            pool=_pools[key]=ConnectionPool(
+                connect,
+                min_size=options['MIN_SIZE'],
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'],
+                max_lifetime=options['MAX_LIFETIME'],
+                check_after=options['CHECK_AFTER'],
+            )
+
+    return pool
+
+
+def close_pools():
+    """closes the idle connections of every pool and forgets the pools."""
+    with _pools_lock:
+        pools=list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
+
+
+def collect_pool_metrics(prefix):
+    """returns the exposition lines of every pool."""
+    with _pools_lock:
+        pools=[(alias, pool) for (alias, params), pool in _pools.items()]
+
+    metrics=[
+        ('db_pool_size', 'gauge', 'Open pooled connections.', lambda pool: pool.size),
+        ('db_pool_idle', 'gauge', 'Idle pooled connections.', lambda pool: pool.idle),
+        ('db_pool_max_size', 'gauge', 'Pool size limit.', lambda pool: pool.max_size),
+        ('db_pool_checkouts_total', 'counter', 'Connections checked out.',
+         lambda pool: pool.stats.checkouts),
+        ('db_pool_waits_total', 'counter', 'Checkouts that waited for a free connection.',
+         lambda pool: pool.stats.waits),
+        ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection.',
+         lambda pool: pool.stats.wait_time),
+        ('db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting.',
+         lambda pool: pool.stats.timeouts),
+        ('db_pool_created_total', 'counter', 'Connections opened.',
+         lambda pool: pool.stats.created),
+        ('db_pool_discarded_total', 'counter', 'Connections closed as broken or stale.',
+         lambda pool: pool.stats.discarded),
+    ]
+    lines=[]
+
+    for name, kind, description, value in metrics:
+        lines+=[f'# HELP {prefix}_{name} {description}', f'# TYPE {prefix}_{name} {kind}']
+        lines+=[f'{prefix}_{name}{format_labels(database=alias)} {value(pool)}'
+                for alias, pool in pools]
+
+    return lines
+
+
+metrics_registry.add_collector(collect_pool_metrics)
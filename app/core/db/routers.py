@@ -0,0 +1,226 @@
+"""routing of safe api reads to read replicas"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+from contextvars import ContextVar
+from core.metrics import format_labels, metrics_registry
+from user.authentication import LRUTokenCache, DjangoTokenCache
+import random
+import threading
+import time
+
+
+DEFAULT_READ_REPLICAS={
+    'ALIASES':[],
+    'PIN_BACKEND':'lru',
+    'PIN_SECONDS':5,
+    'MAX_LAG':2,
+    'LAG_CHECK_INTERVAL':1,
+}
+
+# replay lag of a standby, 0 once it replayed everything it received
+LAG_QUERY=('SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()'
+           ' THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)')
+
+
+def get_replica_settings():
+    """returns READ_REPLICAS merged over the defaults."""
+    return {**DEFAULT_READ_REPLICAS, **getattr(settings, 'READ_REPLICAS', {})}
+
+
+_read_database=ContextVar('read_database', default=None)
+
+
+def get_read_database():
+    """returns the alias reads are routed to, None for the primary."""
+    return _read_database.get()
+
+
+class LRUPinCache(LRUTokenCache):
+    """in process store of the users pinned to the primary."""
+
+
+class DjangoPinCache(DjangoTokenCache):
+    """store of the users pinned to the primary kept in a django cache,
+    shared by every process using it."""
+
+    key_prefix='primary-pin:'
+
+
+PIN_BACKENDS={
+    'lru':LRUPinCache,
+    'django':DjangoPinCache,
+}
+
+_pin_cache=None
+
+
+def get_pin_cache():
+    """returns the pin store configured in READ_REPLICAS."""
+    global _pin_cache
+
+    if _pin_cache is None:
+        options=get_replica_settings()
+        _pin_cache=PIN_BACKENDS[options['PIN_BACKEND']](ttl=options['PIN_SECONDS'])
+
+    return _pin_cache
+
+
+def reset_pin_cache():
+    """drops the pin store, it is rebuilt from settings on next use."""
+    global _pin_cache
+
+    _pin_cache=None
+
+
+def pin_to_primary(user_ids):
+    """makes the reads of users go to the primary for PIN_SECONDS once the
+    current transaction commits, so they read their own writes."""
+    if not get_replica_settings()['ALIASES']:
+        return
+
+    def pin():
+        cache=get_pin_cache()
+
+        for user_id in user_ids:
+            cache.set(str(user_id), True)
+
+    transaction.on_commit(pin)
+
+
+def is_pinned(user_id):
+    return bool(get_pin_cache().get(str(user_id)))
+
+
+class ReplicaLagMonitor:
+    """replay lag of each replica, measured at most once per interval.
+
+    a replica that cannot be queried counts as infinitely behind until the
+    next measurement.
+    """
+
+    def __init__(self):
+        self._lock=threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.lags={}
+        self._checked={}
+
+    def get_lag(self, alias, interval):
+        now=time.monotonic()
+
+        with self._lock:
+            if now - self._checked.get(alias, float('-inf')) < interval:
+                return self.lags[alias]
+
+            # other threads keep using the last value while this one measures
+            self._checked[alias]=now
+            self.lags.setdefault(alias, 0.0)
+
+        lag=self._measure(alias)
+
+        with self._lock:
+            self.lags[alias]=lag
+
+        return lag
+
+    def _measure(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_QUERY)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            connections[alias].close()
+            return float('inf')
+
+
+replica_lag_monitor=ReplicaLagMonitor()
+
+
+def choose_read_database(request):
+    """returns a replica fresh enough to answer a safe request, None when it
+    has to be read from the primary."""
+    options=get_replica_settings()
+
+    if not options['ALIASES'] or request.method not in SAFE_METHODS:
+        return None
+
+    user=getattr(request, 'user', None)
+
+    if user is not None and user.is_authenticated and is_pinned(user.pk):
+        return None
+
+    replicas=[alias for alias in options['ALIASES']
+              if replica_lag_monitor.get_lag(alias, options['LAG_CHECK_INTERVAL'])
+              <= options['MAX_LAG']]
+
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    """sends the reads of views using `ReplicaReadMixin` to the replica
+    chosen for their request, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases={DEFAULT_DB_ALIAS, *get_replica_settings()['ALIASES']}
+
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """reads safe requests of the view from a replica once the user is
+    authenticated, unless the user wrote recently or every replica lags.
+
+    actions named in `primary_actions` always read from the primary, for
+    reads a client acts on right away, like the offset of an upload.
+    """
+
+    primary_actions=()
+
+    def dispatch(self, request, *args, **kwargs):
+        self._read_database_token=_read_database.set(None)
+
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_database.reset(self._read_database_token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        # views entered without dispatch, like async list polls, keep to the primary
+        if (hasattr(self, '_read_database_token')
+                and getattr(self, 'action', None) not in self.primary_actions):
+            _read_database.set(choose_read_database(request))
+
+
+def collect_replica_metrics(prefix):
+    """returns the exposition lines of the last measured replica lags."""
+    with replica_lag_monitor._lock:
+        lags=sorted(replica_lag_monitor.lags.items())
+
+    lines=[
+        f'# HELP {prefix}_db_replica_lag_seconds Last measured replay lag of each replica.',
+        f'# TYPE {prefix}_db_replica_lag_seconds gauge',
+    ]
+    lines+=[f'{prefix}_db_replica_lag_seconds{format_labels(database=alias)} {lag}'
+            for alias, lag in lags]
+
+    return lines
+
+
+metrics_registry.add_collector(collect_replica_metrics)
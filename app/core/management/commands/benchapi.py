@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks.datasets import seed_dataset, delete_bench_users
+from core.benchmarks.loadgen import run_scenario
+from core.benchmarks.results import (get_meta, write_results, load_results,
+                                     compare_results)
+from core.benchmarks.scenarios import get_scenarios
+from datetime import datetime, timezone
+
+
+class Command(BaseCommand):
+    """load tests every api route against users of growing catalogue sizes.
+
+    the benchmark users are committed so the load threads can see them,
+    and are reused by later runs until --reseed or --cleanup. results are
+    written as json, and compared against --baseline when one is given.
+    """
+
+    help='measure latency, queries and allocations of every api route.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,1000,100000',
+                            help='comma separated recipe counts, one user each.')
+        parser.add_argument('--scenarios', default='',
+                            help='comma separated scenario names, all by default.')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--profile-requests', type=int, default=20)
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--reseed', action='store_true')
+        parser.add_argument('--output', default='')
+        parser.add_argument('--baseline', default='')
+        parser.add_argument('--threshold', type=float, default=0.1)
+        parser.add_argument('--cleanup', action='store_true',
+                            help='delete the benchmark users and exit.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.stdout.write(f'deleted {delete_bench_users()} benchmark users.')
+            return
+
+        try:
+            sizes=[int(size) for size in options['sizes'].split(',')]
+            scenarios=get_scenarios([name for name in options['scenarios'].split(',') if name])
+        except (ValueError, KeyError) as exc:
+            raise CommandError(exc)
+
+        results={
+            'meta':get_meta({key:options[key] for key in (
+                'sizes', 'scenarios', 'requests', 'concurrency',
+                'profile_requests', 'skew', 'seed')}),
+            'created':datetime.now(timezone.utc).isoformat(),
+            'datasets':{},
+        }
+
+        self.stdout.write(f'{"recipes":>8} {"scenario":<30} {"p50 ms":>9} {"p99 ms":>9}'
+                          f' {"rps":>8} {"queries":>8} {"alloc kb":>9} {"errors":>7}')
+
+        for size in sizes:
+            dataset=seed_dataset(size, skew=options['skew'], seed=options['seed'],
+                                 reseed=options['reseed'])
+            runs=results['datasets'][str(size)]={}
+
+            for scenario in scenarios:
+                result=runs[scenario.name]=run_scenario(
+                    scenario, dataset, options['requests'], options['concurrency'],
+                    options['profile_requests'])
+
+                self.stdout.write(
+                    f'{size:>8} {scenario.name:<30}'
+                    f' {result["latency_ms"]["p50"]:>9.2f} {result["latency_ms"]["p99"]:>9.2f}'
+                    f' {result["throughput_rps"]:>8.1f} {result["queries"]["p50"]:>8}'
+                    f' {result["allocated_bytes"]["p50"] / 1024:>9.1f} {result["errors"]:>7}')
+
+        output=options['output'] or f'bench-results/{results["meta"]["commit"] or "results"}.json'
+        write_results(output, results)
+        self.stdout.write(f'results written to {output}')
+
+        if options['baseline']:
+            self._compare(load_results(options['baseline']), results, options['threshold'])
+
+    def _compare(self, baseline, results, threshold):
+        rows=compare_results(baseline, results, threshold)
+        regressions=[row for row in rows if row['regressed']]
+
+        self.stdout.write(f'compared against {baseline["meta"].get("commit")},'
+                          f' {len(regressions)} of {len(rows)} metrics regressed.')
+
+        for row in regressions:
+            self.stdout.write(
+                f'{row["dataset"]:>8} {row["scenario"]:<30} {row["metric"]:<22}'
+                f' {row["before"]:>12.2f} -> {row["after"]:>12.2f} ({row["change"]:+.0%})')
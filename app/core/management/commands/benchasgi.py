@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks.datasets import seed_dataset
+from core.benchmarks.results import get_meta, write_results
+from core.benchmarks.slowclients import run_slow_client_load
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+SERVERS={
+    'wsgi':(['app.wsgi:application'], {'ASYNC_READS_ENABLED':'0'}),
+    'asgi':(['app.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+            {'ASYNC_READS_ENABLED':'1'}),
+}
+
+
+class Command(BaseCommand):
+    """compares the wsgi and asgi deployments under slow client load.
+
+    each server is started with gunicorn on a local port with the same
+    number of workers, then a recipe list read is timed while a growing
+    number of slow clients trickle their requests in and read responses
+    a few bytes at a time. sync workers are held by every slow client,
+    the event loop is not.
+    """
+
+    help='measure read latency of the wsgi and asgi servers under slow clients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='wsgi,asgi')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--slow-clients', default='0,4,16,64')
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--path', default='/api/recipe/recipes/')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--delay', type=float, default=0.1,
+                            help='seconds slow clients wait between chunks.')
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', default='')
+
+    def handle(self, *args, **options):
+        try:
+            servers=[SERVERS[name] + (name,) for name in options['servers'].split(',')]
+            slow_counts=[int(count) for count in options['slow_clients'].split(',')]
+        except (KeyError, ValueError) as exc:
+            raise CommandError(exc)
+
+        dataset=seed_dataset(options['recipes'])
+        results={'meta':get_meta({key:options[key] for key in (
+            'servers', 'workers', 'slow_clients', 'recipes', 'path',
+            'requests', 'concurrency', 'delay')}), 'servers':{}}
+
+        self.stdout.write(f'{"server":>6} {"slow":>6} {"p50 ms":>9} {"p99 ms":>9}'
+                          f' {"rps":>8} {"errors":>7}')
+
+        for target, env, name in servers:
+            runs=results['servers'][name]=[]
+
+            with self._server(target, env, options):
+                for slow in slow_counts:
+                    result=asyncio.run(run_slow_client_load(
+                        '127.0.0.1', options['port'], options['path'], dataset.token,
+                        options['requests'], options['concurrency'], slow,
+                        delay=options['delay'], timeout=options['timeout']))
+                    runs.append(result)
+
+                    latency=result['latency_ms']
+                    self.stdout.write(
+                        f'{name:>6} {slow:>6} {latency["p50"]:>9.2f} {latency["p99"]:>9.2f}'
+                        f' {result["throughput_rps"]:>8.1f} {result["errors"]:>7}')
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(f'results written to {options["output"]}')
+
+    def _server(self, target, env, options):
+        return _Server(
+            [sys.executable, '-m', 'gunicorn', *target,
+             '--workers', str(options['workers']),
+             '--bind', f'127.0.0.1:{options["port"]}',
+             '--log-level', 'warning'],
+            {**os.environ, **env},
+            options['port'],
+        )
+
+
+class _Server:
+    """gunicorn subprocess running for the duration of a with block."""
+
+    def __init__(self, command, env, port, startup_timeout=30):
+        self.command=command
+        self.env=env
+        self.port=port
+        self.startup_timeout=startup_timeout
+
+    def __enter__(self):
+        self.process=subprocess.Popen(self.command, env=self.env, cwd=settings.BASE_DIR)
+        deadline=time.monotonic() + self.startup_timeout
+
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'server exited with {self.process.returncode}')
+
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+
+        self.__exit__(None, None, None)
+        raise CommandError('server did not start in time')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from core.benchmarks.loadgen import summarize
+from core.benchmarks.results import get_meta, write_results
+from core.db.backends.postgresql.base import DatabaseWrapper
+from core.db.pool import close_pools
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+MODES={
+    'none':{'CONN_MAX_AGE':0, 'CONN_HEALTH_CHECKS':False, 'POOL':{'ENABLED':False}},
+    'persistent':{'CONN_MAX_AGE':None, 'CONN_HEALTH_CHECKS':True, 'POOL':{'ENABLED':False}},
+    'pool':{'CONN_MAX_AGE':0, 'CONN_HEALTH_CHECKS':False, 'POOL':{'ENABLED':True}},
+}
+
+
+class Command(BaseCommand):
+    """measures the database overhead of a request under each connection mode.
+
+    every simulated request goes through the steps django takes around a
+    real one, closing or keeping the connection before and after it, and
+    runs a trivial query in between, so the time left is what connecting
+    costs: a new connection each time, a persistent one per thread checked
+    once per request, or one checked out of the shared pool.
+    """
+
+    help='measure the per request latency of new, persistent and pooled connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='none,persistent,pool')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--pool-size', type=int, default=0,
+                            help='pool size limit, the number of threads by default.')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--output', default='')
+
+    def handle(self, *args, **options):
+        try:
+            modes=[(name, MODES[name]) for name in options['modes'].split(',')]
+        except KeyError as exc:
+            raise CommandError(f'unknown mode {exc}')
+
+        results={'meta':get_meta({key:options[key] for key in (
+            'modes', 'requests', 'threads', 'pool_size', 'database')}), 'modes':{}}
+
+        self.stdout.write(f'{"mode":<11} {"mean ms":>9} {"p50 ms":>9} {"p99 ms":>9}'
+                          f' {"rps":>9} {"connects":>9}')
+
+        for name, overrides in modes:
+            result=results['modes'][name]=self._run(name, overrides, options)
+            latency=result['latency_ms']
+
+            self.stdout.write(
+                f'{name:<11} {latency["mean"]:>9.3f} {latency["p50"]:>9.3f} {latency["p99"]:>9.3f}'
+                f' {result["throughput_rps"]:>9.1f} {result["connects"]:>9}')
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(f'results written to {options["output"]}')
+
+    def _run(self, name, overrides, options):
+        settings_dict={
+            **connections[options['database']].settings_dict,
+            **overrides,
+            'ENGINE':'core.db.backends.postgresql',
+        }
+        settings_dict['POOL']={**settings_dict['POOL'],
+                               'MAX_SIZE':options['pool_size'] or options['threads']}
+        # raw connections are kept so the count is not fooled by reused ids
+        opened=set()
+
+        def request(wrapper):
+            start=time.perf_counter()
+            wrapper.close_if_unusable_or_obsolete()
+
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+
+            opened.add(wrapper.connection)
+
+            wrapper.close_if_unusable_or_obsolete()
+
+            return (time.perf_counter() - start) * 1000
+
+        def worker(count):
+            wrapper=DatabaseWrapper(dict(settings_dict), f'bench-{name}')
+
+            try:
+                return [request(wrapper) for _ in range(count)]
+            finally:
+                wrapper.close()
+
+        counts=[options['requests'] // options['threads']] * options['threads']
+        counts[0]+=options['requests'] % options['threads']
+
+        start=time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            samples=[latency for latencies in executor.map(worker, counts) for latency in latencies]
+        elapsed=time.perf_counter() - start
+
+        close_pools()
+
+        return {
+            'requests':len(samples),
+            'threads':options['threads'],
+            'connects':len(opened),
+            'throughput_rps':len(samples) / elapsed if elapsed else None,
+            'latency_ms':summarize(samples),
+        }
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from core.benchmarks.datasets import seed_dataset
+from core.benchmarks.loadgen import run_load, summarize
+from core.benchmarks.results import get_meta, write_results
+from core.benchmarks.scenarios import get_scenarios
+from user.hashers import get_hashing_settings, reset_hashing_pool
+import os
+
+
+def get_core_count():
+    """returns the cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+class Command(BaseCommand):
+    """measures token logins per second for each password hasher.
+
+    the benchmark user gets its password hashed with the hasher under test
+    before every run, so no login is spent rehashing it, then logs in from
+    `concurrency` threads through the hashing pool, or inline with
+    --workers 0. throughput is also given per core, which is what sizing
+    api workers for login bursts comes down to.
+    """
+
+    help='measure login throughput per core of the password hashers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', default=','.join(settings.PASSWORD_HASHER_CLASSES))
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', default='1,8',
+                            help='comma separated numbers of login threads.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='hashing threads, PASSWORD_HASHING by default.')
+        parser.add_argument('--output', default='')
+
+    def handle(self, *args, **options):
+        try:
+            hashers=[(name, settings.PASSWORD_HASHER_CLASSES[name])
+                     for name in options['hashers'].split(',')]
+            concurrencies=[int(count) for count in options['concurrency'].split(',')]
+        except (KeyError, ValueError) as exc:
+            raise CommandError(exc)
+
+        hashing=get_hashing_settings()
+
+        if options['workers'] is not None:
+            hashing['WORKERS']=options['workers']
+
+        cores=get_core_count()
+        scenario=get_scenarios(['user-token'])[0]
+        dataset=seed_dataset(0)
+        results={'meta':get_meta({**{key:options[key] for key in (
+            'hashers', 'requests', 'concurrency')}, 'hashing':hashing, 'cores':cores}),
+            'hashers':{}}
+
+        self.stdout.write(f'{"hasher":<8} {"threads":>8} {"p50 ms":>9} {"p99 ms":>9}'
+                          f' {"rps":>8} {"rps/core":>9} {"errors":>7}')
+
+        for name, path in hashers:
+            runs=results['hashers'][name]=[]
+            others=[other for other in settings.PASSWORD_HASHERS if other != path]
+
+            with override_settings(PASSWORD_HASHERS=[path, *others], PASSWORD_HASHING=hashing):
+                reset_hashing_pool()
+                dataset.user.set_password(dataset.password)
+                dataset.user.save(update_fields=['password'])
+
+                for concurrency in concurrencies:
+                    load, elapsed=run_load(scenario, dataset, options['requests'], concurrency)
+                    rps=len(load) / elapsed if elapsed else 0
+                    result={
+                        'concurrency':concurrency,
+                        'requests':len(load),
+                        'errors':sum(1 for latency, status, size in load if status >= 400),
+                        'throughput_rps':rps,
+                        'throughput_rps_per_core':rps / cores,
+                        'latency_ms':summarize([latency for latency, status, size in load]),
+                    }
+                    runs.append(result)
+
+                    self.stdout.write(
+                        f'{name:<8} {concurrency:>8} {result["latency_ms"]["p50"]:>9.2f}'
+                        f' {result["latency_ms"]["p99"]:>9.2f} {rps:>8.1f}'
+                        f' {rps / cores:>9.1f} {result["errors"]:>7}')
+
+            reset_hashing_pool()
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(f'results written to {options["output"]}')
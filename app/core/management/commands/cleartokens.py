@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from core.models import AuthToken
+from user.authentication import get_auth_token_settings
+import time
+
+
+class Command(BaseCommand):
+    """deletes expired api tokens a batch at a time.
+
+    every batch is its own short transaction, with an optional pause in
+    between, so a large backlog never holds locks or floods replication
+    for long. meant to be run periodically, from cron for instance.
+    """
+
+    help='delete expired api tokens in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=get_auth_token_settings()['CLEANUP_BATCH_SIZE'])
+        parser.add_argument('--pause', type=float, default=0,
+                            help='seconds to wait between batches.')
+
+    def handle(self, *args, **options):
+        total=0
+
+        while True:
+            deleted=AuthToken.objects.delete_expired(options['batch_size'])
+            total+=deleted
+
+            if deleted < options['batch_size']:
+                break
+
+            time.sleep(options['pause'])
+
+        self.stdout.write(f'deleted {total} expired tokens.')
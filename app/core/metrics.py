@@ -0,0 +1,293 @@
+"""per request performance measurements and their prometheus exposition"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+
+DEFAULT_PERFORMANCE_METRICS={
+    'ENABLED':False,
+    'SERVER_TIMING':True,
+    'PREFIX':'recipe_api',
+    'BUCKETS':[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+}
+
+
+def get_metrics_settings():
+    """returns PERFORMANCE_METRICS merged over the defaults."""
+    return {**DEFAULT_PERFORMANCE_METRICS, **getattr(settings, 'PERFORMANCE_METRICS', {})}
+
+
+_current=ContextVar('request_metrics', default=None)
+
+
+def get_request_metrics():
+    """returns the measurements of the request being handled, None when
+    instrumentation is off."""
+    return _current.get()
+
+
+def record_current_query(execute, sql, params, many, context):
+    """database execute wrapper counting the query into the metrics of the
+    request being handled, if any.
+
+    the metrics are found through a context variable, which follows the
+    request onto whichever thread runs its sync code, so the queries of a
+    view run by asgi on a worker thread are counted too.
+    """
+    metrics=_current.get()
+
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recording(sender, connection, **kwargs):
+    """wraps every connection of every thread once, when it first connects."""
+    if record_current_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_current_query)
+
+
+class RequestMetrics:
+    """time spent by a single request, split by where it went.
+
+    `db` covers every query, the other phases exclude the queries run
+    while they were measured, so a list serializer evaluating its queryset
+    is not counted twice.
+    """
+
+    def __init__(self):
+        self.view='unresolved'
+        self.start=time.perf_counter()
+        self.duration=0.0
+        self.db_queries=0
+        self.db_time=0.0
+        self.phases={}
+        self.response_size=None
+
+    def activate(self):
+        return _current.set(self)
+
+    def deactivate(self, token):
+        _current.reset(token)
+
+    def record_query(self, execute, sql, params, many, context):
+        """database execute wrapper counting queries and their time."""
+        start=time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time+=time.perf_counter() - start
+            self.db_queries+=1
+
+    @contextmanager
+    def measure(self, phase):
+        start=time.perf_counter()
+        db_time=self.db_time
+
+        try:
+            yield
+        finally:
+            elapsed=time.perf_counter() - start - (self.db_time - db_time)
+            self.phases[phase]=self.phases.get(phase, 0.0) + elapsed
+
+    def timed(self, phase, func):
+        """returns func measuring each of its calls as phase."""
+        def wrapper(*args, **kwargs):
+            with self.measure(phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def finish(self, response):
+        self.duration=time.perf_counter() - self.start
+
+        if not response.streaming:
+            self.response_size=len(response.content)
+
+    def get_server_timing(self):
+        """returns the Server-Timing header value, durations in milliseconds."""
+        entries=[f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"']
+        entries+=[f'{phase};dur={elapsed * 1000:.2f}' for phase, elapsed in self.phases.items()]
+        entries.append(f'total;dur={self.duration * 1000:.2f}')
+
+        return ', '.join(entries)
+
+
+class ViewStats:
+    """accumulated measurements of one view action."""
+
+    def __init__(self, buckets):
+        self.bucket_counts=[0] * (len(buckets) + 1)
+        self.count=0
+        self.duration=0.0
+        self.db_queries=0
+        self.db_time=0.0
+        self.phases={}
+        self.response_bytes=0
+
+
+class MetricsRegistry:
+    """thread safe totals of the requests handled by this process."""
+
+    def __init__(self, buckets=None):
+        self.buckets=list(buckets or DEFAULT_PERFORMANCE_METRICS['BUCKETS'])
+        self._lock=threading.Lock()
+        self.collectors=[]
+        self.reset()
+
+    def reset(self):
+        self.views={}
+        self.requests={}
+
+    def add_collector(self, collector):
+        """adds a callable returning more exposition lines for a prefix."""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def observe(self, metrics, method, status_code):
+        with self._lock:
+            stats=self.views.get(metrics.view)
+
+            if stats is None:
+                stats=self.views[metrics.view]=ViewStats(self.buckets)
+
+            stats.bucket_counts[bisect.bisect_left(self.buckets, metrics.duration)]+=1
+            stats.count+=1
+            stats.duration+=metrics.duration
+            stats.db_queries+=metrics.db_queries
+            stats.db_time+=metrics.db_time
+            stats.response_bytes+=metrics.response_size or 0
+
+            for phase, elapsed in metrics.phases.items():
+                stats.phases[phase]=stats.phases.get(phase, 0.0) + elapsed
+
+            key=(metrics.view, method, str(status_code))
+            self.requests[key]=self.requests.get(key, 0) + 1
+
+    def render(self, prefix='recipe_api'):
+        """returns the totals in the prometheus text exposition format."""
+        with self._lock:
+            views=sorted(self.views.items())
+            requests=sorted(self.requests.items())
+
+        lines=[
+            f'# HELP {prefix}_requests_total Requests handled, by view, method and status.',
+            f'# TYPE {prefix}_requests_total counter',
+        ]
+        lines+=[
+            f'{prefix}_requests_total{format_labels(view=view, method=method, status=status)} {count}'
+            for (view, method, status), count in requests
+        ]
+
+        lines+=[
+            f'# HELP {prefix}_request_duration_seconds Time spent handling requests.',
+            f'# TYPE {prefix}_request_duration_seconds histogram',
+        ]
+        for view, stats in views:
+            cumulative=0
+            for bound, count in zip(self.buckets + ['+Inf'], stats.bucket_counts):
+                cumulative+=count
+                lines.append(f'{prefix}_request_duration_seconds_bucket'
+                             f'{format_labels(view=view, le=bound)} {cumulative}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{format_labels(view=view)} {stats.duration}')
+            lines.append(f'{prefix}_request_duration_seconds_count{format_labels(view=view)} {stats.count}')
+
+        totals=[
+            ('db_queries_total', 'Database queries run.', lambda stats: stats.db_queries),
+            ('db_seconds_total', 'Time spent in database queries.', lambda stats: stats.db_time),
+            ('response_bytes_total', 'Size of the response bodies, streams excluded.',
+             lambda stats: stats.response_bytes),
+        ]
+        for name, description, value in totals:
+            lines+=[f'# HELP {prefix}_{name} {description}', f'# TYPE {prefix}_{name} counter']
+            lines+=[f'{prefix}_{name}{format_labels(view=view)} {value(stats)}' for view, stats in views]
+
+        lines+=[
+            f'# HELP {prefix}_phase_seconds_total Time spent serializing and rendering,'
+            f' queries excluded.',
+            f'# TYPE {prefix}_phase_seconds_total counter',
+        ]
+        lines+=[
+            f'{prefix}_phase_seconds_total{format_labels(view=view, phase=phase)} {elapsed}'
+            for view, stats in views for phase, elapsed in sorted(stats.phases.items())
+        ]
+
+        for collector in self.collectors:
+            lines+=collector(prefix)
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(**labels):
+    """returns labels formatted for the exposition format, values escaped."""
+    escaped=(str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+             for value in labels.values())
+
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+metrics_registry=MetricsRegistry(get_metrics_settings()['BUCKETS'])
+
+
+_timed_serializers={}
+
+
+def get_timed_serializer_class(serializer_class):
+    """returns a subclass of serializer_class measuring its `data`."""
+    timed=_timed_serializers.get(serializer_class)
+
+    if timed is None:
+        def data(self):
+            metrics=get_request_metrics()
+
+            if metrics is None:
+                return super(timed, self).data
+
+            with metrics.measure('serialize'):
+                return super(timed, self).data
+
+        timed=_timed_serializers[serializer_class]=type(
+            serializer_class.__name__, (serializer_class,),
+            {'data':property(data), '__module__':serializer_class.__module__})
+
+    return timed
+
+
+class InstrumentedViewMixin:
+    """names the measurements of a request after the view action and
+    measures its serializer and renderer."""
+
+    def initial(self, request, *args, **kwargs):
+        metrics=get_request_metrics()
+
+        if metrics is not None:
+            action=getattr(self, 'action', None) or request.method.lower()
+            metrics.view=f'{type(self).__name__}.{action}'
+
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer=super().get_serializer(*args, **kwargs)
+
+        if get_request_metrics() is not None:
+            serializer.__class__=get_timed_serializer_class(type(serializer))
+
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response=super().finalize_response(request, response, *args, **kwargs)
+        metrics=get_request_metrics()
+        renderer=getattr(response, 'accepted_renderer', None)
+
+        if metrics is not None and renderer is not None:
+            renderer.render=metrics.timed('render', renderer.render)
+
+        return response
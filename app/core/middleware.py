@@ -0,0 +1,73 @@
+"""middleware measuring where the time of each request goes"""
+from django.core.exceptions import MiddlewareNotUsed
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .metrics import (RequestMetrics, get_metrics_settings, get_request_metrics,
+                      metrics_registry)
+
+
+class PerformanceMiddleware:
+    """measures every request and records it in the metrics registry.
+
+    queries are counted by the execute wrapper each database connection
+    gets when it connects, on whichever thread runs them, views using
+    `InstrumentedViewMixin` add their serializer and render time. when
+    PERFORMANCE_METRICS is disabled the middleware drops itself from the
+    stack at startup and costs nothing. it runs on the event loop under
+    asgi, so async views are not pushed to a thread.
+    """
+
+    sync_capable=True
+    async_capable=True
+
+    def __init__(self, get_response):
+        options=get_metrics_settings()
+
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+
+        self.get_response=get_response
+        self.server_timing=options['SERVER_TIMING']
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics=RequestMetrics()
+        token=metrics.activate()
+
+        try:
+            response=self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+
+        return self.process_metrics(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics=RequestMetrics()
+        token=metrics.activate()
+
+        try:
+            response=await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+
+        return self.process_metrics(request, response, metrics)
+
+    def process_metrics(self, request, response, metrics):
+        metrics.finish(response)
+        metrics_registry.observe(metrics, request.method, response.status_code)
+
+        if self.server_timing:
+            response['Server-Timing']=metrics.get_server_timing()
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """names the request after its route until the view names it better."""
+        metrics=get_request_metrics()
+
+        if metrics is not None:
+            metrics.view=request.resolver_match.view_name
@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """RecipeImageDerivative is created by 0011 since the thumbnail column
+    it replaced was squashed away. this migration keeps the numbering, and
+    the history of databases that applied the original 0012."""
+
+    dependencies = [
+        ('core', '0011_recipe_image_status_imagejob_recipeimagederivative'),
+    ]
+
+    operations = []
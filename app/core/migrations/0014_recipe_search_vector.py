@@ -0,0 +1,42 @@
+# Generated by Django 4.1.13 on 2026-10-18 17:15
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+BACKFILL_SEARCH_VECTOR = """
+UPDATE core_recipe AS recipe SET search_vector =
+    setweight(to_tsvector('english', coalesce(recipe.title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(recipe.description, '')), 'B')
+    || setweight(to_tsvector('english',
+        coalesce((SELECT string_agg(tag.name, ' ')
+                  FROM core_recipe_tags AS link
+                  JOIN core_tag AS tag ON tag.id = link.tag_id
+                  WHERE link.recipe_id = recipe.id), '')
+        || ' ' ||
+        coalesce((SELECT string_agg(ingredient.name, ' ')
+                  FROM core_recipe_ingredients AS link
+                  JOIN core_ingredient AS ingredient ON ingredient.id = link.ingredient_id
+                  WHERE link.recipe_id = recipe.id), '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_imageupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
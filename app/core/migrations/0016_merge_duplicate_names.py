@@ -0,0 +1,48 @@
+# Generated by Django 4.1.13 on 2026-10-18 17:21
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """merges tags and ingredients sharing a name for the same user.
+
+    the oldest row is kept, the recipes of its duplicates are linked to it
+    and the duplicates are deleted with their links.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, relation, column in (('Tag', 'tags', 'tag_id'),
+                                         ('Ingredient', 'ingredients', 'ingredient_id')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+
+        groups = (model.objects.values('user_id', 'name')
+                  .annotate(keep=Min('id'), total=Count('id'))
+                  .filter(total__gt=1))
+
+        for group in groups.iterator():
+            duplicates = list(
+                model.objects.filter(user_id=group['user_id'], name=group['name'])
+                .exclude(id=group['keep']).values_list('id', flat=True))
+
+            recipe_ids = (through.objects.filter(**{f'{column}__in': duplicates})
+                          .values_list('recipe_id', flat=True).distinct())
+
+            through.objects.bulk_create(
+                [through(recipe_id=recipe_id, **{column: group['keep']})
+                 for recipe_id in recipe_ids],
+                ignore_conflicts=True,
+            )
+            model.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_tag_ingredient_name_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
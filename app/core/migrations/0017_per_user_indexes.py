@@ -0,0 +1,58 @@
+# Generated by Django 4.1.13 on 2026-10-18 17:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# the auto created through tables only index each column on its own, the
+# composite unique index covers recipe -> name lookups but walking from a
+# tag or ingredient back to its recipes has to visit the heap.
+THROUGH_INDEXES = [
+    ('core_recipe_tags', 'recipe_tags_tag_recipe_idx', 'tag_id'),
+    ('core_recipe_ingredients', 'recipe_ingredients_ingredient_recipe_idx', 'ingredient_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_merge_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='ingredient_user_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='tag_user_name_unique'),
+        ),
+        *[
+            migrations.RunSQL(
+                f'CREATE INDEX {name} ON {table} ({column}, recipe_id);',
+                f'DROP INDEX {name};',
+            )
+            for table, name, column in THROUGH_INDEXES
+        ],
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
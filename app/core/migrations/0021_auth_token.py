@@ -0,0 +1,47 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+from datetime import timedelta
+import hashlib
+
+
+def copy_authtoken_tokens(apps, schema_editor):
+    """moves the tokens of rest framework to hashed, expiring tokens, so
+    clients keep their keys. the plain keys are deleted."""
+    Token=apps.get_model('authtoken', 'Token')
+    AuthToken=apps.get_model('core', 'AuthToken')
+    now=timezone.now()
+    ttl=getattr(settings, 'AUTH_TOKENS', {}).get('TTL', 7 * 24 * 3600)
+
+    AuthToken.objects.bulk_create([
+        AuthToken(user_id=token.user_id, digest=hashlib.sha256(token.key.encode()).hexdigest(),
+                  created=now, last_used=now, expires=now + timedelta(seconds=ttl))
+        for token in Token.objects.iterator()
+    ], batch_size=1000)
+    Token.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_sync_tracking'),
+        ('authtoken', '0003_tokenproxy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('created', models.DateTimeField()),
+                ('last_used', models.DateTimeField()),
+                ('expires', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auth_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_authtoken_tokens, migrations.RunPython.noop),
+    ]
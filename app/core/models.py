@@ -1,7 +1,15 @@
-from django.db import models
+from django.db import models, connection
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+from django.contrib.postgres.search import SearchVectorField
+from user.authentication import get_auth_token_settings, get_token_digest
+from user.hashers import hash_password, verify_password
 import app.settings as settings
+from datetime import timedelta
+import secrets
 import uuid
 import os
 
@@ -14,6 +22,21 @@ def get_image_path(instance, file_path):
 
     return os.path.join('uploads', 'recipe', str(id) + suffix)
 
+def get_image_source_path(instance, file_path):
+    """returns unique path for uploaded images waiting to be processed."""
+    id=uuid.uuid4()
+
+    suffix=os.path.splitext(file_path)[1]
+
+    return os.path.join('uploads', 'pending', str(id) + suffix)
+
+IMAGE_STATUS_CHOICES=[
+    ('pending', 'pending'),
+    ('processing', 'processing'),
+    ('done', 'done'),
+    ('failed', 'failed'),
+]
+
 class UserMananger(BaseUserManager):
 
     def create(self, email, password=None, **extra_fields):
@@ -46,14 +69,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=300)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
+    data_modified = models.DateTimeField(null=True, editable=False)
 
     USERNAME_FIELD='email'
 
     objects = UserMananger()
 
+    def set_password(self, raw_password):
+        """hashes the password on the hashing pool."""
+        self.password=hash_password(raw_password)
+        self._password=raw_password
+
+    def check_password(self, raw_password):
+        """checks the password on the hashing pool, rehashing outdated ones."""
+        return verify_password(self, raw_password)
+
 
 class Recipe(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING,
+                             db_index=False)
     title = models.CharField(max_length=50)
     time_minute = models.IntegerField(validators=[MinValueValidator(0)])
     price = models.DecimalField(decimal_places=2,max_digits=6,
@@ -63,21 +98,217 @@ class Recipe(models.Model):
     tags=models.ManyToManyField('Tag')
     ingredients=models.ManyToManyField('Ingredient')
     image=models.ImageField(null=True, upload_to=get_image_path)
+    image_status=models.CharField(max_length=20, null=True,
+                                  choices=IMAGE_STATUS_CHOICES)
+    search_vector=SearchVectorField(null=True, editable=False)
+    updated_at=models.DateTimeField(auto_now=True)
+    sync_version=models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes=[
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'sync_version'], name='recipe_user_sync_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minute', 'id'],
+                         name='recipe_user_time_minute_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.title
     
 class Tag(models.Model):
-    user = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=150)
+    updated_at=models.DateTimeField(auto_now=True)
+    sync_version=models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints=[
+            models.UniqueConstraint(fields=['user', 'name'], name='tag_user_name_unique'),
+        ]
+        indexes=[
+            models.Index(fields=['user', 'sync_version'], name='tag_user_sync_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='tag_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
 
 class Ingredient(models.Model):
-    user=models.ForeignKey(to=User, on_delete=models.CASCADE)
+    user=models.ForeignKey(to=User, on_delete=models.CASCADE, db_index=False)
     name=models.CharField(max_length=250)
+    updated_at=models.DateTimeField(auto_now=True)
+    sync_version=models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints=[
+            models.UniqueConstraint(fields=['user', 'name'],
+                                    name='ingredient_user_name_unique'),
+        ]
+        indexes=[
+            models.Index(fields=['user', 'sync_version'],
+                         name='ingredient_user_sync_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='ingredient_name_trgm_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeImageDerivative(models.Model):
+    """downscaled variant of a recipe image, `width` pixels wide."""
+
+    recipe=models.ForeignKey(to=Recipe, on_delete=models.CASCADE,
+                             related_name='derivatives')
+    width=models.PositiveIntegerField()
+    image=models.ImageField(upload_to=get_image_path)
+
+    class Meta:
+        ordering=['width']
+        constraints=[
+            models.UniqueConstraint(fields=['recipe', 'width'],
+                                    name='unique_recipe_derivative_width'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.width}w'
+
+
+class ImageUpload(models.Model):
+    """resumable recipe image upload, received chunk by chunk."""
+
+    id=models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe=models.ForeignKey(to=Recipe, on_delete=models.CASCADE,
+                             related_name='image_uploads')
+    size=models.PositiveBigIntegerField()
+    received=models.PositiveBigIntegerField(default=0)
+    created_at=models.DateTimeField(auto_now_add=True)
+    updated_at=models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.received}/{self.size}'
+
+
+class ImageJob(models.Model):
+    """uploaded recipe image waiting for the image pipeline."""
+
+    PENDING='pending'
+    PROCESSING='processing'
+    DONE='done'
+    FAILED='failed'
+
+    recipe=models.ForeignKey(to=Recipe, on_delete=models.CASCADE,
+                             related_name='image_jobs')
+    source=models.FileField(upload_to=get_image_source_path)
+    status=models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES,
+                            default=PENDING)
+    error=models.TextField(blank=True)
+    created_at=models.DateTimeField(auto_now_add=True)
+    updated_at=models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.recipe_id}: {self.status}'
+
+
+class Tombstone(models.Model):
+    """record of a deleted recipe, tag or ingredient kept for delta sync."""
+
+    RECIPE='recipe'
+    TAG='tag'
+    INGREDIENT='ingredient'
+    MODEL_CHOICES=[
+        (RECIPE, RECIPE),
+        (TAG, TAG),
+        (INGREDIENT, INGREDIENT),
+    ]
+
+    user=models.ForeignKey(to=User, on_delete=models.CASCADE, db_index=False)
+    model=models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id=models.BigIntegerField()
+    sync_version=models.PositiveBigIntegerField()
+    deleted_at=models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes=[
+            models.Index(fields=['user', 'sync_version'], name='tombstone_user_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
+
+
+class AuthTokenManager(models.Manager):
+
+    def create_token(self, user):
+        """creates a token of user, returns it with its key.
+
+        only the digest of the key is stored, the key is shown once.
+        """
+        key=secrets.token_hex(20)
+        now=timezone.now()
+        token=self.create(user=user, digest=get_token_digest(key), created=now,
+                          last_used=now, expires=AuthToken.get_expiry(now, now))
+
+        return token, key
+
+    def delete_expired(self, batch_size=1000, now=None):
+        """deletes one batch of expired tokens, returns how many went.
+
+        rows are deleted with a single query, without signals, expired
+        tokens are rejected from the token cache anyway.
+        """
+        now=now or timezone.now()
+        table=self.model._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN'
+                f' (SELECT id FROM {table} WHERE expires <= %s ORDER BY expires LIMIT %s)',
+                [now, batch_size])
+
+            return cursor.rowcount
+
+
+class AuthToken(models.Model):
+    """api token with a sliding expiry, stored by the digest of its key.
+
+    a token expires TTL after it was last used, and MAX_AGE after it was
+    created at the latest. its use is recorded at most once per
+    TOUCH_INTERVAL, so a busy client costs one write per interval rather
+    than one per request.
+    """
+
+    user=models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='auth_tokens')
+    digest=models.CharField(max_length=64, unique=True)
+    created=models.DateTimeField()
+    last_used=models.DateTimeField()
+    expires=models.DateTimeField(db_index=True)
+
+    objects=AuthTokenManager()
+
+    def __str__(self):
+        return f'{self.user_id}: {self.digest[:8]}'
+
+    @staticmethod
+    def get_expiry(created, last_used):
+        options=get_auth_token_settings()
+
+        return min(last_used + timedelta(seconds=options['TTL']),
+                   created + timedelta(seconds=options['MAX_AGE']))
+
+    def is_expired(self, now=None):
+        return self.expires <= (now or timezone.now())
+
+    def get_touch(self, now=None):
+        """returns the fields to save for a use of the token now, None when
+        its last use was recorded recently enough."""
+        now=now or timezone.now()
+
+        if now - self.last_used < timedelta(seconds=get_auth_token_settings()['TOUCH_INTERVAL']):
+            return None
+
+        return {'last_used':now, 'expires':self.get_expiry(self.created, now)}
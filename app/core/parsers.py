@@ -0,0 +1,39 @@
+"""json parser using orjson when it is installed"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+import codecs
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+
+def loads(data):
+    """returns the document in the json string data, raises ValueError."""
+    if orjson is None:
+        return json.loads(data)
+
+    return orjson.loads(data)
+
+
+class FastJSONParser(JSONParser):
+    """parses json with orjson, falling back to the stdlib decoder.
+
+    orjson only reads utf-8, requests in other encodings go through the
+    rest framework parser.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context=parser_context or {}
+        encoding=parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
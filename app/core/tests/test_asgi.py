@@ -0,0 +1,43 @@
+"""tests for the asgi handler of the deployment"""
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase
+from django.utils.asyncio import async_unsafe
+from core.asgi import StreamingASGIHandler
+from unittest.mock import patch
+import threading
+
+
+@async_unsafe
+def read_row(index):
+    """stands in for an orm call, refused on the event loop."""
+    return f'{index}:{threading.current_thread().name}\n'
+
+
+class TestStreamingASGIHandler(SimpleTestCase):
+
+    async def test_streams_off_the_event_loop(self):
+        response=StreamingHttpResponse(read_row(index) for index in range(3))
+        messages=[]
+
+        async def receive():
+            return {'type':'http.request', 'body':b'', 'more_body':False}
+
+        async def send(message):
+            messages.append(message)
+
+        async def get_response_async(request):
+            return response
+
+        handler=StreamingASGIHandler()
+        scope={'type':'http', 'method':'GET', 'path':'/', 'query_string':b'', 'headers':[]}
+
+        with patch.object(handler, 'get_response_async', get_response_async):
+            await handler(scope, receive, send)
+
+        self.assertEqual(messages[0]['status'], 200)
+        rows=b''.join(message.get('body', b'') for message in messages[1:]).decode().split()
+
+        self.assertEqual([row.split(':')[0] for row in rows], ['0', '1', '2'])
+        # one thread pulls every part, so cursors stay on their connection
+        self.assertEqual(len({row.split(':')[1] for row in rows}), 1)
+        self.assertTrue(rows[0].split(':')[1].startswith('stream'))
@@ -0,0 +1,75 @@
+"""testing the api benchmark helpers"""
+from django.test import SimpleTestCase
+from django.urls import get_resolver
+from core.benchmarks.loadgen import percentile, summarize
+from core.benchmarks.results import compare_results
+from core.benchmarks.scenarios import SCENARIOS, get_scenarios
+
+
+def get_route_names(namespace):
+    resolver=get_resolver().namespace_dict[namespace][1]
+
+    return {f'{namespace}:{name}' for name in resolver.reverse_dict if isinstance(name, str)}
+
+
+def make_results(latency, queries):
+    return {
+        'meta':{'commit':'abc'},
+        'datasets':{'10':{'recipe-list':{
+            'latency_ms':{'p50':latency, 'p99':latency * 2},
+            'queries':{'p50':queries},
+        }}},
+    }
+
+
+class TestStatistics(SimpleTestCase):
+
+    def test_percentile_nearest_rank(self):
+        values=list(range(1, 101))
+
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 1), 100)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        summary=summarize([3, 1, 2])
+
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['mean'], 2)
+        self.assertEqual(summary['p50'], 2)
+        self.assertEqual(summary['max'], 3)
+        self.assertEqual(summarize([]), {'count':0})
+
+
+class TestCompareResults(SimpleTestCase):
+
+    def test_flags_regressions_over_threshold(self):
+        rows=compare_results(make_results(10, 2), make_results(10.5, 3), threshold=0.1)
+        by_metric={row['metric']:row for row in rows}
+
+        self.assertFalse(by_metric['latency_ms.p50']['regressed'])
+        self.assertTrue(by_metric['queries.p50']['regressed'])
+        self.assertAlmostEqual(by_metric['queries.p50']['change'], 0.5)
+
+    def test_skips_scenarios_missing_from_baseline(self):
+        baseline=make_results(10, 2)
+        baseline['datasets']={}
+
+        self.assertEqual(compare_results(baseline, make_results(10, 2)), [])
+
+
+class TestScenarios(SimpleTestCase):
+
+    def test_every_route_has_a_scenario(self):
+        routes=get_route_names('recipe') | get_route_names('user')
+        covered={scenario.url_name for scenario in SCENARIOS.values()}
+
+        self.assertEqual(routes - covered, set())
+
+    def test_get_scenarios_rejects_unknown_names(self):
+        self.assertEqual([scenario.name for scenario in get_scenarios(['sync'])], ['sync'])
+
+        with self.assertRaises(KeyError):
+            get_scenarios(['sync', 'nope'])
@@ -0,0 +1,56 @@
+"""testing that per user queries are answered by their indexes"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from core.models import Recipe, Tag, Ingredient
+
+
+class TestIndexUsage(TestCase):
+    """the test tables are tiny, so sequential scans are disabled for each
+    test to make the planner show which index it would pick at scale."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(email='index@email.com')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, plan, index):
+        self.assertIn(index, plan)
+
+    def test_recipe_list_uses_user_id_index(self):
+        """test listing a users newest recipes walks the composite index."""
+        queryset=Recipe.objects.filter(user=self.user, id__lt=100).order_by('-id')[:50]
+
+        self.assertUsesIndex(queryset.explain(), 'recipe_user_id_idx')
+
+    def test_name_lookup_uses_unique_index(self):
+        """test resolving names of a user uses the unique constraint index.
+
+        every index of these tables leads with the user, so on empty tables
+        the planner cannot tell them apart. the user gets enough names, with
+        statistics, for the name condition to be worth an index.
+        """
+        for model, index in ((Tag, 'tag_user_name_unique'),
+                             (Ingredient, 'ingredient_user_name_unique')):
+            model.objects.bulk_create(
+                [model(user=self.user, name=f'name {number}') for number in range(500)])
+
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+            queryset=model.objects.filter(user=self.user, name__in=['a', 'b'])
+            plan=queryset.explain()
+
+            self.assertUsesIndex(plan, index)
+            self.assertNotIn('Seq Scan', plan)
+
+    def test_reverse_through_lookup_uses_index(self):
+        """test finding the recipes of a tag or ingredient stays in the index."""
+        for through, column, index in (
+                (Recipe.tags.through, 'tag_id', 'recipe_tags_tag_recipe_idx'),
+                (Recipe.ingredients.through, 'ingredient_id',
+                 'recipe_ingredients_ingredient_recipe_idx')):
+            queryset=through.objects.filter(**{column:1}).values('recipe_id')
+
+            self.assertUsesIndex(queryset.explain(), index)
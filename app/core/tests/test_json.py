@@ -0,0 +1,85 @@
+"""testing the fast json renderer and parser"""
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from core.renderers import FastJSONRenderer
+from core.parsers import FastJSONParser
+from decimal import Decimal
+from unittest.mock import patch
+import datetime
+import io
+import json
+import uuid
+
+
+DOCUMENT={
+    'id':1,
+    'title':'crème brûlée \u2028',
+    'price':Decimal('5.20'),
+    'ratio':0.5,
+    'created':datetime.datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc),
+    'day':datetime.date(2024, 1, 2),
+    'key':uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'images':{128:'http://testserver/128.webp'},
+    'tags':[{'name':'vegan'}],
+    'link':None,
+}
+
+
+class TestFastJSONRenderer(SimpleTestCase):
+
+    def test_same_document_as_json_renderer(self):
+        """testing the rendered document matches the rest framework one."""
+        fast=FastJSONRenderer().render(DOCUMENT)
+        slow=JSONRenderer().render(DOCUMENT)
+
+        self.assertEqual(json.loads(fast), json.loads(slow))
+        self.assertNotIn('\u2028'.encode(), fast)
+
+    def test_indent_falls_back(self):
+        """testing indented output is left to the stdlib encoder."""
+        rendered=FastJSONRenderer().render(
+            {'a':1}, 'application/json; indent=4', {})
+
+        self.assertEqual(rendered, JSONRenderer().render(
+            {'a':1}, 'application/json; indent=4', {}))
+
+    def test_render_without_orjson(self):
+        """testing rendering still works when orjson is not installed."""
+        with patch('core.renderers.orjson', None):
+            rendered=FastJSONRenderer().render(DOCUMENT)
+
+        self.assertEqual(rendered, JSONRenderer().render(DOCUMENT))
+
+    def test_render_none(self):
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class TestFastJSONParser(SimpleTestCase):
+
+    def _parse(self, body, encoding='utf-8'):
+        return FastJSONParser().parse(io.BytesIO(body), 'application/json',
+                                      {'encoding':encoding})
+
+    def test_parse(self):
+        """testing documents parse like the rest framework parser."""
+        body='{"title": "crème", "price": 5.2, "tags": [{"name": "vegan"}]}'.encode()
+
+        self.assertEqual(self._parse(body), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parse_error(self):
+        """testing malformed documents raise a parse error."""
+        for body in (b'{"title": ', b'{"price": NaN}'):
+            with self.assertRaises(ParseError):
+                self._parse(body)
+
+    def test_other_encodings_fall_back(self):
+        """testing non utf-8 bodies are decoded by the stdlib parser."""
+        body='{"title": "crème"}'.encode('latin-1')
+
+        self.assertEqual(self._parse(body, 'latin-1'), {'title':'crème'})
+
+    def test_parse_without_orjson(self):
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(self._parse(b'{"a": 1}'), {'a':1})
@@ -0,0 +1,169 @@
+"""tests for request performance instrumentation"""
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.metrics import RequestMetrics, MetricsRegistry, metrics_registry
+from core.middleware import PerformanceMiddleware
+from core.models import Recipe, AuthToken
+from recipe.caching import reset_response_cache
+from decimal import Decimal
+from unittest.mock import patch
+
+
+METRICS_URL=reverse('metrics')
+RECIPES_URL=reverse('recipe:recipe-list')
+TAGS_URL=reverse('recipe:tag-list')
+
+ENABLED={'ENABLED':True, 'SERVER_TIMING':True}
+
+
+class TestRequestMetrics(SimpleTestCase):
+
+    @patch('core.metrics.time.perf_counter')
+    def test_phases_exclude_queries(self, perf_counter):
+        """test queries run while serializing only count as database time"""
+        perf_counter.side_effect=[0, 1, 2, 5, 9]
+        metrics=RequestMetrics()
+
+        with metrics.measure('serialize'):
+            metrics.record_query(lambda *args: None, 'SELECT 1', None, False, {})
+
+        self.assertEqual(metrics.db_queries, 1)
+        self.assertEqual(metrics.db_time, 3)
+        self.assertEqual(metrics.phases, {'serialize':5})
+
+    def test_server_timing(self):
+        metrics=RequestMetrics()
+        metrics.db_queries=2
+        metrics.db_time=0.004
+        metrics.phases={'render':0.001}
+        metrics.finish(HttpResponse(b'abc'))
+        metrics.duration=0.01
+
+        self.assertEqual(metrics.response_size, 3)
+        self.assertEqual(metrics.get_server_timing(),
+                         'db;dur=4.00;desc="2 queries", render;dur=1.00, total;dur=10.00')
+
+
+class TestMetricsRegistry(SimpleTestCase):
+
+    def test_render_prometheus(self):
+        registry=MetricsRegistry(buckets=[0.1, 1])
+        metrics=RequestMetrics()
+        metrics.view='RecipeManageView.list'
+        metrics.duration=0.5
+        metrics.db_queries=3
+        metrics.phases={'serialize':0.25}
+        metrics.response_size=100
+
+        registry.observe(metrics, 'GET', 200)
+        registry.observe(metrics, 'GET', 200)
+        text=registry.render('api')
+
+        self.assertIn('api_requests_total{view="RecipeManageView.list",method="GET",'
+                      'status="200"} 2', text)
+        self.assertIn('api_request_duration_seconds_bucket'
+                      '{view="RecipeManageView.list",le="0.1"} 0', text)
+        self.assertIn('api_request_duration_seconds_bucket'
+                      '{view="RecipeManageView.list",le="1"} 2', text)
+        self.assertIn('api_request_duration_seconds_bucket'
+                      '{view="RecipeManageView.list",le="+Inf"} 2', text)
+        self.assertIn('api_db_queries_total{view="RecipeManageView.list"} 6', text)
+        self.assertIn('api_response_bytes_total{view="RecipeManageView.list"} 200', text)
+        self.assertIn('api_phase_seconds_total'
+                      '{view="RecipeManageView.list",phase="serialize"} 0.5', text)
+
+    def test_labels_are_escaped(self):
+        registry=MetricsRegistry()
+        metrics=RequestMetrics()
+        metrics.view='a"b\\c'
+
+        registry.observe(metrics, 'GET', 404)
+
+        self.assertIn('view="a\\"b\\\\c"', registry.render())
+
+
+class TestMetricsEndpoint(SimpleTestCase):
+
+    def setUp(self):
+        metrics_registry.reset()
+
+    def test_disabled(self):
+        """test the middleware drops out and the endpoint is hidden when disabled"""
+        with override_settings(PERFORMANCE_METRICS={'ENABLED':False}):
+            with self.assertRaises(MiddlewareNotUsed):
+                PerformanceMiddleware(lambda request: HttpResponse())
+
+            response=self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERFORMANCE_METRICS=ENABLED)
+    def test_enabled(self):
+        self.client.get(METRICS_URL)
+        response=self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Server-Timing', response)
+        self.assertIn('recipe_api_requests_total{view="metrics",method="GET",status="200"} 1',
+                      response.content.decode())
+
+
+@override_settings(PERFORMANCE_METRICS=ENABLED)
+class TestInstrumentedViews(TestCase):
+
+    def setUp(self):
+        metrics_registry.reset()
+        reset_response_cache()
+
+        self.user=get_user_model().objects.create(
+            email='metricsuser@email.com',
+            password='metricsuser',
+        )
+        Recipe.objects.create(user=self.user, title='test', time_minute=10,
+                              price=Decimal('5.20'))
+        self.token, self.key=AuthToken.objects.create_token(self.user)
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        reset_response_cache()
+
+    def test_list_is_measured_by_action(self):
+        """test the recipe list reports its queries, serializer and renderer"""
+        response=self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        timing=response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('render;dur=', timing)
+
+        stats=metrics_registry.views['RecipeManageView.list']
+        self.assertEqual(stats.count, 1)
+        self.assertGreater(stats.db_queries, 0)
+        self.assertEqual(stats.response_bytes, len(response.content))
+        self.assertEqual(set(stats.phases), {'serialize', 'render'})
+
+    def test_detail_action_name(self):
+        recipe=Recipe.objects.get(user=self.user)
+
+        self.client.get(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        self.assertIn('RecipeManageView.retrieve', metrics_registry.views)
+
+    async def test_asgi_counts_queries_of_sync_views(self):
+        """test queries run by a view on a worker thread under asgi are counted"""
+        response=await self.async_client.get(TAGS_URL,
+                                             HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+        self.assertGreater(metrics_registry.views['TagView.list'].db_queries, 0)
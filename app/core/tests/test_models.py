@@ -3,6 +3,7 @@
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.db import IntegrityError, transaction
 from decimal import Decimal
 from core.models import Recipe, Tag, Ingredient, get_image_path
 from unittest.mock import patch
@@ -83,6 +84,16 @@ class TestModels(TestCase):
         self.assertEqual(str(tag), tag.name)
 
 
+    def test_duplicate_names_rejected(self):
+        """testing a user cannot own two tags or ingredients with the same name."""
+        user = get_user_model().objects.create(email='names@email.com')
+
+        for model in (Tag, Ingredient):
+            model.objects.create(user=user, name='salt')
+
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                model.objects.create(user=user, name='salt')
+
     def test_create_ingredient(self):
         """test creating new Ingredient"""
 
@@ -0,0 +1,133 @@
+"""tests for the database connection pool"""
+from django.test import SimpleTestCase
+from core.db.pool import ConnectionPool, PoolTimeout, collect_pool_metrics
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS,
+                                 TRANSACTION_STATUS_UNKNOWN)
+from types import SimpleNamespace
+from unittest.mock import patch
+import threading
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed=0
+        self.info=SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.rollbacks=0
+
+    def close(self):
+        self.closed=1
+
+    def rollback(self):
+        self.rollbacks+=1
+        self.info.transaction_status=TRANSACTION_STATUS_IDLE
+
+
+class TestConnectionPool(SimpleTestCase):
+
+    def get_pool(self, **kwargs):
+        self.opened=[]
+
+        def connect():
+            conn=FakeConnection()
+            self.opened.append(conn)
+            return conn
+
+        return ConnectionPool(connect, **kwargs)
+
+    def test_reuses_returned_connection(self):
+        pool=self.get_pool()
+
+        conn=pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.stats.checkouts, 2)
+        self.assertEqual((pool.size, pool.idle, pool.in_use), (1, 0, 1))
+
+    def test_rolls_back_returned_transaction(self):
+        pool=self.get_pool()
+
+        conn=pool.getconn()
+        conn.info.transaction_status=TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(pool.idle, 1)
+
+    def test_discards_broken_connection(self):
+        pool=self.get_pool()
+
+        conn=pool.getconn()
+        conn.info.transaction_status=TRANSACTION_STATUS_UNKNOWN
+        pool.putconn(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+        self.assertEqual(pool.stats.discarded, 1)
+
+    def test_replaces_connection_closed_while_idle(self):
+        pool=self.get_pool()
+
+        conn=pool.getconn()
+        pool.putconn(conn)
+        conn.closed=1
+
+        self.assertIsNot(pool.getconn(), conn)
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(pool.stats.created, 2)
+
+    def test_expired_connection_is_closed(self):
+        pool=self.get_pool(max_lifetime=60)
+
+        with patch('core.db.pool.time.monotonic', return_value=0):
+            conn=pool.getconn()
+
+        with patch('core.db.pool.time.monotonic', return_value=61):
+            pool.putconn(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 0)
+
+    def test_times_out_when_full(self):
+        pool=self.get_pool(max_size=1, timeout=0.01)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+        self.assertEqual(pool.stats.timeouts, 1)
+        self.assertEqual(pool.stats.waits, 1)
+
+    def test_waits_for_returned_connection(self):
+        pool=self.get_pool(max_size=1, timeout=5)
+        conn=pool.getconn()
+        timer=threading.Timer(0.05, pool.putconn, [conn])
+        timer.start()
+
+        self.assertIs(pool.getconn(), conn)
+        timer.join()
+        self.assertEqual(pool.stats.waits, 1)
+        self.assertGreater(pool.stats.wait_time, 0)
+
+    def test_failed_connect_frees_room(self):
+        pool=ConnectionPool(lambda: 1 / 0, max_size=1, timeout=0.01)
+
+        with self.assertRaises(ZeroDivisionError):
+            pool.getconn()
+
+        self.assertEqual(pool.size, 0)
+
+    def test_collects_metrics(self):
+        pool=self.get_pool(max_size=3)
+        pool.putconn(pool.getconn())
+
+        with patch.dict('core.db.pool._pools', {('default', ()):pool}, clear=True):
+            lines=collect_pool_metrics('test')
+
+        self.assertIn('test_db_pool_size{database="default"} 1', lines)
+        self.assertIn('test_db_pool_idle{database="default"} 1', lines)
+        self.assertIn('test_db_pool_max_size{database="default"} 3', lines)
+        self.assertIn('test_db_pool_checkouts_total{database="default"} 1', lines)
+        self.assertIn('# TYPE test_db_pool_wait_seconds_total counter', lines)
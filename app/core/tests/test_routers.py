@@ -0,0 +1,119 @@
+"""tests for routing reads to replicas"""
+from django.test import SimpleTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework.viewsets import ViewSet
+from core.db.routers import (ReplicaLagMonitor, ReplicaReadMixin, ReplicaRouter,
+                             choose_read_database, get_read_database, is_pinned,
+                             pin_to_primary, replica_lag_monitor, reset_pin_cache)
+from core.models import Recipe
+from types import SimpleNamespace
+from unittest.mock import patch
+
+
+REPLICAS={'ALIASES':['replica1', 'replica2'], 'PIN_SECONDS':5, 'MAX_LAG':2,
+          'LAG_CHECK_INTERVAL':1}
+
+
+class ReadView(ReplicaReadMixin, APIView):
+    authentication_classes=[]
+    permission_classes=[]
+
+    def get(self, request):
+        return Response({'database':get_read_database()})
+
+
+class ReadViewSet(ReplicaReadMixin, ViewSet):
+    authentication_classes=[]
+    permission_classes=[]
+    primary_actions=('progress',)
+
+    def list(self, request):
+        return Response({'database':get_read_database()})
+
+    def progress(self, request):
+        return Response({'database':get_read_database()})
+
+
+def get_request(method='GET', user_id=1):
+    user=SimpleNamespace(pk=user_id, is_authenticated=True)
+    return SimpleNamespace(method=method, user=user)
+
+
+@override_settings(READ_REPLICAS=REPLICAS)
+class TestChooseReadDatabase(SimpleTestCase):
+
+    def setUp(self):
+        reset_pin_cache()
+        replica_lag_monitor.reset()
+        patcher=patch.object(ReplicaLagMonitor, '_measure', return_value=0.0)
+        self.measure=patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(reset_pin_cache)
+        self.addCleanup(replica_lag_monitor.reset)
+
+    def test_reads_go_to_replica(self):
+        self.assertIn(choose_read_database(get_request()), REPLICAS['ALIASES'])
+
+    def test_writes_go_to_primary(self):
+        self.assertIsNone(choose_read_database(get_request('POST')))
+
+    @override_settings(READ_REPLICAS={'ALIASES':[]})
+    def test_no_replicas(self):
+        self.assertIsNone(choose_read_database(get_request()))
+
+    @patch('core.db.routers.transaction.on_commit', lambda func: func())
+    def test_pinned_user_reads_primary(self):
+        pin_to_primary([1])
+
+        self.assertTrue(is_pinned(1))
+        self.assertIsNone(choose_read_database(get_request(user_id=1)))
+        self.assertIsNotNone(choose_read_database(get_request(user_id=2)))
+
+    def test_lagging_replica_is_skipped(self):
+        self.measure.side_effect=lambda alias: 10.0 if alias == 'replica1' else 0.0
+
+        self.assertEqual(choose_read_database(get_request()), 'replica2')
+
+    def test_falls_back_to_primary_when_all_lag(self):
+        self.measure.return_value=float('inf')
+
+        self.assertIsNone(choose_read_database(get_request()))
+
+    def test_lag_is_measured_once_per_interval(self):
+        for _ in range(3):
+            choose_read_database(get_request())
+
+        self.assertEqual(self.measure.call_count, 2)
+
+
+class TestReplicaRouter(SimpleTestCase):
+
+    def test_routes(self):
+        router=ReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(Recipe))
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+        self.assertTrue(router.allow_migrate('default', 'core'))
+        self.assertFalse(router.allow_migrate('replica1', 'core'))
+
+    @override_settings(READ_REPLICAS=REPLICAS)
+    def test_view_reads_from_replica_during_dispatch(self):
+        with patch('core.db.routers.choose_read_database', return_value='replica1'):
+            response=ReadView.as_view()(APIRequestFactory().get('/'))
+
+        self.assertEqual(response.data, {'database':'replica1'})
+        self.assertIsNone(get_read_database())
+        self.assertEqual(ReplicaRouter().db_for_read(Recipe), None)
+
+    @override_settings(READ_REPLICAS=REPLICAS)
+    def test_primary_actions_read_from_primary(self):
+        request=APIRequestFactory().get('/')
+
+        with patch('core.db.routers.choose_read_database', return_value='replica1'):
+            listed=ReadViewSet.as_view({'get':'list'})(request)
+            progress=ReadViewSet.as_view({'get':'progress'})(request)
+
+        self.assertEqual(listed.data, {'database':'replica1'})
+        self.assertEqual(progress.data, {'database':None})
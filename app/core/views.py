@@ -1,3 +1,17 @@
-from django.shortcuts import render
+"""views of the core app"""
+from django.http import Http404, HttpResponse
+from .metrics import get_metrics_settings, metrics_registry
 
-# Create your views here.
+
+PROMETHEUS_CONTENT_TYPE='text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """exposes the request metrics of this process to prometheus."""
+    options=get_metrics_settings()
+
+    if not options['ENABLED']:
+        raise Http404
+
+    return HttpResponse(metrics_registry.render(options['PREFIX']),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
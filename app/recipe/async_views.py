@@ -0,0 +1,172 @@
+"""async entry points of the recipe read endpoints for asgi deployments"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.exceptions import APIException
+from rest_framework.routers import DefaultRouter
+from user.authentication import CachedTokenAuthentication, LRUTokenCache
+from .caching import ConditionalListMixin, aget_data_version, get_response_cache
+import functools
+
+
+DEFAULT_ASYNC_READS={
+    'ENABLED':False,
+    'THREAD_SENSITIVE':False,
+}
+
+READ_ACTIONS=('list', 'retrieve')
+
+
+def get_async_settings():
+    """returns ASYNC_READS merged over the defaults."""
+    return {**DEFAULT_ASYNC_READS, **getattr(settings, 'ASYNC_READS', {})}
+
+
+def run_in_worker(func):
+    """returns an awaitable running the sync func on a worker thread.
+
+    unlike the default of asgiref every call may get its own thread, so a
+    slow render does not hold up the others. such threads own their
+    database connections, which are closed or kept for reuse around each
+    call just like the handler does it for a request.
+    """
+    thread_sensitive=get_async_settings()['THREAD_SENSITIVE']
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        if not thread_sensitive:
+            close_old_connections()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if not thread_sensitive:
+                close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=thread_sensitive)
+
+
+def as_async_read_view(view):
+    """returns an async view answering the list and retrieve actions of a
+    viewset view on the event loop as far as it can.
+
+    the token is checked with the async orm, and a list poll whose etag
+    still matches, or whose body is cached, is answered without a thread.
+    rendering and every other method run the sync view on a worker
+    thread, authenticated already. anything unexpected, like a missing
+    token, is left to the sync view to answer as it always does.
+    """
+    sync_view=run_in_worker(_rendered(view))
+    authentication=CachedTokenAuthentication()
+
+    async def async_view(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_view(request, *args, **kwargs)
+
+        credentials=await authentication.aauthenticate(request)
+
+        if credentials is None:
+            return await sync_view(request, *args, **kwargs)
+
+        request._force_auth_user, request._force_auth_token=credentials
+
+        if view.actions.get('get') == 'list' and issubclass(view.cls, ConditionalListMixin):
+            response=await _get_known_list_response(view, request, args, kwargs)
+
+            if response is not None:
+                return response
+
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.cls=view.cls
+    async_view.actions=view.actions
+    async_view.initkwargs=view.initkwargs
+    async_view.csrf_exempt=True
+
+    return async_view
+
+
+def _rendered(view):
+    """returns view rendering its response before handing it back, so the
+    render happens on the worker thread instead of the one thread asgi
+    renders deferred responses on."""
+    @functools.wraps(view)
+    def rendered_view(request, *args, **kwargs):
+        response=view(request, *args, **kwargs)
+
+        if hasattr(response, 'render'):
+            response.render()
+
+        return response
+
+    return rendered_view
+
+
+async def _get_known_list_response(view, request, args, kwargs):
+    """returns the 304 or cached list response, None when it has to be rendered."""
+    viewset=view.cls(**view.initkwargs)
+    viewset.action_map=view.actions
+
+    for method, action in view.actions.items():
+        setattr(viewset, method, getattr(viewset, action))
+
+    if hasattr(viewset, 'get') and not hasattr(viewset, 'head'):
+        viewset.head=viewset.get
+
+    viewset.args=args
+    viewset.kwargs=kwargs
+    viewset.format_kwarg=viewset.get_format_suffix(**kwargs)
+
+    drf_request=viewset.initialize_request(request, *args, **kwargs)
+    viewset.request=drf_request
+    viewset.headers=viewset.default_response_headers
+
+    try:
+        viewset.initial(drf_request, *args, **kwargs)
+    except APIException:
+        return None
+
+    version, modified=await aget_data_version(drf_request.user.pk)
+    etag=viewset.get_list_etag(drf_request, version)
+    cache=get_response_cache()
+
+    # caches out of process may block, those are looked up on a thread
+    if not isinstance(cache, LRUTokenCache):
+        cache=None
+
+    response=viewset.get_known_response(drf_request, etag, modified, cache)
+
+    if response is None:
+        return None
+
+    viewset.set_conditional_headers(response, etag, modified)
+    response=viewset.finalize_response(drf_request, response, *args, **kwargs)
+
+    if hasattr(response, 'render'):
+        response.render()
+
+    return response
+
+
+class AsyncReadRouter(DefaultRouter):
+    """router serving the list and retrieve routes of viewsets with
+    `async_reads` through `as_async_read_view` when ASYNC_READS is on."""
+
+    def get_urls(self):
+        urls=super().get_urls()
+
+        if not get_async_settings()['ENABLED']:
+            return urls
+
+        return [self._get_async_url(url) for url in urls]
+
+    def _get_async_url(self, url):
+        view=getattr(url, 'callback', None)
+        cls=getattr(view, 'cls', None)
+
+        if (cls is None or not getattr(cls, 'async_reads', False)
+                or getattr(view, 'actions', {}).get('get') not in READ_ACTIONS):
+            return url
+
+        return URLPattern(url.pattern, as_async_read_view(view), url.default_args, url.name)
@@ -0,0 +1,216 @@
+"""per user data versions and conditional, cached list responses"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from user.authentication import LRUTokenCache, DjangoTokenCache
+from core.db.routers import pin_to_primary
+import hashlib
+
+
+DEFAULT_RESPONSE_CACHE={
+    'BACKEND':'lru',
+    'MAX_SIZE':1000,
+    'MAX_BYTES':64 * 1024 * 1024,
+    'TTL':300,
+    'MAX_BODY_SIZE':1024 * 1024,
+}
+
+
+def bump_data_version(user_ids):
+    """marks the recipes, tags and ingredients of users as changed and
+    returns the new data version of each user.
+
+    the counter is bumped with an update query, so it commits or rolls back
+    together with the write that caused it and sends no user signals. the
+    row lock it takes is held until commit, so the versions of a user are
+    handed out in commit order. the users read from the primary for a
+    while after the commit, until replicas caught up with the write.
+    """
+    user_ids=sorted(set(user_ids))
+
+    if not user_ids:
+        return {}
+
+    pin_to_primary(user_ids)
+    table=get_user_model()._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET data_version = data_version + 1, data_modified = %s'
+            f' WHERE id = ANY(%s) RETURNING id, data_version',
+            [timezone.now(), user_ids])
+
+        return dict(cursor.fetchall())
+
+
+def lock_data_version(user_id):
+    """takes the row lock `bump_data_version` takes on a user, until the
+    current transaction ends.
+
+    write paths take it before any other row lock, so concurrent writes of
+    a user queue up on the user row in one order instead of each holding a
+    tag or recipe row the other waits for. outside a transaction nothing
+    would stay locked, so nothing is taken.
+    """
+    if not connection.in_atomic_block:
+        return
+
+    table=get_user_model()._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {table} WHERE id = %s FOR NO KEY UPDATE', [user_id])
+
+
+def get_data_version(user_id):
+    """returns the data version and last modification time of a user."""
+    return (get_user_model().objects.filter(pk=user_id)
+            .values_list('data_version', 'data_modified').get())
+
+
+async def aget_data_version(user_id):
+    """async version of `get_data_version`."""
+    return await (get_user_model().objects.filter(pk=user_id)
+                  .values_list('data_version', 'data_modified').aget())
+
+
+class LRUResponseCache(LRUTokenCache):
+    """in process least recently used cache of rendered response bodies."""
+
+
+class DjangoResponseCache(DjangoTokenCache):
+    """response body cache stored in one of the configured django caches."""
+
+    key_prefix='response:'
+
+
+RESPONSE_CACHE_BACKENDS={
+    'lru':LRUResponseCache,
+    'django':DjangoResponseCache,
+}
+
+_response_cache=None
+
+
+def get_response_cache_settings():
+    """returns RESPONSE_CACHE merged over the defaults."""
+    return {**DEFAULT_RESPONSE_CACHE, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_response_cache():
+    """returns the response body cache configured in RESPONSE_CACHE."""
+    global _response_cache
+
+    if _response_cache is None:
+        options=get_response_cache_settings()
+        backend=RESPONSE_CACHE_BACKENDS[options.pop('BACKEND')]
+        options.pop('MAX_BODY_SIZE')
+
+        if backend is DjangoResponseCache:
+            options.pop('MAX_SIZE')
+            options.pop('MAX_BYTES')
+
+        _response_cache=backend(**{key.lower():value for key, value in options.items()})
+
+    return _response_cache
+
+
+def reset_response_cache():
+    """drops the response cache, it is rebuilt from settings on next use."""
+    global _response_cache
+
+    _response_cache=None
+
+
+class ConditionalListMixin:
+    """answers list requests from the data version of the user.
+
+    the strong etag covers the user, their data version, the path with its
+    query string and the negotiated media type. a poll whose etag still
+    matches gets a 304 after a single version query, and a changed etag
+    seen before is answered with the body cached when it was rendered.
+    """
+
+    def list(self, request, *args, **kwargs):
+        version, modified=get_data_version(request.user.pk)
+        etag=self.get_list_etag(request, version)
+        cache=get_response_cache()
+
+        response=self.get_known_response(request, etag, modified, cache)
+
+        if response is None:
+            response=super().list(request, *args, **kwargs)
+            response.add_post_render_callback(
+                lambda rendered: self._store_response(cache, etag, rendered))
+
+        self.set_conditional_headers(response, etag, modified)
+
+        return response
+
+    def get_known_response(self, request, etag, modified, cache=None):
+        """returns a 304 when the client holds the current list, or the body
+        cached when it was last rendered, None when it has to be rendered."""
+        if self.is_not_modified(request, etag, modified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        cached=cache.get(etag) if cache is not None else None
+
+        if cached is None:
+            return None
+
+        content, content_type=cached
+
+        return HttpResponse(content, content_type=content_type)
+
+    def set_conditional_headers(self, response, etag, modified):
+        for header, value in self.get_conditional_headers(etag, modified).items():
+            response[header]=value
+
+    def get_list_etag(self, request, version):
+        digest=hashlib.sha256('|'.join([
+            str(request.user.pk),
+            str(version),
+            request.get_full_path(),
+            request.accepted_media_type or '',
+        ]).encode()).hexdigest()
+
+        return quote_etag(digest)
+
+    def get_conditional_headers(self, etag, modified):
+        headers={'ETag':etag, 'Cache-Control':'private, no-cache'}
+
+        if modified is not None:
+            # dates have whole seconds, so Last-Modified is the end of the second
+            # of the last write and only sent once that second is over: any
+            # later write is then at or after every date handed out
+            last_modified=int(modified.timestamp()) + 1
+
+            if last_modified <= timezone.now().timestamp():
+                headers['Last-Modified']=http_date(last_modified)
+
+        return headers
+
+    def is_not_modified(self, request, etag, modified):
+        """checks If-None-Match, or If-Modified-Since when no etag is sent."""
+        if_none_match=request.headers.get('If-None-Match')
+
+        if if_none_match:
+            return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+
+        since=parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+
+        return (since is not None and modified is not None
+                and modified.timestamp() < since)
+
+    def _store_response(self, cache, etag, response):
+        if response.status_code != status.HTTP_200_OK:
+            return
+
+        if len(response.content) > get_response_cache_settings()['MAX_BODY_SIZE']:
+            return
+
+        cache.set(etag, (response.content, response['Content-Type']))
@@ -0,0 +1,49 @@
+"""streaming exporters for recipe api"""
+from core.renderers import FastJSONRenderer
+import csv
+
+
+class Echo:
+    """file like object returning what is written, used to stream csv rows."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(items, fields):
+    """yields one json document per item."""
+    renderer=FastJSONRenderer()
+
+    for item in items:
+        yield renderer.render(item) + b'\n'
+
+
+def iter_csv(items, fields):
+    """yields a header row and one csv row per item.
+
+    nested lists of named objects are flattened into `|` separated names and
+    image maps into a srcset string.
+    """
+    writer=csv.writer(Echo())
+
+    yield writer.writerow(fields)
+
+    for item in items:
+        yield writer.writerow([_flatten(item[field]) for field in fields])
+
+
+def _flatten(value):
+    """returns value as a single csv cell."""
+    if isinstance(value, list):
+        return '|'.join(str(obj['name']) for obj in value)
+    if isinstance(value, dict):
+        return ', '.join(f'{url} {width}w' for width, url in value.items())
+    if value is None:
+        return ''
+    return value
+
+
+EXPORTERS={
+    'ndjson':(iter_ndjson, 'application/x-ndjson'),
+    'csv':(iter_csv, 'text/csv'),
+}
@@ -0,0 +1,143 @@
+"""query parameter filters for recipe api"""
+from django.db import connection
+from django.db.models import DecimalField, Exists, OuterRef
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ValidationError
+from core.models import Recipe
+from .search import search_recipes
+
+
+MATCH_ANY='any'
+MATCH_ALL='all'
+MATCH_MODES=[MATCH_ANY, MATCH_ALL]
+
+# every ordering ends on the unique id, in the direction of its leading
+# column, so it matches a (user_id, column, id) index scanned either way
+# and gives the cursor a unique position.
+ORDERINGS={
+    '-id':('-id',),
+    'price':('price', 'id'),
+    '-price':('-price', '-id'),
+    'time_minute':('time_minute', 'id'),
+    '-time_minute':('-time_minute', '-id'),
+}
+
+
+class RecipeFilter:
+    """compiles recipe list query parameters into queryset filters.
+
+    relation parameters become correlated EXISTS subqueries: each recipe row
+    is checked against the through table on its own, so the result never
+    contains duplicates and no DISTINCT pass is needed.
+    """
+
+    relations={
+        'tags':(Recipe.tags.through, 'tag_id'),
+        'ingredients':(Recipe.ingredients.through, 'ingredient_id'),
+    }
+    ranges={
+        'price_min':('price__gte', Decimal),
+        'price_max':('price__lte', Decimal),
+        'time_max':('time_minute__lte', int),
+    }
+
+    def __init__(self, query_params):
+        self.query_params=query_params
+
+    def filter_queryset(self, queryset):
+        """returns queryset narrowed by every parameter given."""
+
+        search=self.query_params.get('search')
+
+        if search:
+            queryset=search_recipes(queryset, search)
+
+        for param, (through, column) in self.relations.items():
+            value=self.query_params.get(param)
+
+            if not value:
+                continue
+
+            ids=self._get_ids(param, value)
+            mode=self._get_mode(param)
+
+            queryset=queryset.filter(*self._compile(through, column, ids, mode))
+
+        for param, (lookup, cast) in self.ranges.items():
+            value=self.query_params.get(param)
+
+            if value:
+                number=self._get_number(param, value, cast, self._get_limit(lookup))
+                queryset=queryset.filter(**{lookup:number})
+
+        return queryset
+
+    def get_ordering(self):
+        """returns the ordering of the filtered recipes, the requested one or
+        best match first when searching."""
+        ordering=self.query_params.get('ordering')
+
+        if ordering:
+            if ordering not in ORDERINGS:
+                raise ValidationError(
+                    {'ordering':f'Expected one of {", ".join(ORDERINGS)}.'})
+
+            return ORDERINGS[ordering]
+
+        if self.query_params.get('search'):
+            return ('-search_rank', '-id')
+
+        return ('-id',)
+
+    def _compile(self, through, column, ids, mode):
+        """returns the EXISTS conditions matching ids in the given mode."""
+        links=through.objects.filter(recipe_id=OuterRef('pk'))
+
+        if mode == MATCH_ANY:
+            return [Exists(links.filter(**{f'{column}__in':ids}))]
+
+        return [Exists(links.filter(**{column:obj_id})) for obj_id in ids]
+
+    def _get_ids(self, param, value):
+        """returns list of ids that are specified in value"""
+        try:
+            return sorted({int(str_id) for str_id in value.split(',')})
+        except ValueError:
+            raise ValidationError(
+                {param:'Expected a comma saperated list of ids.'})
+
+    def _get_mode(self, param):
+        """returns the match mode requested for param."""
+        mode=self.query_params.get(f'{param}_match', MATCH_ANY)
+
+        if mode not in MATCH_MODES:
+            raise ValidationError(
+                {f'{param}_match':f'Expected one of {", ".join(MATCH_MODES)}.'})
+
+        return mode
+
+    def _get_limit(self, lookup):
+        """returns the largest value the column filtered by lookup can hold."""
+        field=Recipe._meta.get_field(lookup.split('__')[0])
+
+        if isinstance(field, DecimalField):
+            return (Decimal(10) ** (field.max_digits - field.decimal_places)
+                    - Decimal(10) ** -field.decimal_places)
+
+        return connection.ops.integer_field_range(field.get_internal_type())[1]
+
+    def _get_number(self, param, value, cast, limit):
+        """returns value of param as a non negative number the column can
+        be compared with, at most limit."""
+        try:
+            number=cast(value)
+        except (ValueError, InvalidOperation):
+            raise ValidationError({param:'Expected a positive number.'})
+
+        if not Decimal(number).is_finite() or number < 0:
+            raise ValidationError({param:'Expected a positive number.'})
+
+        if number > limit:
+            raise ValidationError({param:f'Expected a number no greater than {limit}.'})
+
+        return number
@@ -0,0 +1,91 @@
+"""image processing for uploaded recipe images"""
+from django.conf import settings
+from PIL import Image, ImageOps, features
+import io
+
+
+DEFAULT_PIPELINE={
+    'EXECUTOR':'thread',
+    'WORKERS':2,
+    'FORMAT':'WEBP',
+    'QUALITY':85,
+    'MAX_SIZE':2048,
+    'DERIVATIVE_WIDTHS':[128, 512, 1024],
+}
+
+EXTENSIONS={'WEBP':'.webp', 'JPEG':'.jpg'}
+
+
+def get_pipeline_settings():
+    """returns IMAGE_PIPELINE settings merged over the defaults."""
+    return {**DEFAULT_PIPELINE, **getattr(settings, 'IMAGE_PIPELINE', {})}
+
+
+def get_output_format():
+    """returns the configured output format, JPEG when WEBP is unsupported."""
+    image_format=get_pipeline_settings()['FORMAT'].upper()
+
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+
+    return image_format
+
+
+def open_image(file):
+    """decodes file, applying and then dropping its orientation metadata."""
+    image=Image.open(file)
+    image=ImageOps.exif_transpose(image)
+    image.load()
+    image.info={}
+
+    return image
+
+
+def encode_image(image, max_size, image_format, quality):
+    """returns image shrunk to fit max_size and encoded without metadata,
+    kept at its size when max_size is None."""
+    image=image.copy()
+
+    if max_size is not None:
+        image.thumbnail((max_size, max_size))
+
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image=image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image=image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    buffer=io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality)
+
+    return buffer.getvalue()
+
+
+def resize_to_width(image, width):
+    """returns image scaled down to width, keeping its aspect ratio."""
+    height=max(1, round(image.height * width / image.width))
+
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def process_image(file):
+    """returns the re-encoded image, its derivatives and their file extension.
+
+    derivatives are (width, data) pairs for every configured width smaller
+    than the image, images are never upscaled.
+    """
+    options=get_pipeline_settings()
+    image_format=get_output_format()
+
+    with open_image(file) as image:
+        original=encode_image(image, options['MAX_SIZE'], image_format,
+                              options['QUALITY'])
+
+        derivatives=[
+            # already scaled to width, bounding it again would shrink portraits
+            (width, encode_image(resize_to_width(image, width), None,
+                                 image_format, options['QUALITY']))
+            for width in sorted(set(options['DERIVATIVE_WIDTHS']))
+            if width < image.width
+        ]
+
+    return original, derivatives, EXTENSIONS[image_format]
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from core.models import Ingredient
+from recipe.search import autocomplete_names
+from recipe.management.commands.benchsearch import WORDS
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    """benchmarks ingredient name autocomplete over a seeded table.
+
+    ingredients are seeded for a throwaway user inside a transaction that is
+    rolled back at the end.
+    """
+
+    help='explain and time tag and ingredient autocomplete at scale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--query', default='tomat')
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user=get_user_model().objects.create(email='bench@autocomplete.local')
+            self._seed(user, options['ingredients'])
+
+            queryset=Ingredient.objects.filter(user=user)
+            page=autocomplete_names(queryset, options['query']).values(
+                'id', 'name')[:options['limit']]
+
+            self.stdout.write(page.explain(analyze=True))
+
+            samples=[]
+            for _ in range(options['repeat']):
+                start=time.perf_counter()
+                list(page.all())
+                samples.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(f'median autocomplete time: {statistics.median(samples):.2f} ms')
+
+            transaction.set_rollback(True)
+
+    def _seed(self, user, total):
+        """bulk inserts ingredients with random names and merges the trigram
+        index pending list, which autovacuum would do on a live table."""
+        Ingredient.objects.bulk_create(
+            (Ingredient(user=user, name=f'{" ".join(random.sample(WORDS, 2))} {index}')
+             for index in range(total)),
+            batch_size=10000,
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT gin_clean_pending_list('ingredient_name_trgm_idx')")
+            cursor.execute('ANALYZE core_ingredient')
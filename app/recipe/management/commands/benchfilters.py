@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import QueryDict
+from core.models import Recipe, Tag
+from recipe.filters import RecipeFilter
+from decimal import Decimal
+import random
+
+
+class Command(BaseCommand):
+    """compares query plans of the DISTINCT join filter and the EXISTS filter.
+
+    seeds recipes with randomly assigned tags inside a transaction that is
+    rolled back at the end, then prints EXPLAIN ANALYZE output for both.
+    """
+
+    help='explain tag filtering with a DISTINCT join against EXISTS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--tags-per-recipe', type=int, default=4)
+        parser.add_argument('--filter-tags', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user=get_user_model().objects.create(email='bench@filters.local')
+            tags=self._seed(user, options)
+
+            tag_ids=[tag.id for tag in tags[:options['filter_tags']]]
+            base=Recipe.objects.filter(user=user).order_by('-id')
+
+            joined=base.filter(tags__id__in=tag_ids).distinct()[:50]
+            self._explain('distinct join', joined)
+
+            for mode in ('any', 'all'):
+                params=QueryDict(mutable=True)
+                params['tags']=','.join(str(tag_id) for tag_id in tag_ids)
+                params['tags_match']=mode
+
+                exists=RecipeFilter(params).filter_queryset(base)[:50]
+                self._explain(f'exists ({mode})', exists)
+
+            transaction.set_rollback(True)
+
+    def _seed(self, user, options):
+        """bulk inserts tags and recipes linked to a few tags each."""
+        tags=Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(options['tags']))
+        recipes=Recipe.objects.bulk_create(
+            (Recipe(user=user, title=f'recipe {i}', time_minute=10,
+                    price=Decimal('1.00')) for i in range(options['recipes'])),
+            batch_size=5000,
+        )
+
+        through=Recipe.tags.through
+        links=(
+            through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in random.sample(tags, options['tags_per_recipe'])
+        )
+        through.objects.bulk_create(links, batch_size=10000)
+
+        self.stdout.write('analyzing seeded tables...')
+        with transaction.get_connection().cursor() as cursor:
+            cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+            cursor.execute(f'ANALYZE {through._meta.db_table}')
+
+        return tags
+
+    def _explain(self, label, queryset):
+        """writes the analyzed plan of queryset."""
+        self.stdout.write(f'\n=== {label} ===')
+        self.stdout.write(queryset.explain(analyze=True))
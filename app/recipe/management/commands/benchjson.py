@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from recipe.serializers import RecipeSerializer
+from decimal import Decimal
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    """benchmarks rendering a large serialized recipe list to json.
+
+    recipes are seeded for a throwaway user inside a transaction that is
+    rolled back at the end, the list is serialized once and rendered by the
+    rest framework renderer and the fast renderer in turn.
+    """
+
+    help='compare stdlib and orjson rendering of large recipe lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user=get_user_model().objects.create(email='bench@json.local')
+            self._seed(user, options['recipes'])
+
+            request=Request(APIRequestFactory().get('/api/recipe/recipes/'))
+            queryset=(Recipe.objects.filter(user=user)
+                      .prefetch_related('tags', 'ingredients', 'derivatives'))
+            data=RecipeSerializer(queryset, many=True, context={'request':request}).data
+
+            transaction.set_rollback(True)
+
+        results={}
+
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            results[type(renderer).__name__]=self._time(
+                lambda: renderer.render(data), options['repeat'])
+
+        slow, fast=results['JSONRenderer'], results['FastJSONRenderer']
+
+        for name, ms in results.items():
+            self.stdout.write(f'{name:>18} {ms:>10.2f} ms')
+
+        self.stdout.write(f'{"speedup":>18} {slow / fast:>10.1f}x')
+
+    def _seed(self, user, total):
+        """bulk inserts recipes sharing a few tags and ingredients."""
+        recipes=Recipe.objects.bulk_create(
+            (Recipe(user=user, title=f'recipe {i}', time_minute=i % 120,
+                    price=Decimal(i % 500) / 10, link=f'https://example.com/{i}')
+             for i in range(total)),
+            batch_size=5000,
+        )
+        tags=Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(10))
+        ingredients=Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'ingredient {i}') for i in range(20))
+
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[i % 10].id)
+             for i, recipe in enumerate(recipes)),
+            batch_size=5000,
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (Recipe.ingredients.through(recipe_id=recipe.id,
+                                        ingredient_id=ingredients[(i + k) % 20].id)
+             for i, recipe in enumerate(recipes) for k in range(3)),
+            batch_size=5000,
+        )
+
+    def _time(self, func, repeat):
+        """returns the median run time of func in milliseconds."""
+        samples=[]
+
+        for _ in range(repeat):
+            start=time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(samples)
@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from core.models import Recipe
+from recipe.filters import ORDERINGS
+from recipe.pagination import RecipeCursorPagination
+from rest_framework.pagination import Cursor
+from decimal import Decimal
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    """benchmarks deep page latency of keyset against offset pagination.
+
+    seeds recipes for a throwaway user inside a transaction that is rolled
+    back at the end, so it can be pointed at any database.
+    """
+
+    help='compare cursor and offset pagination latency at growing depths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--ordering', choices=list(ORDERINGS), default='-id')
+
+    def handle(self, *args, **options):
+        total=options['recipes']
+        size=options['page_size']
+
+        with transaction.atomic():
+            user=get_user_model().objects.create(email='bench@pagination.local')
+            self._seed(user, total)
+
+            ordering=ORDERINGS[options['ordering']]
+            queryset=Recipe.objects.filter(user=user).order_by(*ordering)
+            fields=[field.lstrip('-') for field in ordering]
+            keys=list(queryset.values_list(*fields))
+
+            self.stdout.write(f'{"depth":>10} {"offset ms":>12} {"cursor ms":>12}')
+
+            for depth in self._depths(total, size):
+                boundary=keys[depth - 1] if depth else None
+
+                offset_ms=self._time(
+                    lambda: list(queryset[depth:depth + size]),
+                    options['repeat'],
+                )
+                cursor_ms=self._time(
+                    lambda: list(self._keyset_page(queryset, ordering, boundary, size)),
+                    options['repeat'],
+                )
+
+                self.stdout.write(f'{depth:>10} {offset_ms:>12.2f} {cursor_ms:>12.2f}')
+
+            transaction.set_rollback(True)
+
+    def _seed(self, user, total):
+        """bulk inserts recipes for the benchmark user."""
+        Recipe.objects.bulk_create(
+            (Recipe(user=user, title=f'recipe {i}', time_minute=i % 120,
+                    price=Decimal(i % 500)) for i in range(total)),
+            batch_size=5000,
+        )
+
+    def _depths(self, total, size):
+        """returns page offsets from the first page to the last one."""
+        fractions=(0, 0.01, 0.1, 0.5, 0.9)
+        return [min(int(total * fraction), total - size) for fraction in fractions]
+
+    def _keyset_page(self, queryset, ordering, boundary, size):
+        """returns the page `RecipeCursorPagination` would fetch."""
+        if boundary is not None:
+            position='|'.join(str(value) for value in boundary)
+            cursor=Cursor(offset=0, reverse=False, position=position)
+            queryset=queryset.filter(
+                RecipeCursorPagination().get_keyset_filter(ordering, cursor))
+        return queryset[:size]
+
+    def _time(self, func, repeat):
+        """returns the median run time of func in milliseconds."""
+        samples=[]
+
+        for _ in range(repeat):
+            start=time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(samples)
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+from core.models import Recipe, Tag, Ingredient, RecipeImageDerivative
+from recipe.readers import RecipeValuesSerializer
+from recipe.serializers import RecipeSerializer
+from decimal import Decimal
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    """benchmarks the per recipe cost of serializing the recipe list.
+
+    recipes are seeded for a throwaway user inside a transaction that is
+    rolled back at the end. each serializer reads the whole list the way the
+    list endpoint does, queries included, and the cost of serializing rows
+    already in memory is timed separately.
+    """
+
+    help='compare the model and values serializers of the recipe list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        total=options['recipes']
+
+        with transaction.atomic():
+            user=get_user_model().objects.create(email='bench@readers.local')
+            self._seed(user, total)
+
+            context={'request':Request(APIRequestFactory().get(
+                '/api/recipe/recipes/', HTTP_HOST='localhost'))}
+            recipes=Recipe.objects.filter(user=user).order_by('-id')
+            queryset=recipes.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+                Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+                'derivatives',
+            )
+            rows=RecipeValuesSerializer.get_queryset(recipes)
+
+            loaded_queryset, loaded_rows=list(queryset), list(rows)
+
+            results={
+                'model (fetch)':self._time(lambda: RecipeSerializer(
+                    queryset.all(), many=True, context=context).data, options['repeat']),
+                'values (fetch)':self._time(lambda: RecipeValuesSerializer(
+                    rows.all(), many=True, context=context).data, options['repeat']),
+                'model (serialize)':self._time(lambda: RecipeSerializer(
+                    loaded_queryset, many=True, context=context).data, options['repeat']),
+                'values (serialize)':self._time(lambda: RecipeValuesSerializer(
+                    loaded_rows, many=True, context=context).data, options['repeat']),
+            }
+
+            transaction.set_rollback(True)
+
+        for name, ms in results.items():
+            self.stdout.write(f'{name:>20} {ms:>10.2f} ms {ms * 1000 / total:>8.1f} us/recipe')
+
+        for step in ('fetch', 'serialize'):
+            speedup=results[f'model ({step})'] / results[f'values ({step})']
+            self.stdout.write(f'{f"speedup ({step})":>20} {speedup:>10.1f}x')
+
+    def _seed(self, user, total):
+        """bulk inserts recipes sharing a few tags and ingredients."""
+        recipes=Recipe.objects.bulk_create(
+            (Recipe(user=user, title=f'recipe {i}', time_minute=i % 120,
+                    price=Decimal(i % 500) / 10, link=f'https://example.com/{i}')
+             for i in range(total)),
+            batch_size=5000,
+        )
+        tags=Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(10))
+        ingredients=Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'ingredient {i}') for i in range(20))
+
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[i % 10].id)
+             for i, recipe in enumerate(recipes)),
+            batch_size=5000,
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (Recipe.ingredients.through(recipe_id=recipe.id,
+                                        ingredient_id=ingredients[(i + k) % 20].id)
+             for i, recipe in enumerate(recipes) for k in range(3)),
+            batch_size=5000,
+        )
+        RecipeImageDerivative.objects.bulk_create(
+            (RecipeImageDerivative(recipe=recipe, width=width,
+                                   image=f'uploads/recipe/{recipe.id}-{width}.webp')
+             for recipe in recipes[::2] for width in (320, 640)),
+            batch_size=5000,
+        )
+
+    def _time(self, func, repeat):
+        """returns the median run time of func in milliseconds."""
+        samples=[]
+
+        for _ in range(repeat):
+            start=time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(samples)
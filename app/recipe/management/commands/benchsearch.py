@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from core.models import Recipe
+from recipe.search import search_recipes
+from decimal import Decimal
+import random
+import statistics
+import time
+
+
+WORDS=('pumpkin soup pie apple tomato basil garlic onion lemon chicken beef '
+       'rice pasta bread cheese butter honey ginger curry mint salad roast '
+       'grill bake stew spicy sweet sour crispy creamy vegan').split()
+
+
+class Command(BaseCommand):
+    """benchmarks ranked full text search over a seeded recipe table.
+
+    recipes are seeded for a throwaway user inside a transaction that is
+    rolled back at the end.
+    """
+
+    help='explain and time ranked recipe search at scale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--query', default='spicy pumpkin')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user=get_user_model().objects.create(email='bench@search.local')
+            self._seed(user, options['recipes'])
+
+            queryset=search_recipes(Recipe.objects.filter(user=user), options['query'])
+            page=queryset.order_by('-search_rank', '-id').only('id', 'title')[:50]
+
+            self.stdout.write(page.explain(analyze=True))
+
+            samples=[]
+            for _ in range(options['repeat']):
+                start=time.perf_counter()
+                list(page.all())
+                samples.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(f'median page time: {statistics.median(samples):.2f} ms')
+
+            transaction.set_rollback(True)
+
+    def _seed(self, user, total):
+        """bulk inserts recipes with random titles and builds their vectors."""
+        Recipe.objects.bulk_create(
+            (Recipe(user=user, title=' '.join(random.sample(WORDS, 3)),
+                    description=' '.join(random.sample(WORDS, 8)),
+                    time_minute=10, price=Decimal('1.00'))
+             for _ in range(total)),
+            batch_size=10000,
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE core_recipe SET search_vector ="
+                " setweight(to_tsvector('english', title), 'A')"
+                " || setweight(to_tsvector('english', description), 'B')"
+                " WHERE user_id = %s", [user.id])
+            cursor.execute('ANALYZE core_recipe')
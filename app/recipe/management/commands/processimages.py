@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.core.files import File
+from core.models import Recipe, ImageJob, ImageUpload
+from recipe.tasks import create_image_job, process_pending_jobs
+from recipe.uploads import discard_upload
+from datetime import timedelta
+import os
+
+
+class Command(BaseCommand):
+    """command to process image jobs left pending, e.g. after a restart"""
+
+    help='process pending recipe image jobs in the foreground.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requeue-stale',
+            type=int,
+            metavar='MINUTES',
+            help='requeue jobs stuck in processing for longer than MINUTES.',
+        )
+        parser.add_argument(
+            '--rebuild-derivatives',
+            action='store_true',
+            help='queue recipes having an image but no derivatives.',
+        )
+        parser.add_argument(
+            '--expire-uploads',
+            type=int,
+            metavar='HOURS',
+            help='discard chunked uploads untouched for longer than HOURS.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue_stale'] is not None:
+            stale_before=timezone.now() - timedelta(minutes=options['requeue_stale'])
+
+            requeued=ImageJob.objects.filter(
+                status=ImageJob.PROCESSING,
+                updated_at__lt=stale_before,
+            ).update(status=ImageJob.PENDING)
+
+            self.stdout.write(f'requeued {requeued} stale jobs.')
+
+        if options['expire_uploads'] is not None:
+            expired_before=timezone.now() - timedelta(hours=options['expire_uploads'])
+            uploads=ImageUpload.objects.filter(updated_at__lt=expired_before)
+
+            for upload in uploads:
+                discard_upload(upload)
+
+            self.stdout.write(f'discarded {len(uploads)} expired uploads.')
+
+        if options['rebuild_derivatives']:
+            recipes=(Recipe.objects.exclude(image='').exclude(image__isnull=True)
+                     .filter(derivatives__isnull=True))
+
+            for recipe in recipes:
+                with recipe.image.open('rb') as image:
+                    create_image_job(recipe, File(image, os.path.basename(image.name)))
+
+            self.stdout.write(f'queued {len(recipes)} recipes for derivatives.')
+
+        processed=process_pending_jobs()
+
+        self.stdout.write(f'processed {processed} image jobs.')
@@ -0,0 +1,121 @@
+"""pagination classes for recipe api"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """keyset pagination walking objects from the newest to the oldest.
+
+    pages are fetched with `id < cursor` instead of an offset, so every page
+    costs the same no matter how deep the client goes. the cursor holds the
+    value of every ordering field and orderings always end on the unique id,
+    so sorting by a column full of ties never falls back to an offset.
+    """
+
+    ordering='-id'
+    page_size=50
+    page_size_query_param='page_size'
+    max_page_size=500
+    position_separator='|'
+
+    def get_ordering(self, request, queryset, view):
+        """uses the cursor ordering of the view when it defines one."""
+        get_cursor_ordering=getattr(view, 'get_cursor_ordering', None)
+
+        if get_cursor_ordering is None:
+            return super().get_ordering(request, queryset, view)
+
+        return get_cursor_ordering()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_position=None
+        cursor=self.decode_cursor(request)
+
+        if cursor is not None and cursor.position is not None:
+            ordering=self.get_ordering(request, queryset, view)
+
+            try:
+                queryset=queryset.filter(self.get_keyset_filter(ordering, cursor))
+            except (ValueError, TypeError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+            self.keyset_position=cursor.position
+
+        page=super().paginate_queryset(queryset, request, view)
+
+        if self.keyset_position is not None:
+            # what the base class sets up for a cursor with a position
+            if self.cursor.reverse:
+                self.has_next=True
+                self.next_position=self.keyset_position
+            else:
+                self.has_previous=True
+                self.previous_position=self.keyset_position
+
+            self.display_page_controls=self.template is not None
+
+        return page
+
+    def decode_cursor(self, request):
+        """returns the cursor of the request, without its position once the
+        queryset has already been filtered by it."""
+        cursor=super().decode_cursor(request)
+
+        if cursor is None or getattr(self, 'keyset_position', None) is None:
+            return cursor
+
+        return cursor._replace(position=None)
+
+    def get_keyset_filter(self, ordering, cursor):
+        """returns the condition selecting rows past the cursor position.
+
+        rows qualify when they are past the position on the first field, or
+        tie with it up to some field and are past it on that one. the first
+        field is also bounded on its own so the database can start the index
+        scan at the position instead of filtering from the first row.
+        """
+        values=cursor.position.split(self.position_separator)
+
+        if len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition=Q()
+        ties={}
+
+        for field, value in zip(ordering, values):
+            attr=field.lstrip('-')
+            lookup='lt' if cursor.reverse != field.startswith('-') else 'gt'
+
+            condition|=Q(**ties, **{f'{attr}__{lookup}':value})
+            ties[attr]=value
+
+        if len(ordering) == 1:
+            return condition
+
+        first=ordering[0].lstrip('-')
+        bound='lte' if cursor.reverse != ordering[0].startswith('-') else 'gte'
+
+        return Q(**{f'{first}__{bound}':values[0]}) & condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            values=(instance[field.lstrip('-')] for field in ordering)
+        else:
+            values=(getattr(instance, field.lstrip('-')) for field in ordering)
+
+        return self.position_separator.join(str(value) for value in values)
+
+
+class OptionalCursorPagination(RecipeCursorPagination):
+    """keyset pagination that only applies when the client asks for a page."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params=request.query_params
+
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,32 @@
+"""parsers for recipe api"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from core.parsers import loads
+import codecs
+
+
+class NDJSONParser(BaseParser):
+    """parses newline delimited json into a list of objects."""
+
+    media_type='application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return []
+
+        parser_context=parser_context or {}
+        encoding=parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        items=[]
+
+        for number, line in enumerate(codecs.getreader(encoding)(stream), 1):
+            if not line.strip():
+                continue
+
+            try:
+                items.append(loads(line))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {number} - {exc}')
+
+        return items
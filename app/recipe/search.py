@@ -0,0 +1,78 @@
+"""full text search over recipes and name autocomplete"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank, SearchVector,
+                                           TrigramWordSimilarity)
+from django.db.models import (BooleanField, ExpressionWrapper, F, FloatField, OuterRef,
+                              Q, Subquery)
+from django.db.models.functions import Cast, Upper
+from core.models import Recipe
+
+
+SEARCH_CONFIG='english'
+
+
+def _names(relation, field):
+    """returns the space separated names linked to the outer recipe."""
+    through=getattr(Recipe, relation).through
+
+    return Subquery(
+        through.objects.filter(recipe_id=OuterRef('pk'))
+        .values('recipe_id')
+        .annotate(names=StringAgg(f'{field}__name', ' '))
+        .values('names')
+    )
+
+
+def get_search_vector():
+    """returns the expression of the stored search document of a recipe.
+
+    the title weighs over the description, which weighs over the names of
+    the recipes tags and ingredients.
+    """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_names('tags', 'tag'), _names('ingredients', 'ingredient'),
+                       weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids):
+    """rebuilds the stored search document of the given recipes."""
+    recipe_ids=list(recipe_ids)
+
+    if not recipe_ids:
+        return 0
+
+    return Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=get_search_vector())
+
+
+def search_recipes(queryset, text):
+    """returns recipes matching text, annotated with their search_rank."""
+    query=SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+
+    # ranks are single precision, cast so cursors round trip them exactly
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+
+
+def autocomplete_names(queryset, text):
+    """returns the tags or ingredients whose names start with or fuzzily
+    contain text, prefix matches first.
+
+    both conditions compare the upper cased name, so they are answered by
+    the same trigram index instead of scanning every row of the user.
+    """
+    text=text.upper()
+    is_prefix=Q(upper_name__startswith=text)
+
+    return (
+        queryset.alias(upper_name=Upper('name'))
+        .filter(is_prefix | Q(upper_name__trigram_word_similar=text))
+        .annotate(
+            is_prefix=ExpressionWrapper(is_prefix, output_field=BooleanField()),
+            similarity=TrigramWordSimilarity(text, 'upper_name'),
+        )
+        .order_by('-is_prefix', '-similarity', 'name', 'id')
+    )
@@ -1,6 +1,43 @@
 """serializers for recipe api"""
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from django.db import transaction
+from core.models import Recipe, Tag, Ingredient, ImageUpload, ImageJob
+from .uploads import get_upload_settings
+from .search import update_search_vectors
+from .sync import mark_changed
+from .caching import lock_data_version
+
+
+def get_by_name(model, user, names):
+    """returns users objects of model keyed by name."""
+    objects=model.objects.filter(user=user, name__in=names)
+
+    return {obj.name:obj for obj in objects}
+
+
+def get_or_create_by_name(model, user, names):
+    """returns users objects named in names, creating missing ones in bulk.
+
+    existing names are resolved in one query and the missing ones are
+    inserted with a single conflict ignoring bulk insert, so concurrent
+    writers creating the same name end up sharing one row. bulk inserts send
+    no signals, so the created rows are stamped for sync here.
+    """
+    names=list(dict.fromkeys(names))
+
+    if not names:
+        return []
+
+    existing=get_by_name(model, user, names)
+    missing=[model(user=user, name=name) for name in names if name not in existing]
+
+    if missing:
+        lock_data_version(user.pk)
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        existing=get_by_name(model, user, names)
+        mark_changed(user.pk, {model:[existing[obj.name].id for obj in missing]})
+
+    return [existing[name] for name in names]
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -19,25 +56,122 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields=['id']
     
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """writes many recipes at once, sharing the nested name lookups.
+
+    tag and ingredient names are deduplicated across the whole list and
+    resolved once, recipes are written with bulk queries and every link is
+    inserted through a single bulk insert per relation. bulk queries send no
+    signals, so search documents are rebuilt and sync versions stamped here
+    in one update each.
+    """
+
+    relations={'tags':Tag, 'ingredients':Ingredient}
+
+    def create(self, validated_data):
+        """bulk create recipes"""
+        recipes=[Recipe(**self._get_fields(attrs)) for attrs in validated_data]
+
+        with transaction.atomic():
+            lock_data_version(self.context['request'].user.pk)
+            Recipe.objects.bulk_create(recipes)
+            self._set_relations(recipes, validated_data)
+            update_search_vectors(recipe.id for recipe in recipes)
+            mark_changed(self.context['request'].user.pk,
+                         {Recipe:[recipe.id for recipe in recipes]})
+
+        return recipes
+
+    def update(self, instance, validated_data):
+        """bulk update recipes, instance is aligned with validated_data."""
+        fields=set()
+
+        for recipe, attrs in zip(instance, validated_data):
+            for attr, value in self._get_fields(attrs).items():
+                setattr(recipe, attr, value)
+                fields.add(attr)
+
+        with transaction.atomic():
+            lock_data_version(self.context['request'].user.pk)
+            if fields:
+                Recipe.objects.bulk_update(instance, fields)
+            self._set_relations(instance, validated_data, replace=True)
+            update_search_vectors(recipe.id for recipe in instance)
+            mark_changed(self.context['request'].user.pk,
+                         {Recipe:[recipe.id for recipe in instance]})
+
+        return instance
+
+    def _get_fields(self, attrs):
+        """returns attrs without the nested relations."""
+        return {key:value for key, value in attrs.items() if key not in self.relations}
+
+    def _set_relations(self, recipes, validated_data, replace=False):
+        """links recipes to the nested objects given for them."""
+        user=self.context['request'].user
+
+        for attr, model in self.relations.items():
+            given=[(recipe, attrs[attr])
+                   for recipe, attrs in zip(recipes, validated_data) if attr in attrs]
+
+            if not given:
+                continue
+
+            names=[item['name'] for recipe, items in given for item in items]
+            objects={obj.name:obj for obj in get_or_create_by_name(model, user, names)}
+
+            through=getattr(Recipe, attr).through
+            column=f'{model._meta.model_name}_id'
+
+            if replace:
+                through.objects.filter(
+                    recipe_id__in=[recipe.id for recipe, items in given]).delete()
+
+            through.objects.bulk_create(
+                [through(recipe_id=recipe.id, **{column:objects[item['name']].id})
+                 for recipe, items in given for item in items],
+                ignore_conflicts=True,
+            )
+
+
 class RecipeSerializer(serializers.ModelSerializer):
 
     tags=TagSerializer(many=True, required=False)
     ingredients=IngredientSerializer(many=True, required=False)
+    images=serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields=['id', 'title', 'price', 'time_minute', 'link', 'tags', 'ingredients']
+        fields=['id', 'title', 'price', 'time_minute', 'link', 'tags', 'ingredients', 'images']
         read_only_fields=['id']
+        list_serializer_class=RecipeListSerializer
+
+    def get_images(self, obj) -> dict:
+        """returns url of every image derivative keyed by its width."""
+        request=self.context.get('request')
+        images={}
+
+        for derivative in obj.derivatives.all():
+            url=derivative.image.url
+
+            if request is not None:
+                url=request.build_absolute_uri(url)
+
+            images[str(derivative.width)]=url
+
+        return images
 
     def create(self, validated_data):
         """create recipe"""
         tags = validated_data.pop('tags', [])
         ingredients= validated_data.pop('ingredients', [])
 
-        recipe=Recipe.objects.create(**validated_data)
+        with transaction.atomic():
+            lock_data_version(validated_data['user'].pk)
+            recipe=Recipe.objects.create(**validated_data)
 
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
         
         return recipe
     
@@ -46,18 +180,20 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+        with transaction.atomic():
+            lock_data_version(instance.user_id)
+            if tags is not None:
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
 
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            if ingredients is not None:
+                instance.ingredients.clear()
+                self._get_or_create_ingredients(ingredients, instance)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        instance.save()
+            instance.save()
         
         return instance
         
@@ -65,18 +201,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         """create and adding tags to the instances tag list"""
 
         user = self.context['request'].user
+        names = [tag['name'] for tag in tags]
 
-        for tag in tags:
-            tag_obj, created=Tag.objects.get_or_create(user=user, **tag)
-            instance.tags.add(tag_obj)
+        instance.tags.add(*get_or_create_by_name(Tag, user, names))
     
     def _get_or_create_ingredients(self, ingredients, instance):
 
         user=self.context['request'].user
+        names=[ingredient['name'] for ingredient in ingredients]
 
-        for ingredient in ingredients:
-            ing_obj, created=Ingredient.objects.get_or_create(user=user, **ingredient)
-            instance.ingredients.add(ing_obj)
+        instance.ingredients.add(*get_or_create_by_name(Ingredient, user, names))
     
 
 
@@ -84,7 +218,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeDetailSerializer(RecipeSerializer):
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description']
+        fields = RecipeSerializer.Meta.fields + ['description', 'image_status']
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + ['image_status']
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -92,7 +227,33 @@ class RecipeImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model=Recipe
-        fields=['id','image',]
-        read_only_fields=['id',]
+        fields=['id','image','image_status',]
+        read_only_fields=['id','image_status',]
         extra_kwargs={'image':{'required':True,},}
 
+
+class ImageJobSerializer(serializers.ModelSerializer):
+    """serializer class for queued recipe image jobs."""
+
+    class Meta:
+        model=ImageJob
+        fields=['id','recipe','status','error',]
+        read_only_fields=fields
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """serializer class for resumable image uploads."""
+
+    class Meta:
+        model=ImageUpload
+        fields=['id','size','received',]
+        read_only_fields=['id','received',]
+
+    def validate_size(self, value):
+        max_size=get_upload_settings()['MAX_SIZE']
+
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(
+                f'Size must be between 1 and {max_size} bytes.')
+
+        return value
@@ -0,0 +1,114 @@
+"""signal handlers keeping recipe search documents and sync versions up to date"""
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from core.models import Recipe, Tag, Ingredient
+from .search import update_search_vectors
+from .sync import mark_changed, mark_deleted
+
+
+SEARCHED_FIELDS={'title', 'description'}
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, update_fields=None, **kwargs):
+    """rebuilds the search document when a searched field may have changed."""
+    if update_fields is not None and not SEARCHED_FIELDS & set(update_fields):
+        return
+
+    update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_search(sender, instance, action, reverse, pk_set, **kwargs):
+    """rebuilds the search documents of recipes gaining or losing names."""
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids=_linked_recipe_ids(sender, instance)
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        update_search_vectors([instance.pk])
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_cleared_recipe_ids', []))
+    else:
+        update_search_vectors(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search(sender, instance, created, **kwargs):
+    """rebuilds the search documents of recipes linked to a renamed object."""
+    if not created:
+        update_search_vectors(_linked_recipe_ids(_get_through(sender), instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_deleted_links(sender, instance, **kwargs):
+    instance._linked_recipe_ids=_linked_recipe_ids(_get_through(sender), instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_search(sender, instance, **kwargs):
+    """rebuilds the search documents of recipes that lost a deleted object."""
+    update_search_vectors(getattr(instance, '_linked_recipe_ids', []))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def mark_saved_changed(sender, instance, created, **kwargs):
+    """stamps a saved object, and the recipes showing a renamed name."""
+    changes={sender:[instance.pk]}
+
+    if sender is not Recipe and not created:
+        changes[Recipe]=_linked_recipe_ids(_get_through(sender), instance)
+
+    mark_changed(instance.user_id, changes)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def mark_deleted_tombstone(sender, instance, origin=None, **kwargs):
+    """records the tombstone of a deleted object, unless its user is deleted."""
+    if isinstance(origin, get_user_model()):
+        return
+
+    mark_deleted(instance.user_id, sender, instance.pk,
+                 {Recipe:getattr(instance, '_linked_recipe_ids', [])})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def mark_linked_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """stamps recipes gaining or losing links, from either side of the
+    relation."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids=[instance.pk]
+    elif action == 'post_clear':
+        recipe_ids=getattr(instance, '_cleared_recipe_ids', [])
+    else:
+        recipe_ids=pk_set
+
+    mark_changed(instance.user_id, {Recipe:recipe_ids})
+
+
+def _get_through(model):
+    return Recipe.tags.through if model is Tag else Recipe.ingredients.through
+
+
+def _linked_recipe_ids(through, instance):
+    """returns ids of recipes linked to a tag or ingredient."""
+    column=f'{instance._meta.model_name}_id'
+
+    return list(through.objects.filter(**{column:instance.pk})
+                .values_list('recipe_id', flat=True))
@@ -0,0 +1,78 @@
+"""delta sync of recipes, tags and ingredients"""
+from django.utils import timezone
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from .caching import bump_data_version, get_data_version
+
+
+SYNCED_MODELS={
+    'recipes':Recipe,
+    'tags':Tag,
+    'ingredients':Ingredient,
+}
+
+
+def mark_changed(user_id, changes):
+    """stamps the changed objects of a user with a new data version.
+
+    changes maps models to the ids of their changed objects. rows are stamped
+    with update queries, so saving them again sends no signals.
+    """
+    version=bump_data_version([user_id]).get(user_id)
+
+    if version is None:
+        return None
+
+    now=timezone.now()
+
+    for model, ids in changes.items():
+        ids=list(ids)
+
+        if ids:
+            model.objects.filter(pk__in=ids).update(sync_version=version, updated_at=now)
+
+    return version
+
+
+def mark_deleted(user_id, model, object_id, changes=None):
+    """records a tombstone for a deleted object of a user, stamping the
+    objects changed by its deletion in the same data version."""
+    version=mark_changed(user_id, changes or {})
+
+    if version is None:
+        return None
+
+    return Tombstone.objects.create(user_id=user_id, model=model._meta.model_name,
+                                    object_id=object_id, sync_version=version)
+
+
+def get_changes(user, since=None):
+    """returns the ids changed and deleted after the since token of a user.
+
+    the token is read first: everything stamped up to it has committed, and
+    whatever commits while the ids are read is sent again on the next sync,
+    never skipped. without a token every id is changed and none deleted.
+    """
+    token, modified=get_data_version(user.pk)
+    deleted={model._meta.model_name:set() for model in SYNCED_MODELS.values()}
+
+    if since is not None:
+        tombstones=(Tombstone.objects.filter(user=user, sync_version__gt=since)
+                    .values_list('model', 'object_id'))
+
+        for name, object_id in tombstones:
+            deleted[name].add(object_id)
+
+    changes={'token':str(token)}
+
+    for key, model in SYNCED_MODELS.items():
+        objects=model.objects.filter(user=user)
+
+        if since is not None:
+            objects=objects.filter(sync_version__gt=since)
+
+        changes[key]={
+            'changed':list(objects.order_by('id').values_list('id', flat=True)),
+            'deleted':sorted(deleted[model._meta.model_name]),
+        }
+
+    return changes
@@ -0,0 +1,206 @@
+"""background processing of uploaded recipe images"""
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from concurrent.futures import Future, ThreadPoolExecutor
+from core.models import Recipe, RecipeImageDerivative, ImageJob
+from .imaging import get_pipeline_settings, process_image
+from .sync import mark_changed
+from .caching import lock_data_version
+import logging
+import threading
+
+
+logger=logging.getLogger(__name__)
+
+
+class SyncExecutor:
+    """executor running submitted work right away in the calling thread."""
+
+    def submit(self, func, *args, **kwargs):
+        future=Future()
+
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+
+        return future
+
+
+_executor=None
+_executor_lock=threading.Lock()
+
+
+def get_executor():
+    """returns the executor configured in IMAGE_PIPELINE."""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            options=get_pipeline_settings()
+
+            if options['EXECUTOR'] == 'sync':
+                _executor=SyncExecutor()
+            else:
+                _executor=ThreadPoolExecutor(
+                    max_workers=options['WORKERS'],
+                    thread_name_prefix='image-pipeline',
+                )
+
+    return _executor
+
+
+def reset_executor():
+    """drops the executor, it is rebuilt from settings on next use."""
+    global _executor
+
+    with _executor_lock:
+        if isinstance(_executor, ThreadPoolExecutor):
+            _executor.shutdown(wait=True)
+        _executor=None
+
+
+def create_image_job(recipe, file):
+    """stores file as a pending job for recipe."""
+    with transaction.atomic():
+        job=ImageJob.objects.create(recipe=recipe, source=file)
+        Recipe.objects.filter(pk=recipe.pk).update(image_status=ImageJob.PENDING)
+        recipe.image_status=ImageJob.PENDING
+
+    return job
+
+
+def enqueue_image(recipe, file):
+    """stores file as a pending job and hands it to the worker pool once
+    the surrounding transaction commits."""
+    with transaction.atomic():
+        job=create_image_job(recipe, file)
+
+        transaction.on_commit(lambda: submit_job(job.id))
+
+    return job
+
+
+def submit_job(job_id):
+    """runs the job on the worker pool."""
+    executor=get_executor()
+
+    if isinstance(executor, SyncExecutor):
+        return executor.submit(run_image_job, job_id)
+
+    return executor.submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    """runs a job in a pool thread, closing the thread's connection after."""
+    try:
+        run_image_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_image_job(job_id):
+    """processes a pending job, returns False if it was not pending.
+
+    any failure marks the job failed and removes the files it wrote. the
+    recipe row is locked while the images are swapped, and a job finishing
+    after a newer job of the same recipe drops its images instead of
+    replacing the newer ones.
+    """
+    job=_claim_job(job_id)
+
+    if job is None:
+        return False
+
+    storage=job.recipe.image.storage
+    new_names=[]
+
+    try:
+        with job.source.open('rb') as source:
+            original, derivatives, extension=process_image(source)
+
+        recipe=job.recipe
+        recipe.image.save('image' + extension, ContentFile(original), save=False)
+        new_names.append(recipe.image.name)
+
+        new_derivatives=[]
+
+        for width, data in derivatives:
+            derivative=RecipeImageDerivative(recipe=recipe, width=width)
+            derivative.image.save(f'{width}w{extension}', ContentFile(data), save=False)
+            new_names.append(derivative.image.name)
+            new_derivatives.append(derivative)
+
+        with transaction.atomic():
+            lock_data_version(recipe.user_id)
+            current=Recipe.objects.select_for_update().get(pk=recipe.pk)
+
+            if ImageJob.objects.filter(recipe=recipe, status=ImageJob.DONE,
+                                       id__gt=job.id).exists():
+                old_names=new_names
+                _finish_job(job, ImageJob.DONE, update_recipe=False)
+            else:
+                old_names=[derivative.image.name for derivative in current.derivatives.all()]
+
+                if current.image:
+                    old_names.append(current.image.name)
+
+                RecipeImageDerivative.objects.filter(recipe=recipe).delete()
+                RecipeImageDerivative.objects.bulk_create(new_derivatives)
+
+                Recipe.objects.filter(pk=recipe.pk).update(image=recipe.image.name)
+                _finish_job(job, ImageJob.DONE)
+    except Exception as exc:
+        logger.warning('image job %s failed: %s', job.id, exc)
+
+        for name in new_names:
+            storage.delete(name)
+
+        _finish_job(job, ImageJob.FAILED, error=str(exc))
+        return True
+
+    for name in old_names:
+        storage.delete(name)
+
+    return True
+
+
+def _claim_job(job_id):
+    """marks a pending job as processing, skipping jobs claimed elsewhere."""
+    with transaction.atomic():
+        job=(ImageJob.objects.select_for_update(skip_locked=True)
+             .select_related('recipe')
+             .filter(id=job_id, status=ImageJob.PENDING)
+             .first())
+
+        if job is None:
+            return None
+
+        job.status=ImageJob.PROCESSING
+        job.save(update_fields=['status', 'updated_at'])
+        Recipe.objects.filter(pk=job.recipe_id).update(
+            image_status=ImageJob.PROCESSING)
+
+    return job
+
+
+def _finish_job(job, status, error='', update_recipe=True):
+    """stores the outcome of job and drops its source file, the recipe
+    shows the status unless update_recipe is False."""
+    job.status=status
+    job.error=error
+    job.save(update_fields=['status', 'error', 'updated_at'])
+
+    if update_recipe:
+        Recipe.objects.filter(pk=job.recipe_id).update(image_status=status)
+        mark_changed(job.recipe.user_id, {Recipe:[job.recipe_id]})
+
+    job.source.storage.delete(job.source.name)
+
+
+def process_pending_jobs():
+    """processes every pending job in the calling thread."""
+    job_ids=ImageJob.objects.filter(status=ImageJob.PENDING).order_by('id')
+
+    return sum(run_image_job(job_id)
+               for job_id in job_ids.values_list('id', flat=True))
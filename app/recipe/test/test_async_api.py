@@ -0,0 +1,119 @@
+"""unit tests for the async read views"""
+from django.test import TestCase, AsyncRequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from core.models import AuthToken, Recipe, Tag
+from recipe import views
+from recipe.async_views import AsyncReadRouter, as_async_read_view
+from recipe.caching import reset_response_cache
+from user.authentication import reset_token_cache
+from decimal import Decimal
+from unittest.mock import patch
+import asyncio
+import json
+
+
+RECIPES_URL=reverse('recipe:recipe-list')
+TAGS_URL=reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(ASYNC_READS={'ENABLED':True, 'THREAD_SENSITIVE':True})
+class AsyncReadViewTest(TestCase):
+    """testing the async list and retrieve paths answer like the sync ones."""
+
+    def setUp(self):
+        reset_response_cache()
+        reset_token_cache()
+
+        self.user=get_user_model().objects.create(
+            email='asyncuser@email.com',
+            password='asyncuser',
+        )
+        self.token, self.key=AuthToken.objects.create_token(self.user)
+        self.recipe=Recipe.objects.create(user=self.user, title='async', time_minute=10,
+                                          price=Decimal('5.20'))
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='fast'))
+
+        self.factory=AsyncRequestFactory()
+
+        self.list_view=as_async_read_view(views.RecipeManageView.as_view({'get':'list'}))
+        self.detail_view=as_async_read_view(
+            views.RecipeManageView.as_view({'get':'retrieve', 'patch':'partial_update'}))
+
+    def tearDown(self):
+        reset_response_cache()
+        reset_token_cache()
+
+    def _get(self, url, **headers):
+        """returns an async get request, headers are named as sent."""
+        return self.factory.get(url, authorization=f'Token {self.key}', **headers)
+
+    async def test_list_matches_sync(self):
+        response=await self.list_view(self._get(RECIPES_URL))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['results'][0]['title'], 'async')
+        self.assertIn('ETag', response)
+
+    async def test_unchanged_list_answered_on_event_loop(self):
+        """test a matching etag is answered without the sync view"""
+        response=await self.list_view(self._get(RECIPES_URL))
+        etag=response['ETag']
+
+        with patch('recipe.views.RecipeManageView.list') as sync_list:
+            response=await self.list_view(self._get(RECIPES_URL, **{'if-none-match':etag}))
+
+        sync_list.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Accept', response['Vary'])
+
+    async def test_cached_list_answered_on_event_loop(self):
+        """test a list rendered before is served from the response cache"""
+        first=await self.list_view(self._get(RECIPES_URL))
+
+        with patch('recipe.views.RecipeManageView.list') as sync_list:
+            second=await self.list_view(self._get(RECIPES_URL))
+
+        sync_list.assert_not_called()
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+
+    async def test_retrieve(self):
+        response=await self.detail_view(self._get(detail_url(self.recipe.id)),
+                                        pk=str(self.recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['tags'], [{'name':'fast'}])
+
+    async def test_missing_token_rejected(self):
+        response=await self.list_view(self.factory.get(RECIPES_URL))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_writes_run_sync_view(self):
+        request=self.factory.patch(detail_url(self.recipe.id), {'title':'renamed'},
+                                   content_type='application/json',
+                                   authorization=f'Token {self.key}')
+
+        response=await self.detail_view(request, pk=str(self.recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['title'], 'renamed')
+
+    def test_router_wraps_read_routes(self):
+        router=AsyncReadRouter()
+        router.register('recipes', views.RecipeManageView)
+        router.register('tags', views.TagView, basename='tag')
+
+        urls={url.name:url.callback for url in router.urls if url.name}
+
+        self.assertTrue(asyncio.iscoroutinefunction(urls['recipe-list']))
+        self.assertTrue(asyncio.iscoroutinefunction(urls['recipe-detail']))
+        self.assertTrue(asyncio.iscoroutinefunction(urls['tag-list']))
+        self.assertFalse(asyncio.iscoroutinefunction(urls['recipe-batch']))
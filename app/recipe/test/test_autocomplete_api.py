@@ -0,0 +1,78 @@
+"""unit tests for tag and ingredient name autocomplete"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Tag, Ingredient
+
+
+TAGS_AUTOCOMPLETE_URL=reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL=reverse('recipe:ingredient-autocomplete')
+
+
+class AutocompleteApiTest(TestCase):
+    """testing the autocomplete endpoints of tags and ingredients."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='autocomplete@email.com',
+            password='autocomplete',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _names(self, url, **params):
+        response=self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [item['name'] for item in response.data]
+
+    def test_prefix_matches_first(self):
+        """test names starting with the text come before fuzzy matches."""
+        for name in ['Cherry tomatoes', 'Tomato', 'Potato', 'Basil']:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        names=self._names(INGREDIENTS_AUTOCOMPLETE_URL, q='tom')
+
+        self.assertEqual(names[0], 'Tomato')
+        self.assertIn('Cherry tomatoes', names)
+        self.assertNotIn('Basil', names)
+
+    def test_fuzzy_match(self):
+        """test a misspelled text still finds the tag."""
+        Tag.objects.create(user=self.user, name='Vegetarian')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, q='vegetarain'),
+                         ['Vegetarian'])
+
+    def test_limit(self):
+        """test only the top matches are returned."""
+        for index in range(5):
+            Tag.objects.create(user=self.user, name=f'spicy {index}')
+
+        self.assertEqual(len(self._names(TAGS_AUTOCOMPLETE_URL, q='spicy', limit=2)), 2)
+
+    def test_invalid_limit(self):
+        """test a non positive limit is rejected."""
+        response=self.client.get(TAGS_AUTOCOMPLETE_URL, {'q':'spicy', 'limit':0})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_text(self):
+        """test no text returns no matches."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, q=' '), [])
+
+    def test_only_own_names(self):
+        """test other users tags are not suggested."""
+        other=get_user_model().objects.create(email='other@email.com')
+        Tag.objects.create(user=other, name='Vegan')
+        mine=Tag.objects.create(user=self.user, name='Vegetarian')
+
+        response=self.client.get(TAGS_AUTOCOMPLETE_URL, {'q':'veg'})
+
+        self.assertEqual(response.data, [{'id':mine.id, 'name':mine.name}])
@@ -0,0 +1,193 @@
+"""unit tests for the batch recipe api"""
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe, Tag, Ingredient
+from decimal import Decimal
+import json
+
+
+BATCH_URL=reverse('recipe:recipe-batch')
+
+
+def recipe_payload(**params):
+    payload={
+        'title':'batch recipe',
+        'time_minute':15,
+        'price':'4.50',
+    }
+    payload.update(params)
+
+    return payload
+
+
+class PublicBatchApiTest(TestCase):
+
+    def test_batch_unauthorized(self):
+        """test authorization is required for batch writes"""
+        response=APIClient().post(BATCH_URL, [], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTest(TestCase):
+    """testing batch create and update of recipes."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='batchuser@email.com',
+            password='batchuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_create(self):
+        """test creating many recipes returns a result per item."""
+        payload=[recipe_payload(title=f'recipe {i}') for i in range(3)]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results=response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created'] * 3)
+
+        for item, result in zip(payload, results):
+            recipe=Recipe.objects.get(id=result['id'])
+            self.assertEqual(recipe.title, item['title'])
+            self.assertEqual(recipe.user, self.user)
+
+    def test_batch_create_ndjson(self):
+        """test recipes can be sent as newline delimited json."""
+        lines=[json.dumps(recipe_payload(title=f'recipe {i}')) for i in range(2)]
+
+        response=self.client.post(BATCH_URL, '\n'.join(lines) + '\n',
+                                  content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_batch_shares_nested_objects(self):
+        """test names repeated across the batch create a single object."""
+        Tag.objects.create(user=self.user, name='existing')
+
+        payload=[
+            recipe_payload(tags=[{'name':'existing'}, {'name':'new'}],
+                           ingredients=[{'name':'salt'}]),
+            recipe_payload(tags=[{'name':'new'}],
+                           ingredients=[{'name':'salt'}, {'name':'salt'}]),
+        ]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+
+        first, second=[Recipe.objects.get(id=result['id'])
+                       for result in response.data['results']]
+
+        self.assertEqual(first.tags.count(), 2)
+        self.assertEqual(second.tags.count(), 1)
+        self.assertEqual(second.ingredients.count(), 1)
+
+    def test_batch_query_count_independent_of_size(self):
+        """test a batch costs the same queries for any number of recipes."""
+        def payload(count):
+            return [recipe_payload(tags=[{'name':f'tag {i}'}]) for i in range(count)]
+
+        query_counts=[]
+
+        for count in (2, 25):
+            with CaptureQueriesContext(connection) as queries:
+                response=self.client.post(BATCH_URL, payload(count), format='json')
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_batch_update(self):
+        """test items carrying an id partially update their recipe."""
+        recipe=Recipe.objects.create(user=self.user, title='old', time_minute=5,
+                                     price=Decimal('1.00'))
+        recipe.tags.add(Tag.objects.create(user=self.user, name='old tag'))
+
+        payload=[
+            {'id':recipe.id, 'title':'updated', 'tags':[{'name':'new tag'}]},
+            recipe_payload(),
+        ]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0],
+                         {'id':recipe.id, 'status':'updated'})
+        self.assertEqual(response.data['results'][1]['status'], 'created')
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'updated')
+        self.assertEqual(recipe.time_minute, 5)
+        self.assertEqual([tag.name for tag in recipe.tags.all()], ['new tag'])
+
+    def test_batch_update_other_users_recipe(self):
+        """test updating another users recipe through a batch fails."""
+        other=get_user_model().objects.create(email='other@email.com')
+        recipe=Recipe.objects.create(user=other, title='other', time_minute=5,
+                                     price=Decimal('1.00'))
+
+        response=self.client.post(BATCH_URL, [{'id':recipe.id, 'title':'mine'}],
+                                  format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data['errors'][0])
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'other')
+
+    def test_batch_rejects_invalid_ids(self):
+        """test ids that are not integers are item errors, not server errors."""
+        payload=[{'id':[1]}, {'id':True}, {'id':'1'}, {'id':None}]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for item_errors in response.data['errors']:
+            self.assertIn('id', item_errors)
+
+    def test_batch_rejects_duplicate_ids(self):
+        """test a recipe updated twice in one batch rejects the batch."""
+        recipe=Recipe.objects.create(user=self.user, title='once', time_minute=5,
+                                     price=Decimal('1.00'))
+        payload=[{'id':recipe.id, 'title':'first'}, {'id':recipe.id, 'title':'second'}]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('id', response.data['errors'][1])
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'once')
+
+    def test_batch_invalid_item_writes_nothing(self):
+        """test one invalid item rejects the batch with per item errors."""
+        payload=[recipe_payload(), recipe_payload(price='not a price')]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('price', response.data['errors'][1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_batch_requires_list(self):
+        """test a single object is not accepted as a batch."""
+        response=self.client.post(BATCH_URL, recipe_payload(), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,165 @@
+"""unit tests for conditional and cached list responses"""
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe, Tag
+from recipe.caching import reset_response_cache, get_response_cache
+from django.utils.http import http_date
+from decimal import Decimal
+from datetime import timedelta
+from unittest.mock import patch
+
+
+RECIPES_URL=reverse('recipe:recipe-list')
+TAGS_URL=reverse('recipe:tag-list')
+BATCH_URL=reverse('recipe:recipe-batch')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class ConditionalListTest(TestCase):
+    """testing etags, 304 responses and the response cache of lists."""
+
+    def setUp(self):
+        reset_response_cache()
+
+        self.user=get_user_model().objects.create(
+            email='pollinguser@email.com',
+            password='pollinguser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        reset_response_cache()
+
+    def _etag(self, url=RECIPES_URL):
+        response=self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response['ETag']
+
+    def test_unchanged_poll_not_modified(self):
+        """test a poll with the current etag gets a 304 after one query."""
+        create_recipe(self.user)
+        etag=self._etag()
+
+        with self.assertNumQueries(1):
+            response=self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def _set_data_modified(self, modified):
+        get_user_model().objects.filter(pk=self.user.pk).update(data_modified=modified)
+
+    def test_if_modified_since(self):
+        """test Last-Modified is honoured when no etag is sent."""
+        create_recipe(self.user)
+        self.user.refresh_from_db()
+
+        with patch('recipe.caching.timezone.now',
+                   return_value=self.user.data_modified + timedelta(seconds=1)):
+            modified=self.client.get(RECIPES_URL)['Last-Modified']
+
+        response=self.client.get(RECIPES_URL, HTTP_IF_MODIFIED_SINCE=modified)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_in_same_second_not_hidden(self):
+        """test a write in the second of the last one is not answered 304."""
+        create_recipe(self.user)
+        self.user.refresh_from_db()
+        second=self.user.data_modified.replace(microsecond=0)
+        self._set_data_modified(second + timedelta(milliseconds=200))
+
+        with patch('recipe.caching.timezone.now',
+                   return_value=second + timedelta(milliseconds=300)):
+            response=self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Last-Modified', response)
+
+        self._set_data_modified(second + timedelta(milliseconds=500))
+        response=self.client.get(RECIPES_URL,
+                                 HTTP_IF_MODIFIED_SINCE=http_date(second.timestamp()))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_writes_change_etag(self):
+        """test creating, linking and deleting all change the etag."""
+        recipe=create_recipe(self.user)
+        tag=Tag.objects.create(user=self.user, name='vegan')
+        etags=[self._etag()]
+
+        recipe.tags.add(tag)
+        etags.append(self._etag())
+
+        tag.recipe_set.clear()
+        etags.append(self._etag())
+
+        recipe.delete()
+        etags.append(self._etag())
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_batch_write_changes_etag(self):
+        """test bulk writes, which send no signals, change the etag."""
+        etag=self._etag()
+
+        response=self.client.post(BATCH_URL, [
+            {'title':'bulk', 'time_minute':5, 'price':'1.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertNotEqual(self._etag(), etag)
+
+    def test_other_users_writes_keep_etag(self):
+        """test another users writes do not invalidate the list."""
+        etag=self._etag(TAGS_URL)
+
+        other=get_user_model().objects.create(email='other@email.com')
+        Tag.objects.create(user=other, name='vegan')
+
+        self.assertEqual(self._etag(TAGS_URL), etag)
+
+    def test_etag_depends_on_query(self):
+        """test differently filtered lists have their own etag."""
+        self.assertNotEqual(self._etag(RECIPES_URL),
+                            self._etag(RECIPES_URL + '?ordering=price'))
+
+    def test_repeated_poll_served_from_cache(self):
+        """test a body rendered before is served without querying the list."""
+        create_recipe(self.user)
+        first=self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            second=self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    @override_settings(RESPONSE_CACHE={'MAX_BODY_SIZE':10})
+    def test_large_bodies_not_cached(self):
+        """test bodies over the size limit are not kept."""
+        reset_response_cache()
+        create_recipe(self.user)
+
+        etag=self._etag()
+
+        self.assertIsNone(get_response_cache().get(etag))
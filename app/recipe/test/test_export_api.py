@@ -0,0 +1,167 @@
+"""unit tests for the recipe export api"""
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.asgi import StreamingASGIHandler
+from core.models import AuthToken, Recipe, Tag
+from recipe.serializers import RecipeDetailSerializer
+from recipe.views import RecipeManageView
+from user.authentication import reset_token_cache
+from decimal import Decimal
+from unittest.mock import patch
+import csv
+import io
+import json
+
+
+EXPORT_URL=reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+            'description':'some description',
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class PrivateExportApiTest(TestCase):
+    """testing streaming export of recipes."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='exportuser@email.com',
+            password='exportuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_unauthorized(self):
+        """test authorization is required to export recipes"""
+        response=APIClient().get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch.object(RecipeManageView, 'export_chunk_size', 2)
+    def test_export_ndjson(self):
+        """test every recipe is streamed as one json line, across chunks."""
+        recipes=[create_recipe(self.user, title=f'r{i}') for i in range(5)]
+        recipes[0].tags.add(Tag.objects.create(user=self.user, name='tag'))
+        create_recipe(get_user_model().objects.create(email='other@email.com'))
+
+        response=self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines=[json.loads(line) for line in self._content(response).splitlines()]
+        expected=[
+            json.loads(json.dumps(RecipeDetailSerializer(recipe).data))
+            for recipe in reversed(recipes)
+        ]
+
+        self.assertEqual(lines, expected)
+
+    def test_export_csv(self):
+        """test recipes are streamed as csv rows with flattened names."""
+        recipe=create_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='tag1'),
+                        Tag.objects.create(user=self.user, name='tag2'))
+
+        response=self.client.get(EXPORT_URL, {'export_format':'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows=list(csv.DictReader(io.StringIO(self._content(response))))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(recipe.id))
+        self.assertEqual(rows[0]['tags'], 'tag1|tag2')
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_filtered(self):
+        """test the export honours the list filters."""
+        tag=Tag.objects.create(user=self.user, name='tag')
+        tagged=create_recipe(self.user)
+        tagged.tags.add(tag)
+        create_recipe(self.user)
+
+        response=self.client.get(EXPORT_URL, {'tags':tag.id})
+
+        lines=self._content(response).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [tagged.id])
+
+    def test_export_unknown_format(self):
+        """test an unknown export format is rejected."""
+        response=self.client.get(EXPORT_URL, {'export_format':'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ASGIExportTest(TransactionTestCase):
+    """testing the export streams through the asgi handler of the deployment."""
+
+    def setUp(self):
+        reset_token_cache()
+        self.addCleanup(reset_token_cache)
+
+        self.user=get_user_model().objects.create(
+            email='asgiexport@email.com',
+            password='asgiexport',
+        )
+        self.token, self.key=AuthToken.objects.create_token(self.user)
+
+        for index in range(3):
+            create_recipe(self.user, title=f'asgi {index}')
+
+    async def get(self, handler, path):
+        """sends a get request through handler, returns the sent messages."""
+        scope={
+            'type':'http',
+            'asgi':{'version':'3.0'},
+            'http_version':'1.1',
+            'method':'GET',
+            'scheme':'http',
+            'path':path,
+            'raw_path':path.encode(),
+            'query_string':b'',
+            'root_path':'',
+            'headers':[(b'host', b'testserver'),
+                       (b'authorization', f'Token {self.key}'.encode())],
+            'server':('testserver', 80),
+            'client':('127.0.0.1', 5000),
+        }
+        messages=[]
+
+        async def receive():
+            return {'type':'http.request', 'body':b'', 'more_body':False}
+
+        async def send(message):
+            messages.append(message)
+
+        await handler(scope, receive, send)
+
+        return messages
+
+    async def test_export_streams_under_asgi(self):
+        messages=await self.get(StreamingASGIHandler(), EXPORT_URL)
+
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        self.assertFalse(messages[-1].get('more_body', False))
+
+        body=b''.join(message.get('body', b'') for message in messages[1:])
+        titles=[json.loads(line)['title'] for line in body.decode().splitlines()]
+        self.assertEqual(sorted(titles), ['asgi 0', 'asgi 1', 'asgi 2'])
@@ -0,0 +1,207 @@
+"""unit tests for the recipe image pipeline"""
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import Recipe, ImageJob
+from recipe.tasks import enqueue_image, reset_executor, run_image_job
+from unittest.mock import patch
+from decimal import Decimal
+from PIL import Image
+import io
+import os
+
+
+def list_media_files():
+    return {os.path.join(root, name)
+            for root, dirs, names in os.walk(settings.MEDIA_ROOT) for name in names}
+
+
+def make_image(size=(600, 400), image_format='JPEG', **save_kwargs):
+    buffer=io.BytesIO()
+    Image.new('RGB', size, color='red').save(buffer, format=image_format,
+                                             **save_kwargs)
+
+    return SimpleUploadedFile('upload.jpg', buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(IMAGE_PIPELINE={'EXECUTOR':'sync', 'FORMAT':'WEBP',
+                                   'MAX_SIZE':300,
+                                   'DERIVATIVE_WIDTHS':[64, 128, 1024]})
+class ImagePipelineTest(TestCase):
+    """testing processing of uploaded recipe images."""
+
+    def setUp(self):
+        reset_executor()
+
+        user=get_user_model().objects.create(email='pipeline@email.com')
+        self.recipe=Recipe.objects.create(user=user, title='recipe',
+                                          time_minute=5, price=Decimal('1.00'))
+
+    def tearDown(self):
+        reset_executor()
+
+        self.recipe.refresh_from_db()
+        for derivative in self.recipe.derivatives.all():
+            derivative.image.delete(save=False)
+        if self.recipe.image:
+            self.recipe.image.delete(save=False)
+
+    def _enqueue(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            job=enqueue_image(self.recipe, file)
+
+        job.refresh_from_db()
+        self.recipe.refresh_from_db()
+
+        return job
+
+    def test_image_reencoded_without_metadata(self):
+        """test images are resized, converted to webp and lose their exif."""
+        exif=Image.Exif()
+        exif[0x010e]='secret description'
+
+        job=self._enqueue(make_image(exif=exif.tobytes()))
+
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertEqual(self.recipe.image_status, 'done')
+        self.assertTrue(self.recipe.image.name.endswith('.webp'))
+
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (300, 200))
+            self.assertNotIn('exif', image.info)
+
+        derivatives=list(self.recipe.derivatives.all())
+        self.assertEqual([derivative.width for derivative in derivatives], [64, 128])
+
+        with Image.open(derivatives[0].image.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 43))
+            self.assertNotIn('exif', thumbnail.info)
+
+        self.assertFalse(os.path.exists(job.source.path))
+
+    @override_settings(IMAGE_PIPELINE={'EXECUTOR':'sync', 'FORMAT':'JPEG'})
+    def test_jpeg_output(self):
+        """test the output format follows the settings."""
+        self._enqueue(make_image())
+
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+
+    def test_replacing_image_deletes_old_files(self):
+        """test processing a new upload drops the previous derivatives."""
+        self._enqueue(make_image())
+        old_paths=[self.recipe.image.path] + [
+            derivative.image.path for derivative in self.recipe.derivatives.all()]
+
+        self._enqueue(make_image())
+
+        self.assertEqual(self.recipe.derivatives.count(), 2)
+        self.assertNotIn(self.recipe.image.path, old_paths)
+        for path in old_paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_list_exposes_derivative_urls(self):
+        """test the recipe list serves a url per derivative width."""
+        self._enqueue(make_image())
+
+        client=APIClient()
+        client.force_authenticate(user=self.recipe.user)
+        response=client.get(reverse('recipe:recipe-list'))
+
+        images=response.data['results'][0]['images']
+
+        self.assertEqual(list(images), ['64', '128'])
+        for width, derivative in zip(images, self.recipe.derivatives.all()):
+            self.assertEqual(
+                images[width], f'http://testserver{derivative.image.url}')
+
+    def test_portrait_derivatives_keep_their_width(self):
+        """test derivatives of tall images are as wide as they are labelled."""
+        self._enqueue(make_image(size=(200, 400)))
+
+        derivatives=list(self.recipe.derivatives.all())
+        self.assertEqual([derivative.width for derivative in derivatives], [64, 128])
+
+        for derivative in derivatives:
+            with Image.open(derivative.image.path) as image:
+                self.assertEqual(image.size, (derivative.width, derivative.width * 2))
+
+    def test_small_image_not_upscaled(self):
+        """test no derivative is wider than the uploaded image."""
+        self._enqueue(make_image(size=(100, 100)))
+
+        widths=[derivative.width for derivative in self.recipe.derivatives.all()]
+        self.assertEqual(widths, [64])
+
+    def test_broken_image_marks_job_failed(self):
+        """test undecodable files fail the job and keep the recipe usable."""
+        broken=SimpleUploadedFile('upload.jpg', b'not an image')
+
+        job=self._enqueue(broken)
+
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertTrue(job.error)
+        self.assertEqual(self.recipe.image_status, 'failed')
+        self.assertFalse(self.recipe.image)
+
+    def test_failed_apply_removes_new_files(self):
+        """test a job failing after writing its images marks itself failed
+        and leaves no files behind."""
+        files=list_media_files()
+
+        with patch('recipe.tasks.RecipeImageDerivative.objects.bulk_create',
+                   side_effect=OSError('disk full')):
+            job=self._enqueue(make_image())
+
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(self.recipe.image_status, 'failed')
+        self.assertFalse(self.recipe.image)
+        self.assertEqual(list_media_files(), files)
+
+    def test_older_job_does_not_replace_newer_image(self):
+        """test a job finishing after a newer one keeps the newer images."""
+        older=ImageJob.objects.create(recipe=self.recipe, source=make_image())
+        newer=ImageJob.objects.create(recipe=self.recipe, source=make_image())
+
+        run_image_job(newer.id)
+        self.recipe.refresh_from_db()
+        image=self.recipe.image.name
+        files=list_media_files() - {older.source.path}
+
+        run_image_job(older.id)
+
+        older.refresh_from_db()
+        self.recipe.refresh_from_db()
+        self.assertEqual(older.status, ImageJob.DONE)
+        self.assertEqual(self.recipe.image.name, image)
+        self.assertEqual(list_media_files(), files)
+
+    def test_job_runs_once(self):
+        """test a job that is no longer pending is not processed again."""
+        job=self._enqueue(make_image())
+
+        self.assertFalse(run_image_job(job.id))
+
+    def test_process_pending_command(self):
+        """test the command processes jobs left pending."""
+        job=ImageJob.objects.create(recipe=self.recipe, source=make_image())
+
+        call_command('processimages', stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+
+    def test_rebuild_derivatives_command(self):
+        """test recipes with an image but no derivatives are reprocessed."""
+        self._enqueue(make_image())
+        self.recipe.derivatives.all().delete()
+
+        call_command('processimages', '--rebuild-derivatives', stdout=io.StringIO())
+
+        self.assertEqual(self.recipe.derivatives.count(), 2)
@@ -0,0 +1,188 @@
+"""unit tests for range filters and orderings of the recipe list"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe
+from recipe.search import update_search_vectors
+from recipe.pagination import RecipeCursorPagination
+from rest_framework.pagination import Cursor
+from decimal import Decimal
+
+
+RECIPES_URL=reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class RecipeRangeFilterTest(TestCase):
+    """testing price and time filters of the recipe list."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='rangeuser@email.com',
+            password='rangeuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _ids(self, **params):
+        response=self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return {item['id'] for item in response.data['results']}
+
+    def test_price_range(self):
+        """test recipes outside the price range are excluded."""
+        create_recipe(self.user, price=Decimal('2.00'))
+        middle=create_recipe(self.user, price=Decimal('5.00'))
+        create_recipe(self.user, price=Decimal('9.00'))
+
+        self.assertEqual(self._ids(price_min='3', price_max='5.00'), {middle.id})
+
+    def test_time_max(self):
+        """test recipes taking longer than time_max are excluded."""
+        quick=create_recipe(self.user, time_minute=15)
+        create_recipe(self.user, time_minute=90)
+
+        self.assertEqual(self._ids(time_max=15), {quick.id})
+
+    def test_invalid_ranges(self):
+        """test non numeric or negative bounds are rejected."""
+        for params in ({'price_min':'cheap'}, {'price_max':'NaN'},
+                       {'time_max':'-1'}, {'time_max':'1.5'}):
+            response=self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_out_of_range_bounds(self):
+        """test bounds the columns cannot hold are rejected."""
+        for params in ({'price_max':'1e200'}, {'price_min':'10000'},
+                       {'time_max':'99999999999999999999'}):
+            response=self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        recipe=create_recipe(self.user)
+        self.assertEqual(self._ids(price_max='9999.99', time_max='2147483647'), {recipe.id})
+
+
+class RecipeOrderingTest(TestCase):
+    """testing orderings of the recipe list walked through cursors."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='orderuser@email.com',
+            password='orderuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _walk(self, params, link='next', response=None):
+        """follows link cursors and returns the ids of every page served."""
+        pages=[]
+        response=response or self.client.get(RECIPES_URL, params)
+
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in response.data['results']])
+
+            if not response.data[link]:
+                return pages
+
+            response=self.client.get(response.data[link])
+
+    def test_invalid_ordering(self):
+        """test an unknown ordering is rejected."""
+        response=self.client.get(RECIPES_URL, {'ordering':'title'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_walk_price_ordering_with_ties(self):
+        """test cursors visit every recipe once when many share a price."""
+        prices=['3.00', '1.00', '3.00', '2.00', '3.00', '3.00', '1.00']
+        recipes=[create_recipe(self.user, price=Decimal(price)) for price in prices]
+
+        for ordering, descending in (('price', False), ('-price', True)):
+            pages=self._walk({'ordering':ordering, 'page_size':2})
+
+            expected=[recipe.id for recipe in
+                      sorted(recipes, key=lambda recipe: (recipe.price, recipe.id),
+                             reverse=descending)]
+
+            self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+            self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_walk_back_with_previous(self):
+        """test previous cursors walk back to the first page."""
+        for minutes in [10, 5, 10, 10, 5, 20]:
+            create_recipe(self.user, time_minute=minutes)
+
+        forward=[]
+        last=self.client.get(RECIPES_URL, {'ordering':'time_minute', 'page_size':2})
+
+        while True:
+            forward.append([item['id'] for item in last.data['results']])
+
+            if not last.data['next']:
+                break
+
+            last=self.client.get(last.data['next'])
+
+        backward=self._walk(None, link='previous', response=last)
+
+        self.assertEqual(backward, list(reversed(forward)))
+
+    def test_walk_search_ordering_with_ties(self):
+        """test cursors over ranked search results skip and repeat nothing."""
+        recipes=[create_recipe(self.user, title='pumpkin pie') for _ in range(5)]
+        update_search_vectors(recipe.id for recipe in recipes)
+
+        pages=self._walk({'search':'pumpkin', 'page_size':2})
+
+        self.assertEqual(sorted(pk for page in pages for pk in page),
+                         sorted(recipe.id for recipe in recipes))
+
+    def test_invalid_cursor_position(self):
+        """test a cursor from another ordering is rejected."""
+        for _ in range(3):
+            create_recipe(self.user)
+
+        response=self.client.get(RECIPES_URL, {'page_size':1})
+        response=self.client.get(response.data['next'] + '&ordering=price')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_price_page_uses_index(self):
+        """test a deep page sorted by price starts its scan at the cursor."""
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title='r', time_minute=index % 60,
+                   price=Decimal(index % 500) / 100) for index in range(2000))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        cursor=Cursor(offset=0, reverse=False, position='3.00|10')
+        condition=RecipeCursorPagination().get_keyset_filter(('price', 'id'), cursor)
+
+        plan=(Recipe.objects.filter(user=self.user).filter(condition)
+              .order_by('price', 'id')[:50].explain())
+
+        self.assertIn('recipe_user_price_idx', plan)
+        self.assertRegex(plan, r'Index Cond: .*price >=')
@@ -0,0 +1,108 @@
+"""unit tests for cursor pagination of recipe api lists"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe, Tag
+from decimal import Decimal
+
+
+RECIPES_URL=reverse('recipe:recipe-list')
+TAGS_URL=reverse('recipe:tag-list')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class RecipePaginationTest(TestCase):
+    """testing keyset pagination of the recipe list."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='pageuser@email.com',
+            password='pageuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _walk(self, url, params):
+        """follows next links and returns every page that was served."""
+        pages=[]
+        response=self.client.get(url, params)
+
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['results'])
+
+            if not response.data['next']:
+                return pages
+
+            response=self.client.get(response.data['next'])
+
+    def test_recipe_list_is_paginated(self):
+        """test the recipe list returns a cursor page envelope."""
+        create_recipe(self.user)
+
+        response=self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('next', response.data)
+        self.assertIn('previous', response.data)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_walk_all_pages_newest_first(self):
+        """test following cursors visits every recipe once in -id order."""
+        recipes=[create_recipe(self.user, title=f'r{i}') for i in range(7)]
+
+        pages=self._walk(RECIPES_URL, {'page_size':3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        ids=[item['id'] for page in pages for item in page]
+        expected=sorted((recipe.id for recipe in recipes), reverse=True)
+
+        self.assertEqual(ids, expected)
+
+    def test_deep_page_query_count(self):
+        """test a deep page costs the same queries as the first one."""
+        for i in range(6):
+            create_recipe(self.user, title=f'r{i}')
+
+        with self.assertNumQueries(2):
+            first=self.client.get(RECIPES_URL, {'page_size':2})
+
+        second=self.client.get(first.data['next'])
+
+        with self.assertNumQueries(2):
+            self.client.get(second.data['next'])
+
+    def test_tags_unpaginated_by_default(self):
+        """test tags are listed in full when no page is requested."""
+        Tag.objects.create(user=self.user, name='tag1')
+        Tag.objects.create(user=self.user, name='tag2')
+
+        response=self.client.get(TAGS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_tags_paginated_on_request(self):
+        """test tags use cursor pages when a page size is given."""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'tag{i}')
+
+        pages=self._walk(TAGS_URL, {'page_size':2})
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
@@ -0,0 +1,134 @@
+"""parity tests for the values based recipe list serializer"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+from core.models import Recipe, Tag, Ingredient, RecipeImageDerivative
+from core.renderers import FastJSONRenderer
+from recipe.readers import RecipeValuesSerializer
+from recipe.serializers import RecipeSerializer
+from recipe.search import search_recipes, update_search_vectors
+from decimal import Decimal
+import json
+
+
+RECIPES_URL=reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class RecipeValuesSerializerTest(TestCase):
+    """testing the values serializer matches the model serializer."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='readeruser@email.com',
+            password='readeruser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.request=Request(APIRequestFactory().get(RECIPES_URL))
+
+        self._create_recipes()
+
+    def _create_recipes(self):
+        """creates recipes covering empty, null and unusual values."""
+        create_recipe(self.user, title='plain', price=Decimal('0'), time_minute=0)
+        create_recipe(self.user, title='linked "quoted" é ',
+                      link='https://example.com/soup', price=Decimal('9999.99'))
+
+        full=create_recipe(self.user, title='full', price=Decimal('0.50'))
+        tags=[Tag.objects.create(user=self.user, name=name)
+              for name in ('zesty', 'apple', 'Mid')]
+        ingredients=[Ingredient.objects.create(user=self.user, name=name)
+                     for name in ('salt', 'basil')]
+
+        full.tags.add(tags[2], tags[0], tags[1])
+        full.ingredients.add(*reversed(ingredients))
+
+        for width in (1200, 320, 640):
+            RecipeImageDerivative.objects.create(
+                recipe=full, width=width, image=f'uploads/recipe/full-{width}.webp')
+
+    def _slow(self, queryset):
+        queryset=queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+            'derivatives',
+        )
+
+        return RecipeSerializer(queryset, many=True, context={'request':self.request}).data
+
+    def _fast(self, queryset):
+        rows=RecipeValuesSerializer.get_queryset(queryset)
+
+        return RecipeValuesSerializer(rows, many=True, context={'request':self.request}).data
+
+    def test_matches_model_serializer(self):
+        """test every recipe is represented exactly as before."""
+        queryset=Recipe.objects.filter(user=self.user).order_by('-id')
+
+        slow, fast=self._slow(queryset), self._fast(queryset)
+
+        self.assertEqual(fast, slow)
+        self.assertEqual([list(item) for item in fast], [list(item) for item in slow])
+
+    def test_renders_identical_bytes(self):
+        """test both renderers produce the same bytes from either output."""
+        queryset=Recipe.objects.filter(user=self.user).order_by('-id')
+        slow, fast=self._slow(queryset), self._fast(queryset)
+
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+    def test_matches_without_request(self):
+        """test image urls stay relative without a request, like before."""
+        self.request=None
+        queryset=Recipe.objects.filter(user=self.user).order_by('-id')
+
+        self.assertEqual(self._fast(queryset), self._slow(queryset))
+
+    def test_matches_search_results(self):
+        """test annotated search rows are represented like plain ones."""
+        Recipe.objects.filter(user=self.user).update(title='soup')
+        update_search_vectors(Recipe.objects.values_list('id', flat=True))
+
+        queryset=search_recipes(Recipe.objects.filter(user=self.user), 'soup')
+        queryset=queryset.order_by('-search_rank', '-id')
+
+        self.assertEqual(self._fast(queryset), self._slow(queryset))
+
+    def test_list_endpoint_matches(self):
+        """test the list endpoint serves the model serializer output."""
+        response=self.client.get(RECIPES_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        slow=self._slow(Recipe.objects.filter(user=self.user).order_by('-id'))
+
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(slow)))
+
+    def test_single_row(self):
+        """test a single row is represented like a single recipe."""
+        queryset=Recipe.objects.filter(title='full')
+        row=RecipeValuesSerializer.get_queryset(queryset).get()
+
+        self.assertEqual(
+            RecipeValuesSerializer(row, context={'request':self.request}).data,
+            self._slow(queryset)[0],
+        )
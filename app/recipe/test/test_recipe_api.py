@@ -1,5 +1,7 @@
 """unit tests for recipe api"""
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from django.urls import reverse
@@ -7,6 +9,7 @@ from core.models import Recipe, Tag, Ingredient
 from decimal import Decimal
 from rest_framework import status
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.tasks import reset_executor
 from decimal import Decimal
 import os
 
@@ -79,7 +82,7 @@ class PrivateRecipeAPITest(TestCase):
         recipes_ser=RecipeSerializer(recipes, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, recipes_ser.data)
+        self.assertEqual(response.data['results'], recipes_ser.data)
 
     def test_get_current_users_recipes(self):
         second_user = create_user(
@@ -98,7 +101,7 @@ class PrivateRecipeAPITest(TestCase):
         response = self.client.get(RECIPES_URL)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, current_users_recepies_ser.data)
+        self.assertEqual(response.data['results'], current_users_recepies_ser.data)
 
     def get_recipe_detail(self):
         recipe = create_recipe(user=self.user)
@@ -559,6 +562,52 @@ class PrivateRecipeAPITest(TestCase):
             
         self.assertIn(ingredient, recipe.ingredients.all())
 
+    def test_create_recipe_nested_query_count(self):
+        """test nested tags and ingredients are written in constant queries."""
+
+        Tag.objects.create(user=self.user, name='tag0')
+        Ingredient.objects.create(user=self.user, name='ing0')
+
+        def payload(count):
+            return {
+                'title':'new recipe',
+                'time_minute':40,
+                'price':Decimal('6.03'),
+                'tags':[{'name':f'tag{i}'} for i in range(count)],
+                'ingredients':[{'name':f'ing{i}'} for i in range(count)],
+            }
+
+        query_counts=[]
+
+        for count in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response=self.client.post(RECIPES_URL, payload(count), format='json')
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            recipe=Recipe.objects.get(id=response.data['id'])
+            self.assertEqual(recipe.tags.count(), count)
+            self.assertEqual(recipe.ingredients.count(), count)
+
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 20)
+
+    def test_create_recipe_duplicate_tag_names(self):
+        """test repeated tag names in a payload create a single tag."""
+
+        payload={
+            'title':'new recipe',
+            'time_minute':40,
+            'price':Decimal('6.03'),
+            'tags':[{'name':'tag'}, {'name':'tag'}],
+        }
+
+        response=self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
     def test_filtering_by_tags(self):
         """test filtering recipe objects with specified tags."""
 
@@ -580,9 +629,9 @@ class PrivateRecipeAPITest(TestCase):
         ser2=RecipeSerializer(r2)
         ser3=RecipeSerializer(r3)
 
-        self.assertIn(ser1.data, response.data)
-        self.assertIn(ser3.data, response.data)
-        self.assertNotIn(ser2.data, response.data)
+        self.assertIn(ser1.data, response.data['results'])
+        self.assertIn(ser3.data, response.data['results'])
+        self.assertNotIn(ser2.data, response.data['results'])
 
     
     def test_filtering_by_ingredients(self):
@@ -606,15 +655,74 @@ class PrivateRecipeAPITest(TestCase):
         ser2=RecipeSerializer(r2)
         ser3=RecipeSerializer(r3)
 
-        self.assertIn(ser1.data, response.data)
-        self.assertIn(ser3.data, response.data)
-        self.assertNotIn(ser2.data, response.data)
+        self.assertIn(ser1.data, response.data['results'])
+        self.assertIn(ser3.data, response.data['results'])
+        self.assertNotIn(ser2.data, response.data['results'])
+
+
+    def test_filtering_by_all_tags(self):
+        """test filtering recipes that have every specified tag."""
+
+        r1=create_recipe(self.user, title='first recipe')
+        r2=create_recipe(self.user, title='second recipe')
+
+        tag1=Tag.objects.create(user=self.user, name='tag1')
+        tag2=Tag.objects.create(user=self.user, name='tag2')
+
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        payload={'tags':f'{tag1.id},{tag2.id}', 'tags_match':'all'}
+
+        response=self.client.get(RECIPES_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'], [RecipeSerializer(r1).data])
+
+    def test_filtering_returns_each_recipe_once(self):
+        """test recipes matching several tags are not duplicated."""
+
+        recipe=create_recipe(self.user)
+
+        tag1=Tag.objects.create(user=self.user, name='tag1')
+        tag2=Tag.objects.create(user=self.user, name='tag2')
+        ing=Ingredient.objects.create(user=self.user, name='ing')
+
+        recipe.tags.add(tag1, tag2)
+        recipe.ingredients.add(ing)
+
+        payload={'tags':f'{tag1.id},{tag2.id}', 'ingredients':f'{ing.id}'}
+
+        with CaptureQueriesContext(connection) as queries:
+            response=self.client.get(RECIPES_URL, payload)
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertNotIn('DISTINCT', queries.captured_queries[0]['sql'])
+
+    def test_filtering_invalid_ids(self):
+        """test filtering with malformed ids is rejected."""
+
+        response=self.client.get(RECIPES_URL, {'tags':'1,abc'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filtering_invalid_match_mode(self):
+        """test filtering with an unknown match mode is rejected."""
+
+        response=self.client.get(
+            RECIPES_URL, {'ingredients':'1', 'ingredients_match':'some'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     
+@override_settings(IMAGE_PIPELINE={'EXECUTOR':'sync'})
 class ImageApiTest(TestCase):
     """testing api for recipes image."""
 
     def setUp(self):
+        reset_executor()
+
         self.user=get_user_model().objects.create(
             email='selfuser@self.dd',
             password='selfuser',
@@ -624,6 +732,9 @@ class ImageApiTest(TestCase):
         self.client.force_authenticate(user=self.user)
         self.recipe=create_recipe(user=self.user)
 
+    def tearDown(self):
+        reset_executor()
+
     def dearDown(self):
         self.recipe.image.delete()
 
@@ -645,15 +756,18 @@ class ImageApiTest(TestCase):
             image.save(file, format='JPEG')
             file.seek(0)
             payload={'image':file}
-            response=self.client.post(url, payload, format='multipart')
+            with self.captureOnCommitCallbacks(execute=True):
+                response=self.client.post(url, payload, format='multipart')
        
        
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
-        self.assertIn('image', response.data)
+        self.assertEqual(response.data['recipe'], self.recipe.id)
+        self.assertEqual(response.data['status'], 'pending')
 
         self.recipe.refresh_from_db()
 
+        self.assertEqual(self.recipe.image_status, 'done')
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
     def test_upload_bad_data(self):
@@ -668,4 +782,67 @@ class ImageApiTest(TestCase):
 
 
 
-        
\ No newline at end of file
+        
+
+class RecipeQueryCountTest(TestCase):
+    """testing that recipe endpoints run a fixed number of queries."""
+
+    def setUp(self):
+        self.user=create_user(
+            email='queryuser@email.com',
+            password='queryuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_recipes(self, count):
+        """creates recipes with their own tags and ingredients."""
+        recipes=[]
+
+        for index in range(count):
+            recipe=create_recipe(self.user, title=f'recipe {index}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag {recipe.id}'),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'ing {recipe.id}'),
+            )
+            recipes.append(recipe)
+
+        return recipes
+
+    def test_list_query_count_independent_of_size(self):
+        """test listing recipes costs the same queries for any list size."""
+
+        for count in (1, 5, 20):
+            self._create_recipes(count)
+
+            with self.assertNumQueries(2):
+                response=self.client.get(RECIPES_URL)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_query_count(self):
+        """test retrieving a recipe prefetches its tags and ingredients."""
+        recipe=self._create_recipes(1)[0]
+
+        url=get_recipe_detail_url(recipe.id)
+
+        with self.assertNumQueries(4):
+            response=self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, RecipeDetailSerializer(recipe).data)
+
+    def test_list_loads_only_serialized_columns(self):
+        """test the list query does not load unserialized columns."""
+        self._create_recipes(1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPES_URL)
+
+        recipe_query=queries.captured_queries[0]['sql']
+
+        self.assertNotIn('"description"', recipe_query)
+        self.assertNotIn('"image"', recipe_query)
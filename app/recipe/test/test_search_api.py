@@ -0,0 +1,122 @@
+"""unit tests for full text recipe search"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe, Tag, Ingredient
+from decimal import Decimal
+
+
+RECIPES_URL=reverse('recipe:recipe-list')
+BATCH_URL=reverse('recipe:recipe-batch')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class RecipeSearchApiTest(TestCase):
+    """testing the search parameter of the recipe list."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='searchuser@email.com',
+            password='searchuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _search(self, text, **params):
+        response=self.client.get(RECIPES_URL, {'search':text, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [item['id'] for item in response.data['results']]
+
+    def test_title_ranked_over_description(self):
+        """test title matches come before description matches."""
+        in_description=create_recipe(self.user, title='soup',
+                                     description='with roasted pumpkins')
+        in_title=create_recipe(self.user, title='pumpkin pie')
+        create_recipe(self.user, title='apple pie')
+
+        self.assertEqual(self._search('pumpkin'), [in_title.id, in_description.id])
+
+    def test_search_only_own_recipes(self):
+        """test searching does not return other users recipes."""
+        other=get_user_model().objects.create(email='other@email.com')
+        create_recipe(other, title='pumpkin pie')
+        mine=create_recipe(self.user, title='pumpkin soup')
+
+        self.assertEqual(self._search('pumpkin'), [mine.id])
+
+    def test_search_tag_and_ingredient_names(self):
+        """test recipes are found by their tag and ingredient names."""
+        tagged=create_recipe(self.user, title='first')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='vegan'))
+        with_ingredient=create_recipe(self.user, title='second')
+        with_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='saffron'))
+
+        self.assertEqual(self._search('vegan'), [tagged.id])
+        self.assertEqual(self._search('saffron'), [with_ingredient.id])
+
+    def test_search_follows_changes(self):
+        """test renamed, removed and updated values are searched."""
+        recipe=create_recipe(self.user, title='first')
+        tag=Tag.objects.create(user=self.user, name='spicy')
+        recipe.tags.add(tag)
+
+        tag.name='mild'
+        tag.save()
+
+        self.assertEqual(self._search('spicy'), [])
+        self.assertEqual(self._search('mild'), [recipe.id])
+
+        tag.delete()
+        self.assertEqual(self._search('mild'), [])
+
+        self.client.patch(reverse('recipe:recipe-detail', args=[recipe.id]),
+                          {'title':'lasagna'})
+        self.assertEqual(self._search('lasagna'), [recipe.id])
+
+    def test_search_batch_created_recipes(self):
+        """test recipes written through the batch endpoint are searchable."""
+        payload=[{'title':'risotto', 'time_minute':30, 'price':'9.00',
+                  'tags':[{'name':'italian'}]}]
+
+        response=self.client.post(BATCH_URL, payload, format='json')
+        recipe_id=response.data['results'][0]['id']
+
+        self.assertEqual(self._search('italian'), [recipe_id])
+
+    def test_search_paginated_by_rank(self):
+        """test search results can be paged without losing matches."""
+        ids=set()
+
+        for i in range(5):
+            ids.add(create_recipe(self.user, title='pie ' * (i + 1)).id)
+
+        seen=[]
+        response=self.client.get(RECIPES_URL, {'search':'pie', 'page_size':2})
+
+        while True:
+            seen+=[item['id'] for item in response.data['results']]
+
+            if not response.data['next']:
+                break
+
+            response=self.client.get(response.data['next'])
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(set(seen), ids)
@@ -0,0 +1,179 @@
+"""unit tests for the delta sync endpoint"""
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from decimal import Decimal
+
+
+SYNC_URL=reverse('recipe:sync')
+RECIPES_URL=reverse('recipe:recipe-list')
+TAGS_URL=reverse('recipe:tag-list')
+BATCH_URL=reverse('recipe:recipe-batch')
+
+
+def create_recipe(user, **params):
+    default_recipe={
+            'user':user,
+            'title':'test',
+            'time_minute':10,
+            'price':Decimal('5.20'),
+        }
+
+    default_recipe.update(params)
+
+    return Recipe.objects.create(**default_recipe)
+
+
+class SyncApiTest(TestCase):
+    """testing delta sync of recipes, tags and ingredients."""
+
+    def setUp(self):
+        self.user=get_user_model().objects.create(
+            email='syncuser@email.com',
+            password='syncuser',
+        )
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _sync(self, since=None):
+        params={} if since is None else {'since':since}
+        response=self.client.get(SYNC_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def test_full_sync_without_token(self):
+        """test every id is returned as changed without a token."""
+        recipe=create_recipe(self.user)
+        tag=Tag.objects.create(user=self.user, name='vegan')
+        create_recipe(get_user_model().objects.create(email='other@email.com'))
+
+        data=self._sync()
+
+        self.assertEqual(data['recipes'], {'changed':[recipe.id], 'deleted':[]})
+        self.assertEqual(data['tags'], {'changed':[tag.id], 'deleted':[]})
+        self.assertEqual(data['ingredients'], {'changed':[], 'deleted':[]})
+
+    def test_only_changes_since_token(self):
+        """test a token hides what was already synced."""
+        create_recipe(self.user)
+        token=self._sync()['token']
+
+        changed=create_recipe(self.user, title='new')
+        data=self._sync(token)
+
+        self.assertEqual(data['recipes']['changed'], [changed.id])
+        self.assertEqual(self._sync(data['token'])['recipes']['changed'], [])
+
+    def test_deleted_ids(self):
+        """test deletions are returned from the tombstone log."""
+        recipe=create_recipe(self.user)
+        ingredient=Ingredient.objects.create(user=self.user, name='salt')
+        token=self._sync()['token']
+        recipe_id, ingredient_id=recipe.id, ingredient.id
+
+        recipe.delete()
+        ingredient.delete()
+        data=self._sync(token)
+
+        self.assertEqual(data['recipes'], {'changed':[], 'deleted':[recipe_id]})
+        self.assertEqual(data['ingredients'], {'changed':[], 'deleted':[ingredient_id]})
+
+    def test_links_and_renames_change_recipes(self):
+        """test recipes change when links change or a linked name is renamed."""
+        recipe=create_recipe(self.user)
+        tag=Tag.objects.create(user=self.user, name='vegan')
+        token=self._sync()['token']
+
+        tag.recipe_set.add(recipe)
+        data=self._sync(token)
+        self.assertEqual(data['recipes']['changed'], [recipe.id])
+
+        tag.name='plant based'
+        tag.save()
+        data=self._sync(data['token'])
+        self.assertEqual(data['recipes']['changed'], [recipe.id])
+        self.assertEqual(data['tags']['changed'], [tag.id])
+
+    def test_nested_and_batch_writes_tracked(self):
+        """test rows written in bulk by the api are returned."""
+        token=self._sync()['token']
+
+        response=self.client.post(RECIPES_URL, {
+            'title':'soup', 'time_minute':5, 'price':'1.00',
+            'tags':[{'name':'warm'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response=self.client.post(BATCH_URL, [
+            {'title':'bulk', 'time_minute':5, 'price':'1.00',
+             'ingredients':[{'name':'leek'}]},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data=self._sync(token)
+
+        self.assertEqual(len(data['recipes']['changed']), 2)
+        self.assertEqual(data['tags']['changed'],
+                         [Tag.objects.get(name='warm').id])
+        self.assertEqual(data['ingredients']['changed'],
+                         [Ingredient.objects.get(name='leek').id])
+
+    def test_writes_lock_user_first(self):
+        """test every write path locks the user row before any other row, so
+        concurrent writes of a user cannot deadlock."""
+        recipe=create_recipe(self.user)
+        tag=Tag.objects.create(user=self.user, name='old')
+        payload={'title':'locked', 'time_minute':5, 'price':'1.00',
+                 'tags':[{'name':'vegan'}]}
+        writes=[
+            lambda: self.client.post(RECIPES_URL, payload, format='json'),
+            lambda: self.client.post(BATCH_URL, [payload, {'id':recipe.id, **payload}],
+                                     format='json'),
+            lambda: self.client.patch(f'{TAGS_URL}{tag.id}/', {'name':'new'}),
+            lambda: self.client.delete(f'{TAGS_URL}{tag.id}/'),
+            lambda: self.client.delete(f'{RECIPES_URL}{recipe.id}/'),
+        ]
+
+        for write in writes:
+            with CaptureQueriesContext(connection) as queries:
+                response=write()
+
+            self.assertLess(response.status_code, 300)
+            locking=[query['sql'] for query in queries.captured_queries
+                     if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                     or 'FOR NO KEY UPDATE' in query['sql']]
+            self.assertIn('FOR NO KEY UPDATE', locking[0])
+
+    def test_updated_at_tracked(self):
+        """test saving an object moves its updated_at forward."""
+        recipe=create_recipe(self.user)
+        before=recipe.updated_at
+
+        recipe.title='changed'
+        recipe.save()
+        recipe.refresh_from_db()
+
+        self.assertGreater(recipe.updated_at, before)
+
+    def test_user_deletion_leaves_no_tombstones(self):
+        """test deleting a user does not log their objects."""
+        other=get_user_model().objects.create(email='other@email.com')
+        Tag.objects.create(user=other, name='vegan')
+
+        other.delete()
+
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_token(self):
+        """test malformed or future tokens are rejected."""
+        for since in ('abc', '-1', '999999'):
+            response=self.client.get(SYNC_URL, {'since':since})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
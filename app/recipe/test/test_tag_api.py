@@ -88,6 +88,17 @@ class PrivateTagApiTest(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
     
+    def test_update_tag_to_existing_name(self):
+        """test renaming a tag to a name the user already has is rejected."""
+        Tag.objects.create(user=self.user, name='vegan')
+        tag = Tag.objects.create(user=self.user, name='test')
+
+        response = self.client.patch(get_tag_detail_url(tag.id), {'name':'vegan'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'test')
+
     def test_update_another_users_tag(self):
         """testing that updating another users tag will faile."""
         user2 = get_user_model().objects.create(
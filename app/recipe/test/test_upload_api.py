@@ -0,0 +1,241 @@
+"""unit tests for resumable recipe image uploads"""
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe, ImageJob, ImageUpload
+from recipe.tasks import reset_executor
+from recipe.uploads import get_part_path, append_chunk, finalize_upload
+from rest_framework.exceptions import NotFound, ValidationError
+from decimal import Decimal
+from PIL import Image
+from unittest.mock import patch
+import io
+import os
+
+
+def get_upload_url(recipe_id):
+    return reverse('recipe:recipe-image-upload', args=[recipe_id])
+
+
+def get_chunk_url(recipe_id, upload_id):
+    return reverse('recipe:recipe-image-upload-chunk', args=[recipe_id, upload_id])
+
+
+def get_finalize_url(recipe_id, upload_id):
+    return reverse('recipe:recipe-image-upload-finalize', args=[recipe_id, upload_id])
+
+
+def make_image_bytes():
+    buffer=io.BytesIO()
+    Image.new('RGB', (40, 30), color='blue').save(buffer, format='PNG')
+
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_PIPELINE={'EXECUTOR':'sync'})
+class ChunkedUploadApiTest(TestCase):
+    """testing the init / append / finalize upload protocol."""
+
+    def setUp(self):
+        reset_executor()
+
+        self.user=get_user_model().objects.create(email='chunks@email.com')
+        self.recipe=Recipe.objects.create(user=self.user, title='recipe',
+                                          time_minute=5, price=Decimal('1.00'))
+
+        self.client=APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        reset_executor()
+
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            self.recipe.image.delete(save=False)
+
+    def _start(self, size):
+        response=self.client.post(get_upload_url(self.recipe.id), {'size':size})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return response.data['id']
+
+    def _put(self, upload_id, offset, data):
+        return self.client.put(
+            get_chunk_url(self.recipe.id, upload_id), data,
+            content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_in_chunks(self):
+        """test an image sent in chunks is finalized into the recipe."""
+        data=make_image_bytes()
+        upload_id=self._start(len(data))
+
+        for offset in range(0, len(data), 50):
+            response=self._put(upload_id, offset, data[offset:offset + 50])
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['received'], min(offset + 50, len(data)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response=self.client.post(get_finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['recipe'], self.recipe.id)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertFalse(ImageUpload.objects.exists())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'done')
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    def test_resume_reports_offset(self):
+        """test the received offset can be fetched to resume an upload."""
+        data=make_image_bytes()
+        upload_id=self._start(len(data))
+        self._put(upload_id, 0, data[:20])
+
+        response=self.client.get(get_chunk_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.data['received'], 20)
+
+        response=self._put(upload_id, 10, data[10:30])
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['received'], 20)
+
+    def test_bad_header_rejected_early(self):
+        """test a non image is rejected on its first chunk."""
+        upload_id=self._start(1000)
+        upload=ImageUpload.objects.get(id=upload_id)
+
+        response=self._put(upload_id, 0, b'this is not an image' * 5)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.filter(id=upload_id).exists())
+        self.assertFalse(os.path.exists(get_part_path(upload)))
+
+    @patch('recipe.uploads.DEFAULT_UPLOADS', {'MAX_SIZE':100, 'MAX_CHUNK_SIZE':10,
+                                              'READ_SIZE':4})
+    def test_bad_header_stops_reading_body(self):
+        """test the body is not read past the rejected header."""
+        upload_id=self._start(100)
+        stream=io.BytesIO(b'not image!')
+
+        with self.assertRaises(ValidationError):
+            append_chunk(ImageUpload.objects.get(id=upload_id), 0, stream, 10)
+
+        self.assertEqual(stream.tell(), 4)
+
+    def test_chunk_read_outside_transaction(self):
+        """test the body is read before the upload row is locked."""
+        upload_id=self._start(100)
+        data=make_image_bytes()[:30]
+        depth=len(connection.atomic_blocks)
+        depths=[]
+
+        class Stream(io.BytesIO):
+            def read(self, size=-1):
+                depths.append(len(connection.atomic_blocks))
+                return super().read(size)
+
+        upload=append_chunk(ImageUpload.objects.get(id=upload_id), 0, Stream(data), 30)
+
+        self.assertEqual(upload.received, 30)
+        self.assertEqual(set(depths), {depth})
+
+    @override_settings(READ_REPLICAS={'ALIASES':['replica1']})
+    def test_offset_read_from_primary(self):
+        """test resuming clients read the offset from the primary, which
+        replicas may not have caught up with."""
+        upload_id=self._start(100)
+        self._put(upload_id, 0, make_image_bytes()[:20])
+
+        with patch('core.db.routers.choose_read_database',
+                   return_value='replica1') as choose:
+            response=self.client.get(get_chunk_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['received'], 20)
+        choose.assert_not_called()
+
+    def test_chunk_without_valid_length(self):
+        """test chunks need a well formed Content-Length."""
+        upload_id=self._start(100)
+
+        for length, expected in (('', status.HTTP_411_LENGTH_REQUIRED),
+                                 ('abc', status.HTTP_400_BAD_REQUEST),
+                                 ('-5', status.HTTP_400_BAD_REQUEST)):
+            response=self.client.put(
+                get_chunk_url(self.recipe.id, upload_id), make_image_bytes()[:20],
+                content_type='application/octet-stream',
+                HTTP_UPLOAD_OFFSET='0', CONTENT_LENGTH=length,
+            )
+
+            self.assertEqual(response.status_code, expected)
+
+        self.assertEqual(ImageUpload.objects.get(id=upload_id).received, 0)
+
+    def test_chunk_past_declared_size(self):
+        """test chunks cannot grow an upload past its declared size."""
+        upload_id=self._start(10)
+
+        response=self._put(upload_id, 0, make_image_bytes()[:20])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_once(self):
+        """test a finalize racing a finished one finds the upload gone."""
+        data=make_image_bytes()
+        upload_id=self._start(len(data))
+        self._put(upload_id, 0, data)
+        upload=ImageUpload.objects.get(id=upload_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finalize_upload(upload)
+
+        with self.assertRaises(NotFound):
+            finalize_upload(upload)
+
+        self.assertEqual(ImageJob.objects.filter(recipe=self.recipe).count(), 1)
+
+    def test_finalize_incomplete(self):
+        """test an incomplete upload cannot be finalized."""
+        data=make_image_bytes()
+        upload_id=self._start(len(data))
+        self._put(upload_id, 0, data[:20])
+
+        response=self.client.post(get_finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_upload_size_limit(self):
+        """test uploads larger than the limit are refused up front."""
+        response=self.client.post(get_upload_url(self.recipe.id),
+                                  {'size':10 ** 12})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_recipe(self):
+        """test uploads cannot target another users recipe."""
+        other=get_user_model().objects.create(email='other@email.com')
+        recipe=Recipe.objects.create(user=other, title='recipe',
+                                     time_minute=5, price=Decimal('1.00'))
+
+        response=self.client.post(get_upload_url(recipe.id), {'size':10})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expire_uploads_command(self):
+        """test stale uploads are discarded by the command."""
+        upload_id=self._start(100)
+        ImageUpload.objects.filter(id=upload_id).update(updated_at='2000-01-01T00:00Z')
+
+        call_command('processimages', '--expire-uploads', '1', stdout=io.StringIO())
+
+        self.assertFalse(ImageUpload.objects.exists())
@@ -0,0 +1,216 @@
+"""resumable chunked uploads of recipe images"""
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from rest_framework.exceptions import NotFound, ValidationError
+from core.models import ImageUpload
+from .tasks import enqueue_image
+from PIL import Image
+import os
+import shutil
+import tempfile
+
+
+DEFAULT_UPLOADS={
+    'MAX_SIZE':20 * 1024 * 1024,
+    'MAX_CHUNK_SIZE':5 * 1024 * 1024,
+    'READ_SIZE':64 * 1024,
+}
+
+IMAGE_SIGNATURES=[
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+HEADER_SIZE=12
+
+
+class OffsetMismatch(Exception):
+    """raised when a chunk does not start where the upload left off."""
+
+    def __init__(self, received):
+        super().__init__(f'Chunk does not start at the received offset {received}.')
+        self.received=received
+
+
+def get_upload_settings():
+    """returns CHUNKED_UPLOADS settings merged over the defaults."""
+    options={**DEFAULT_UPLOADS, **getattr(settings, 'CHUNKED_UPLOADS', {})}
+    options.setdefault('DIR', os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial'))
+
+    return options
+
+
+def get_part_path(upload):
+    """returns the path the received bytes of upload are written to."""
+    return os.path.join(get_upload_settings()['DIR'], f'{upload.id}.part')
+
+
+def get_image_extension(header):
+    """returns the extension matching the image signature in header."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return '.webp'
+
+    return None
+
+
+def start_upload(recipe, size):
+    """creates an upload of size bytes and its empty part file."""
+    upload=ImageUpload.objects.create(recipe=recipe, size=size)
+
+    path=get_part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+    return upload
+
+
+def append_chunk(upload, offset, stream, length):
+    """streams length bytes from stream into upload at offset.
+
+    the chunk is read into a temporary file first and only then appended
+    under the upload row lock, so a slow client holds no lock or
+    transaction. the image signature is checked as soon as the first bytes
+    arrive, so a non image upload is rejected before the rest of its body
+    is read. returns the upload with its new offset.
+    """
+    options=get_upload_settings()
+
+    if length > options['MAX_CHUNK_SIZE']:
+        raise ValidationError(
+            {'detail':f'Chunks are limited to {options["MAX_CHUNK_SIZE"]} bytes.'})
+
+    if offset != upload.received:
+        raise OffsetMismatch(upload.received)
+
+    if offset + length > upload.size:
+        raise ValidationError({'detail':'Chunk exceeds the declared size.'})
+
+    with tempfile.TemporaryFile(dir=options['DIR']) as chunk:
+        if not _receive_chunk(upload, offset, stream, length, chunk, options['READ_SIZE']):
+            discard_upload(upload)
+            raise ValidationError({'detail':'Upload is not a supported image.'})
+
+        chunk.seek(0)
+
+        with transaction.atomic():
+            upload=ImageUpload.objects.select_for_update().get(id=upload.id)
+
+            # another request may have appended while this one was reading
+            if offset != upload.received:
+                raise OffsetMismatch(upload.received)
+
+            with open(get_part_path(upload), 'r+b') as part:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, options['READ_SIZE'])
+                part.truncate()
+                upload.received=part.tell()
+
+            upload.save(update_fields=['received', 'updated_at'])
+
+    return upload
+
+
+def _receive_chunk(upload, offset, stream, length, chunk, read_size):
+    """reads up to length bytes of stream into the file chunk, returns False
+    as soon as the first bytes of upload rule out every image signature."""
+    header=None
+
+    if offset < HEADER_SIZE:
+        with open(get_part_path(upload), 'rb') as part:
+            header=part.read(offset)
+
+    remaining=length
+
+    while remaining:
+        block=stream.read(min(read_size, remaining))
+
+        if not block:
+            break
+
+        if header is not None and len(header) < HEADER_SIZE:
+            header=(header + block)[:HEADER_SIZE]
+
+            if not _is_image_header(upload, header):
+                return False
+
+        chunk.write(block)
+        remaining-=len(block)
+
+    return True
+
+
+def _is_image_header(upload, header):
+    """returns False when header, the first bytes of upload, rules out every
+    image signature."""
+    if len(header) >= min(HEADER_SIZE, upload.size):
+        return get_image_extension(header) is not None
+
+    prefixes=[signature for signature, extension in IMAGE_SIGNATURES] + [b'RIFF']
+
+    return any(header[:len(prefix)] == prefix[:len(header)] for prefix in prefixes)
+
+
+def finalize_upload(upload):
+    """checks the complete upload and hands it to the image pipeline.
+
+    the upload row stays locked until the job is stored and the upload
+    deleted, so of two concurrent finalizes only one creates a job, the
+    other finds the upload gone.
+    """
+    path=get_part_path(upload)
+    valid=True
+
+    with transaction.atomic():
+        upload=ImageUpload.objects.select_for_update().filter(id=upload.id).first()
+
+        if upload is None:
+            raise NotFound('Upload not found.')
+
+        if upload.received != upload.size:
+            raise ValidationError(
+                {'detail':f'Upload is incomplete, {upload.received} of {upload.size} bytes received.'})
+
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception:
+            valid=False
+
+        if valid:
+            with open(path, 'rb') as part:
+                extension=get_image_extension(part.read(HEADER_SIZE))
+                part.seek(0)
+
+                job=enqueue_image(upload.recipe, File(part, name='upload' + extension))
+                upload.delete()
+
+    if not valid:
+        discard_upload(upload)
+        raise ValidationError({'detail':'Upload is not a valid image.'})
+
+    _remove_part(path)
+
+    return job
+
+
+def discard_upload(upload):
+    """deletes upload and its part file."""
+    path=get_part_path(upload)
+
+    upload.delete()
+    _remove_part(path)
+
+
+def _remove_part(path):
+    # a concurrent request may have removed it already
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
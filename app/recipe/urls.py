@@ -1,15 +1,16 @@
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
 from . import views
+from .async_views import AsyncReadRouter
 
 app_name='recipe'
 
-router = DefaultRouter()
+router = AsyncReadRouter()
 
 router.register('recipes', views.RecipeManageView)
 router.register('tags', views.TagView, basename='tag')
 router.register('ingredients', views.IngredientView, basename='ingredient')
 
 urlpatterns=[
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
@@ -2,18 +2,43 @@
 
 
 from rest_framework import viewsets, mixins, status
-from .serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer, IngredientSerializer, RecipeImageSerializer
+from .serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer, IngredientSerializer, RecipeImageSerializer, ImageUploadSerializer, ImageJobSerializer
+from .readers import RecipeValuesSerializer
 from core.models import Recipe, Tag, Ingredient
-from rest_framework.authentication import TokenAuthentication
+from user.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
+from core.parsers import FastJSONParser
+from core.metrics import InstrumentedViewMixin
+from core.db.routers import ReplicaReadMixin
+from rest_framework.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from itertools import islice
+import io
+from .exporters import EXPORTERS
+from .tasks import enqueue_image
+from .uploads import start_upload, append_chunk, finalize_upload, OffsetMismatch
+from core.models import ImageUpload
+from django.shortcuts import get_object_or_404
+from .parsers import NDJSONParser
+from .filters import RecipeFilter, MATCH_MODES, ORDERINGS
+from .search import autocomplete_names
+from .pagination import RecipeCursorPagination, OptionalCursorPagination
+from .caching import ConditionalListMixin, lock_data_version
+from .sync import get_changes
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes
 
 
+UUID_PATTERN='[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
+
 @extend_schema_view(
     list=extend_schema(
-
+        responses=RecipeSerializer(many=True),
         parameters=[
             OpenApiParameter(
                 'tags',
@@ -26,65 +51,328 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiPara
                 OpenApiTypes.STR,
                 description='Comma saperated list of ids to filter.'
             ),
+            OpenApiParameter(
+                'tags_match',
+                OpenApiTypes.STR,
+                enum=MATCH_MODES,
+                description='Match recipes having any or all of the tags.',
+            ),
+            OpenApiParameter(
+                'ingredients_match',
+                OpenApiTypes.STR,
+                enum=MATCH_MODES,
+                description='Match recipes having any or all of the ingredients.',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full text search over titles, descriptions, tags and ingredients, best matches first.',
+            ),
+            OpenApiParameter(
+                'price_min',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this price.',
+            ),
+            OpenApiParameter(
+                'price_max',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this price.',
+            ),
+            OpenApiParameter(
+                'time_max',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes.',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=list(ORDERINGS),
+                description='Sort order, newest first by default.',
+            ),
         ]
     )
 )
-class RecipeManageView(viewsets.ModelViewSet):
+class RecipeManageView(InstrumentedViewMixin, ReplicaReadMixin, ConditionalListMixin,
+                       viewsets.ModelViewSet):
     """view for managing recipe objects"""
 
     serializer_class = RecipeDetailSerializer
-    authentication_classes=[TokenAuthentication]
+    authentication_classes=[CachedTokenAuthentication]
     permission_classes=[IsAuthenticated]
+    pagination_class=RecipeCursorPagination
+    async_reads=True
+    batch_max_size=1000
+    export_chunk_size=500
+    # a resuming client sends its next chunk at the offset it reads
+    primary_actions=('image_upload_chunk',)
 
     queryset=Recipe.objects.all()
+    prefetch_fields={
+        'tags':Prefetch('tags', queryset=Tag.objects.order_by('id')),
+        'ingredients':Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+        'images':'derivatives',
+    }
 
-    def _get_ids(self, qs):
-        """returns list of ids that are specified in qs"""
-        return [int(str_id) for str_id in qs.split(',')]
-    
     def get_queryset(self):
         """return recipes queryset for authenticated user"""
 
-        queryset=Recipe.objects.filter(user=self.request.user).order_by('-id')
-    
-        tags=self.request.query_params.get('tags')
-        ingredients=self.request.query_params.get('ingredients')
+        recipe_filter=RecipeFilter(self.request.query_params)
 
-        if tags:
-            tag_ids=self._get_ids(tags)
-            queryset=queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids=self._get_ids(ingredients)
-            queryset=queryset.filter(ingredients__id__in=ingredient_ids)
+        queryset=Recipe.objects.filter(user=self.request.user)
+        queryset=self._optimize_queryset(queryset)
 
-        return queryset.distinct()
+        return recipe_filter.filter_queryset(queryset).order_by(*recipe_filter.get_ordering())
 
+    def get_cursor_ordering(self):
+        """returns the ordering the recipe list is paginated by."""
+        return RecipeFilter(self.request.query_params).get_ordering()
+
+    def _optimize_queryset(self, queryset):
+        """loads only the columns and relations the active serializer reads."""
+        serializer_class=self.get_serializer_class()
+        meta=serializer_class.Meta
+
+        if getattr(serializer_class, 'values_only', False):
+            return serializer_class.get_queryset(queryset)
+
+        if meta.model is not Recipe:
+            return queryset
+
+        fields=meta.fields
+
+        related=[self.prefetch_fields[field] for field in fields
+                 if field in self.prefetch_fields]
+        columns=[field for field in fields if field not in self.prefetch_fields]
+
+        # the owner is always loaded, writes bump their data version
+        return queryset.only('user', *columns).prefetch_related(*related)
 
-        
     def get_serializer_class(self):
         
         if self.action == 'list':
-            return RecipeSerializer
-        elif self.action=='upload_image':
+            return RecipeValuesSerializer
+        elif self.action in ('upload_image', 'image_upload_finalize'):
             return RecipeImageSerializer
+        elif self.action in ('image_upload', 'image_upload_chunk'):
+            return ImageUploadSerializer
 
         return self.serializer_class
     
     def perform_create(self, serializer):
         """set the authenticated user to the created recipe object"""
         serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        """deletes the recipe, holding the users data version first."""
+        with transaction.atomic():
+            lock_data_version(instance.user_id)
+            instance.delete()
     
+    @extend_schema(request=RecipeDetailSerializer(many=True))
+    @action(methods=['POST',], detail=False, url_path='batch',
+            parser_classes=[FastJSONParser, NDJSONParser])
+    def batch(self, request):
+        """creates or updates many recipes in one request.
+
+        items carrying an id partially update that recipe, the others are
+        created. nothing is written unless every item is valid.
+        """
+        items=request.data
+
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return Response({'detail':'Expected a list of recipe objects.'},
+                            status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > self.batch_max_size:
+            return Response({'detail':f'Batches are limited to {self.batch_max_size} recipes.'},
+                            status.HTTP_400_BAD_REQUEST)
+
+        errors=[{} for item in items]
+        creates=[index for index, item in enumerate(items) if 'id' not in item]
+        updates=[index for index, item in enumerate(items) if 'id' in item]
+
+        seen=set()
+
+        for index in updates:
+            recipe_id=items[index]['id']
+
+            if not isinstance(recipe_id, int) or isinstance(recipe_id, bool):
+                errors[index]={'id':['A valid integer is required.']}
+            elif recipe_id in seen:
+                errors[index]={'id':['Recipe appears more than once in the batch.']}
+            else:
+                seen.add(recipe_id)
+
+        recipes=self.get_queryset().in_bulk(seen)
+
+        for index in updates:
+            if not errors[index] and items[index]['id'] not in recipes:
+                errors[index]={'id':['Recipe not found.']}
+
+        updates=[index for index in updates if not errors[index]]
+
+        create_serializer=self.get_serializer(
+            data=[items[index] for index in creates], many=True)
+        update_serializer=self.get_serializer(
+            [recipes[items[index]['id']] for index in updates],
+            data=[items[index] for index in updates], many=True, partial=True)
+
+        for indexes, serializer in ((creates, create_serializer), (updates, update_serializer)):
+            if not serializer.is_valid():
+                for index, item_errors in zip(indexes, serializer.errors):
+                    errors[index]=item_errors
+
+        if any(errors):
+            return Response({'errors':errors}, status.HTTP_400_BAD_REQUEST)
+
+        results=[None for item in items]
+
+        with transaction.atomic():
+            if creates:
+                created=create_serializer.save(user=request.user)
+                for index, recipe in zip(creates, created):
+                    results[index]={'id':recipe.id, 'status':'created'}
+            if updates:
+                updated=update_serializer.save()
+                for index, recipe in zip(updates, updated):
+                    results[index]={'id':recipe.id, 'status':'updated'}
+
+        return Response({'results':results}, status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR,
+                enum=list(EXPORTERS),
+                description='Format of the exported file, defaults to ndjson.',
+            ),
+        ],
+        responses={200:OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET',], detail=False, url_path='export')
+    def export(self, request):
+        """streams every recipe of the user as NDJSON or CSV."""
+        export_format=request.query_params.get('export_format', 'ndjson')
+
+        if export_format not in EXPORTERS:
+            return Response(
+                {'export_format':f'Expected one of {", ".join(EXPORTERS)}.'},
+                status.HTTP_400_BAD_REQUEST)
+
+        iter_rows, content_type=EXPORTERS[export_format]
+        fields=self.get_serializer_class().Meta.fields
+
+        response=StreamingHttpResponse(
+            iter_rows(self._iter_serialized(), fields),
+            content_type=content_type,
+        )
+        response['Content-Disposition']=f'attachment; filename="recipes.{export_format}"'
+
+        return response
+
+    def _iter_serialized(self):
+        """yields serialized recipes, reading the database chunk by chunk.
+
+        rows come from a server side cursor and relations are prefetched per
+        chunk, so memory stays bounded by the chunk size.
+        """
+        recipes=self.filter_queryset(self.get_queryset()).iterator(
+            chunk_size=self.export_chunk_size)
+
+        while True:
+            chunk=list(islice(recipes, self.export_chunk_size))
+
+            if not chunk:
+                return
+
+            yield from self.get_serializer(chunk, many=True).data
+
+    @extend_schema(responses={202:ImageJobSerializer})
     @action(methods=['POST',], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
+        """accepts an image and leaves its processing to the image pipeline,
+        returns the queued job."""
         recipe=self.get_object()
 
         serializer=self.get_serializer(recipe, request.data)
 
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status.HTTP_200_OK)
+            job=enqueue_image(recipe, serializer.validated_data['image'])
+            return Response(ImageJobSerializer(job).data, status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['POST',], detail=True, url_path='image-upload')
+    def image_upload(self, request, pk=None):
+        """starts a resumable upload of the recipe image."""
+        recipe=self.get_object()
+
+        serializer=self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload=start_upload(recipe, serializer.validated_data['size'])
+
+        return Response(self.get_serializer(upload).data, status.HTTP_201_CREATED)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'Upload-Offset',
+                OpenApiTypes.INT,
+                location=OpenApiParameter.HEADER,
+                description='Offset of the chunk in the body, required for PUT.',
+            ),
+        ],
+        request={'application/octet-stream':OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET', 'PUT',], detail=True, parser_classes=[],
+            url_path=f'image-upload/(?P<upload_id>{UUID_PATTERN})')
+    def image_upload_chunk(self, request, pk=None, upload_id=None):
+        """returns the received offset of an upload, or appends the raw
+        request body to it at the offset sent in the Upload-Offset header."""
+        upload=self._get_upload(upload_id)
+
+        if request.method == 'PUT':
+            try:
+                offset=int(request.headers['Upload-Offset'])
+            except (KeyError, ValueError):
+                return Response({'detail':'Upload-Offset header is required.'},
+                                status.HTTP_400_BAD_REQUEST)
+
+            if not request.META.get('CONTENT_LENGTH'):
+                return Response({'detail':'Content-Length header is required.'},
+                                status.HTTP_411_LENGTH_REQUIRED)
+
+            try:
+                length=int(request.META['CONTENT_LENGTH'])
+            except ValueError:
+                length=-1
+
+            if length < 0:
+                return Response({'detail':'Content-Length header is invalid.'},
+                                status.HTTP_400_BAD_REQUEST)
+
+            try:
+                upload=append_chunk(upload, offset, request.stream or io.BytesIO(), length)
+            except OffsetMismatch as exc:
+                return Response({'detail':str(exc), 'received':exc.received},
+                                status.HTTP_409_CONFLICT)
+
+        return Response(self.get_serializer(upload).data, status.HTTP_200_OK)
+
+    @extend_schema(request=None, responses={202:ImageJobSerializer})
+    @action(methods=['POST',], detail=True,
+            url_path=f'image-upload/(?P<upload_id>{UUID_PATTERN})/finalize')
+    def image_upload_finalize(self, request, pk=None, upload_id=None):
+        """hands a completely received upload to the image pipeline."""
+        job=finalize_upload(self._get_upload(upload_id))
+
+        return Response(ImageJobSerializer(job).data, status.HTTP_202_ACCEPTED)
+
+    def _get_upload(self, upload_id):
+        """returns the upload of the requested recipe."""
+        return get_object_or_404(ImageUpload, id=upload_id, recipe=self.get_object())
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -98,13 +386,20 @@ class RecipeManageView(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseRecipaAttrView(mixins.DestroyModelMixin,
+class BaseRecipaAttrView(InstrumentedViewMixin,
+                         ReplicaReadMixin,
+                         ConditionalListMixin,
+                         mixins.DestroyModelMixin,
                          mixins.ListModelMixin,
                            mixins.UpdateModelMixin,
                              viewsets.GenericViewSet):
     """base manager api view for recipe objects attributes."""
-    authentication_classes=[TokenAuthentication]
+    authentication_classes=[CachedTokenAuthentication]
     permission_classes=[IsAuthenticated]
+    pagination_class=OptionalCursorPagination
+    async_reads=True
+    autocomplete_limit=10
+    autocomplete_max_limit=50
 
     def get_queryset(self):
         """returns queryset for the authenticated user."""
@@ -116,6 +411,66 @@ class BaseRecipaAttrView(mixins.DestroyModelMixin,
             queryset=queryset.filter(recipe__isnull=False)
         
         return queryset.distinct()
+
+    def perform_update(self, serializer):
+        """saves the renamed object, rejecting names the user already has."""
+        try:
+            with transaction.atomic():
+                lock_data_version(serializer.instance.user_id)
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name':['you already have one with this name.']})
+
+    def perform_destroy(self, instance):
+        """deletes the object, holding the users data version first."""
+        with transaction.atomic():
+            lock_data_version(instance.user_id)
+            instance.delete()
+
+    def get_autocomplete_limit(self):
+        """returns the number of matches asked for, capped to the maximum."""
+        limit=self.request.query_params.get('limit')
+
+        if limit is None:
+            return self.autocomplete_limit
+
+        try:
+            limit=int(limit)
+        except ValueError:
+            raise ValidationError({'limit':['must be a positive integer.']})
+
+        if limit < 1:
+            raise ValidationError({'limit':['must be a positive integer.']})
+
+        return min(limit, self.autocomplete_max_limit)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Typed text, matched as a name prefix or fuzzily.',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Number of matches to return, 50 at most.',
+            ),
+        ]
+    )
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """returns the names best matching the typed text."""
+        limit=self.get_autocomplete_limit()
+        text=request.query_params.get('q', '').strip()
+
+        if not text:
+            return Response([])
+
+        queryset=self.queryset.filter(user=request.user)
+        matches=autocomplete_names(queryset, text).values('id', 'name')[:limit]
+
+        return Response(list(matches))
     
 
 class TagView(BaseRecipaAttrView):
@@ -129,5 +484,46 @@ class IngredientView(BaseRecipaAttrView):
 
     serializer_class=IngredientSerializer
     queryset=Ingredient.objects.all()
-    
-    
\ No newline at end of file
+
+
+class SyncView(InstrumentedViewMixin, APIView):
+    """delta sync of the recipes, tags and ingredients of the user."""
+
+    authentication_classes=[CachedTokenAuthentication]
+    permission_classes=[IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.STR,
+                description='Token of the previous sync, omit it to get every id.',
+            ),
+        ]
+    )
+    def get(self, request):
+        """returns the ids changed and deleted since the given token along
+        with the token to send next time."""
+        since=request.query_params.get('since')
+
+        if since is not None:
+            since=self._get_since(since)
+
+        changes=get_changes(request.user, since)
+
+        if since is not None and since > int(changes['token']):
+            raise ValidationError({'since':['unknown token, sync again without it.']})
+
+        return Response(changes)
+
+    def _get_since(self, since):
+        try:
+            since=int(since)
+        except ValueError:
+            since=-1
+
+        if since < 0:
+            raise ValidationError({'since':['unknown token, sync again without it.']})
+
+        return since
+
@@ -0,0 +1,288 @@
+"""authentication classes for the api"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from collections import OrderedDict
+import hashlib
+import pickle
+import threading
+import time
+
+
+DEFAULT_AUTH_TOKENS={
+    'TTL':7 * 24 * 3600,
+    'MAX_AGE':30 * 24 * 3600,
+    'TOUCH_INTERVAL':3600,
+    'CLEANUP_BATCH_SIZE':1000,
+}
+
+
+def get_auth_token_settings():
+    """returns AUTH_TOKENS merged over the defaults."""
+    return {**DEFAULT_AUTH_TOKENS, **getattr(settings, 'AUTH_TOKENS', {})}
+
+
+def get_token_digest(key):
+    """returns the digest a token key is stored and cached under."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class LRUTokenCache:
+    """in process least recently used cache with a time to live per entry.
+
+    values are pickled, so every request gets its own user instance just
+    like it would from the django cache backends. the cache holds at most
+    `max_size` entries and, when `max_bytes` is set, at most that many
+    bytes of pickled values.
+    """
+
+    def __init__(self, max_size=10000, ttl=300, max_bytes=None):
+        self.max_size=max_size
+        self.ttl=ttl
+        self.max_bytes=max_bytes
+        self.size_bytes=0
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry=self._entries.get(digest)
+
+            if entry is None:
+                return None
+
+            expires, value=entry
+
+            if expires <= time.monotonic():
+                self._pop(digest)
+                return None
+
+            self._entries.move_to_end(digest)
+
+        return pickle.loads(value)
+
+    def set(self, digest, value):
+        value=pickle.dumps(value)
+
+        with self._lock:
+            self._pop(digest)
+            self._entries[digest]=(time.monotonic() + self.ttl, value)
+            self.size_bytes+=len(value)
+
+            while self._entries and (
+                    len(self._entries) > self.max_size
+                    or self.max_bytes is not None and self.size_bytes > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, digest):
+        with self._lock:
+            self._pop(digest)
+
+    def _pop(self, digest):
+        entry=self._entries.pop(digest, None)
+
+        if entry is not None:
+            self.size_bytes-=len(entry[1])
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoTokenCache:
+    """token cache stored in one of the configured django caches."""
+
+    key_prefix='authtoken:'
+
+    def __init__(self, alias='default', ttl=300):
+        self.cache=caches[alias]
+        self.ttl=ttl
+
+    def get(self, digest):
+        return self.cache.get(self.key_prefix + digest)
+
+    def set(self, digest, value):
+        self.cache.set(self.key_prefix + digest, value, self.ttl)
+
+    def delete(self, digest):
+        self.cache.delete(self.key_prefix + digest)
+
+
+class TokenCacheMetrics:
+    """counts lookups served from the token cache."""
+
+    def __init__(self):
+        self._lock=threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits=0
+        self.misses=0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits+=1
+            else:
+                self.misses+=1
+
+    @property
+    def hit_ratio(self):
+        total=self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {'hits':self.hits, 'misses':self.misses, 'hit_ratio':self.hit_ratio}
+
+
+TOKEN_CACHE_BACKENDS={
+    'lru':LRUTokenCache,
+    'django':DjangoTokenCache,
+}
+
+token_cache_metrics=TokenCacheMetrics()
+_token_cache=None
+
+
+def get_token_cache():
+    """returns the token cache configured in TOKEN_AUTH_CACHE."""
+    global _token_cache
+
+    if _token_cache is None:
+        options=dict(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+        backend=TOKEN_CACHE_BACKENDS[options.pop('BACKEND', 'lru')]
+
+        _token_cache=backend(**{key.lower():value for key, value in options.items()})
+
+    return _token_cache
+
+
+def reset_token_cache():
+    """drops the token cache, it is rebuilt from settings on next use."""
+    global _token_cache
+
+    _token_cache=None
+    token_cache_metrics.reset()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """authentication of expiring tokens keeping resolved tokens in a cache.
+
+    tokens are looked up by the digest of their key and cache entries are
+    keyed by it too. they are invalidated when the token is deleted or its
+    user is saved, see `user.signals`, and checked for expiry on every
+    request. the use of a token is saved once per TOUCH_INTERVAL.
+    """
+
+    def get_model(self):
+        from core.models import AuthToken
+
+        return AuthToken
+
+    def authenticate_credentials(self, key):
+        cache=get_token_cache()
+        digest=get_token_digest(key)
+
+        cached=cache.get(digest)
+        token_cache_metrics.record(cached is not None)
+
+        if cached is None:
+            cached=self._get_credentials(digest)
+            cache.set(digest, cached)
+
+        user, token=cached
+        now=timezone.now()
+
+        if token.is_expired(now):
+            cache.delete(digest)
+            raise AuthenticationFailed('Token has expired.')
+
+        touch=token.get_touch(now)
+
+        if touch is not None:
+            # a token revoked by another process is gone from the database
+            if not self.get_model().objects.filter(pk=token.pk).update(**touch):
+                cache.delete(digest)
+                raise AuthenticationFailed('Invalid token.')
+
+            self._apply_touch(token, touch)
+            cache.set(digest, cached)
+
+        return cached
+
+    def _get_credentials(self, digest):
+        model=self.get_model()
+
+        try:
+            token=model.objects.select_related('user').get(digest=digest)
+        except model.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        return (token.user, token)
+
+    def _apply_touch(self, token, touch):
+        for field, value in touch.items():
+            setattr(token, field, value)
+
+    async def aauthenticate(self, request):
+        """async version of `authenticate` for views running on the event loop.
+
+        a missing, bad or expired token gives None instead of an error, such
+        requests are left to the sync view which answers them as usual.
+        """
+        auth=get_authorization_header(request).split()
+
+        if len(auth) != 2 or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        try:
+            key=auth[1].decode()
+        except UnicodeError:
+            return None
+
+        cache=get_token_cache()
+        digest=get_token_digest(key)
+
+        cached=await _call_cache(cache, cache.get, digest)
+        token_cache_metrics.record(cached is not None)
+
+        if cached is None:
+            token=await (self.get_model().objects.select_related('user')
+                         .filter(digest=digest).afirst())
+
+            if token is None or not token.user.is_active:
+                return None
+
+            cached=(token.user, token)
+            await _call_cache(cache, cache.set, digest, cached)
+
+        user, token=cached
+        now=timezone.now()
+
+        if token.is_expired(now):
+            return None
+
+        touch=token.get_touch(now)
+
+        if touch is not None:
+            if not await self.get_model().objects.filter(pk=token.pk).aupdate(**touch):
+                await _call_cache(cache, cache.delete, digest)
+                return None
+
+            self._apply_touch(token, touch)
+            await _call_cache(cache, cache.set, digest, cached)
+
+        return cached
+
+
+async def _call_cache(cache, method, *args):
+    """calls an in process cache right away, others off the event loop."""
+    if isinstance(cache, LRUTokenCache):
+        return method(*args)
+
+    return await sync_to_async(method)(*args)
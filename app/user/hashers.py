@@ -0,0 +1,230 @@
+"""tuned password hashers and a bounded pool running them off request threads"""
+from django.conf import settings
+from django.contrib.auth.hashers import (Argon2PasswordHasher, ScryptPasswordHasher,
+                                         check_password, make_password)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from concurrent.futures import ThreadPoolExecutor
+from core.metrics import metrics_registry
+import threading
+import time
+
+
+DEFAULT_PASSWORD_HASHING={
+    'ARGON2_TIME_COST':2,
+    'ARGON2_MEMORY_COST':19456,
+    'ARGON2_PARALLELISM':1,
+    'SCRYPT_WORK_FACTOR':2 ** 14,
+    'SCRYPT_BLOCK_SIZE':8,
+    'WORKERS':2,
+    'QUEUE_SIZE':32,
+    'TIMEOUT':5,
+}
+
+
+def get_hashing_settings():
+    """returns PASSWORD_HASHING merged over the defaults."""
+    return {**DEFAULT_PASSWORD_HASHING, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """argon2id with its cost taken from PASSWORD_HASHING.
+
+    the default cost is the argon2id minimum recommended by owasp, 19 MiB
+    and two passes on one lane, where django spends 100 MiB on eight lanes
+    per login. passwords hashed with another cost are rehashed on login.
+    """
+
+    @property
+    def time_cost(self):
+        return get_hashing_settings()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_hashing_settings()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_hashing_settings()['ARGON2_PARALLELISM']
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt with its cost taken from PASSWORD_HASHING, allowed the memory
+    that cost needs."""
+
+    @property
+    def work_factor(self):
+        return get_hashing_settings()['SCRYPT_WORK_FACTOR']
+
+    @property
+    def block_size(self):
+        return get_hashing_settings()['SCRYPT_BLOCK_SIZE']
+
+    @property
+    def maxmem(self):
+        # scrypt needs 128 * n * r bytes, leave room for the parameters
+        return 256 * self.work_factor * self.block_size
+
+
+class HashingUnavailable(APIException):
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail='Too many logins at once, try again shortly.'
+    default_code='hashing_unavailable'
+
+
+class PasswordHashingPool:
+    """runs password hashing on a few dedicated threads.
+
+    the hashers release the gil while they work, so the request thread
+    just waits while at most `workers` hashes use the cpu at once. up to
+    `queue_size` more wait for a thread, anything beyond that waits
+    `timeout` seconds for room and is then turned away, so a burst of
+    logins queues up instead of starving every other request.
+    """
+
+    def __init__(self, workers=2, queue_size=32, timeout=5):
+        self.workers=workers
+        self.timeout=timeout
+        self._executor=ThreadPoolExecutor(max_workers=workers,
+                                          thread_name_prefix='password-hashing')
+        self._slots=threading.BoundedSemaphore(workers + queue_size)
+        self._lock=threading.Lock()
+        self.in_flight=0
+        self.hashes=0
+        self.rejected=0
+        self.wait_time=0.0
+        self.hash_time=0.0
+
+    def run(self, func, *args):
+        start=time.perf_counter()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected+=1
+            raise HashingUnavailable()
+
+        with self._lock:
+            self.in_flight+=1
+
+        try:
+            return self._executor.submit(self._call, start, func, *args).result()
+        finally:
+            with self._lock:
+                self.in_flight-=1
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _call(self, submitted, func, *args):
+        start=time.perf_counter()
+
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.hashes+=1
+                self.wait_time+=start - submitted
+                self.hash_time+=time.perf_counter() - start
+
+
+_hashing_pool=None
+_hashing_pool_lock=threading.Lock()
+
+
+def get_hashing_pool():
+    """returns the hashing pool configured in PASSWORD_HASHING, None when
+    hashing runs on the calling thread."""
+    global _hashing_pool
+
+    options=get_hashing_settings()
+
+    if not options['WORKERS']:
+        return None
+
+    with _hashing_pool_lock:
+        if _hashing_pool is None:
+            _hashing_pool=PasswordHashingPool(options['WORKERS'], options['QUEUE_SIZE'],
+                                              options['TIMEOUT'])
+
+    return _hashing_pool
+
+
+def reset_hashing_pool():
+    """drops the hashing pool, it is rebuilt from settings on next use."""
+    global _hashing_pool
+
+    with _hashing_pool_lock:
+        pool, _hashing_pool=_hashing_pool, None
+
+    if pool is not None:
+        pool.shutdown()
+
+
+def _run_hashing(func, *args):
+    pool=get_hashing_pool()
+
+    if pool is None:
+        return func(*args)
+
+    return pool.run(func, *args)
+
+
+def hash_password(raw_password):
+    """returns raw_password encoded with the preferred hasher."""
+    if raw_password is None:
+        return make_password(None)
+
+    return _run_hashing(make_password, raw_password)
+
+
+def _check(raw_password, encoded):
+    outdated=[]
+    is_correct=check_password(raw_password, encoded, outdated.append)
+
+    return is_correct, bool(outdated)
+
+
+def verify_password(user, raw_password):
+    """checks raw_password against the password of user.
+
+    a correct password stored with another hasher or cost is rehashed with
+    the preferred one and saved, on this thread, as django does on login.
+    """
+    is_correct, outdated=_run_hashing(_check, raw_password, user.password)
+
+    if is_correct and outdated:
+        user.set_password(raw_password)
+        user._password=None
+        user.save(update_fields=['password'])
+
+    return is_correct
+
+
+def collect_hashing_metrics(prefix):
+    """returns the exposition lines of the hashing pool."""
+    pool=_hashing_pool
+
+    if pool is None:
+        return []
+
+    metrics=[
+        ('password_hashing_in_flight', 'gauge', 'Hashes running or queued.', pool.in_flight),
+        ('password_hashing_workers', 'gauge', 'Hashing threads.', pool.workers),
+        ('password_hashes_total', 'counter', 'Hashes computed.', pool.hashes),
+        ('password_hashing_rejected_total', 'counter', 'Hashes turned away by a full queue.',
+         pool.rejected),
+        ('password_hashing_wait_seconds_total', 'counter', 'Time hashes waited for a thread.',
+         pool.wait_time),
+        ('password_hashing_seconds_total', 'counter', 'Time spent hashing.', pool.hash_time),
+    ]
+    lines=[]
+
+    for name, kind, description, value in metrics:
+        lines+=[f'# HELP {prefix}_{name} {description}', f'# TYPE {prefix}_{name} {kind}',
+                f'{prefix}_{name} {value}']
+
+    return lines
+
+
+metrics_registry.add_collector(collect_hashing_metrics)
@@ -0,0 +1,24 @@
+"""signal handlers for user app"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import AuthToken
+from .authentication import get_token_cache
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """drops a deleted token from the token cache."""
+    get_token_cache().delete(instance.digest)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """drops cached tokens of a changed or deactivated user."""
+    if created:
+        return
+
+    cache=get_token_cache()
+
+    for digest in AuthToken.objects.filter(user=instance).values_list('digest', flat=True):
+        cache.delete(digest)
@@ -0,0 +1,294 @@
+"""tests for cached token authentication"""
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from core.models import AuthToken
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from unittest.mock import patch
+import io
+from user.authentication import (
+    CachedTokenAuthentication,
+    LRUTokenCache,
+    DjangoTokenCache,
+    get_token_cache,
+    reset_token_cache,
+    token_cache_metrics,
+)
+
+MYACCOUNT_URL = reverse('user:myaccount')
+ROTATE_URL = reverse('user:token-rotate')
+
+
+class TestLRUTokenCache(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        """test the oldest unused entry is dropped when the cache is full"""
+        cache=LRUTokenCache(max_size=2, ttl=60)
+
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_evicts_down_to_max_bytes(self):
+        """test the oldest entries are dropped once values exceed max_bytes"""
+        cache=LRUTokenCache(max_size=10, ttl=60, max_bytes=2500)
+
+        cache.set('a', b'x' * 1000)
+        cache.set('b', b'x' * 1000)
+        cache.set('a', b'x' * 1000)
+        cache.set('c', b'x' * 1000)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.size_bytes, 2500)
+
+        cache.delete('a')
+        cache.delete('c')
+        self.assertEqual(cache.size_bytes, 0)
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """test entries are not served after their time to live"""
+        cache=LRUTokenCache(max_size=2, ttl=60)
+
+        monotonic.return_value=100
+        cache.set('a', 1)
+
+        monotonic.return_value=159
+        self.assertEqual(cache.get('a'), 1)
+
+        monotonic.return_value=160
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class TestCachedTokenAuthentication(TestCase):
+
+    def setUp(self):
+        reset_token_cache()
+
+        self.user=get_user_model().objects.create(
+            email='tokenuser@email.com',
+            password='tokenuserpass',
+            name='token user',
+        )
+        self.token, self.key=AuthToken.objects.create_token(self.user)
+
+        self.client=APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def tearDown(self):
+        reset_token_cache()
+
+    def test_second_request_served_from_cache(self):
+        """test the token is looked up in the database only once"""
+        with self.assertNumQueries(1):
+            response=self.client.get(MYACCOUNT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response=self.client.get(MYACCOUNT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+        self.assertEqual(token_cache_metrics.as_dict(),
+                         {'hits':1, 'misses':1, 'hit_ratio':0.5})
+
+    def test_invalid_token_not_cached(self):
+        """test unknown tokens are rejected on every request"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+
+        for _ in range(2):
+            response=self.client.get(MYACCOUNT_URL)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.assertEqual(token_cache_metrics.hits, 0)
+
+    def test_deleted_token_invalidated(self):
+        """test a deleted token stops authenticating"""
+        self.client.get(MYACCOUNT_URL)
+
+        self.token.delete()
+
+        response=self.client.get(MYACCOUNT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """test a deactivated users cached token stops authenticating"""
+        self.client.get(MYACCOUNT_URL)
+
+        self.user.is_active=False
+        self.user.save()
+
+        response=self.client.get(MYACCOUNT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_account_update_invalidated(self):
+        """test updating the account refreshes the cached user"""
+        self.client.get(MYACCOUNT_URL)
+
+        response=self.client.patch(MYACCOUNT_URL, {'name':'new name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response=self.client.get(MYACCOUNT_URL)
+        self.assertEqual(response.data['name'], 'new name')
+
+    @override_settings(TOKEN_AUTH_CACHE={'BACKEND':'django', 'TTL':60},
+                       CACHES={'default':{
+                           'BACKEND':'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_django_cache_backend(self):
+        """test the token cache can be kept in a django cache"""
+        reset_token_cache()
+        self.assertIsInstance(get_token_cache(), DjangoTokenCache)
+
+        self.client.get(MYACCOUNT_URL)
+
+        with self.assertNumQueries(0):
+            response=self.client.get(MYACCOUNT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_async_authentication(self):
+        """test the async path resolves and caches tokens like the sync one"""
+        authentication=CachedTokenAuthentication()
+        factory=RequestFactory()
+
+        request=factory.get(MYACCOUNT_URL, HTTP_AUTHORIZATION=f'Token {self.key}')
+        user, token=await authentication.aauthenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+
+        user, token=await authentication.aauthenticate(request)
+        self.assertEqual(token.pk, self.token.pk)
+        self.assertEqual(token_cache_metrics.as_dict(),
+                         {'hits':1, 'misses':1, 'hit_ratio':0.5})
+
+    async def test_async_authentication_rejects_bad_tokens(self):
+        """test bad or missing tokens are left to the sync path"""
+        authentication=CachedTokenAuthentication()
+        factory=RequestFactory()
+
+        for header in ('Token unknown', 'Token', 'Bearer x', ''):
+            request=factory.get(MYACCOUNT_URL, HTTP_AUTHORIZATION=header)
+            self.assertIsNone(await authentication.aauthenticate(request))
+
+
+class TestAuthTokens(TestCase):
+
+    def setUp(self):
+        reset_token_cache()
+        self.addCleanup(reset_token_cache)
+
+        self.user=get_user_model().objects.create(
+            email='expiring@email.com',
+            password='expiringpass',
+        )
+        self.token, self.key=AuthToken.objects.create_token(self.user)
+
+        self.client=APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def test_only_digest_is_stored(self):
+        self.assertEqual(len(self.key), 40)
+        self.assertFalse(AuthToken.objects.filter(digest=self.key).exists())
+        self.assertNotIn(self.key, str(AuthToken.objects.values().get()))
+
+    def test_expired_token_rejected(self):
+        """test an expired token stops authenticating, even from the cache"""
+        self.client.get(MYACCOUNT_URL)
+
+        with patch('user.authentication.timezone.now',
+                   return_value=self.token.expires + timedelta(seconds=1)):
+            response=self.client.get(MYACCOUNT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKENS={'TTL':3600, 'MAX_AGE':86400, 'TOUCH_INTERVAL':600})
+    def test_last_used_written_once_per_interval(self):
+        """test use slides the expiry, saving it at most once per interval"""
+        token, key=AuthToken.objects.create_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        self.client.get(MYACCOUNT_URL)
+
+        later=token.created + timedelta(seconds=300)
+        with patch('user.authentication.timezone.now', return_value=later), \
+                self.assertNumQueries(0):
+            self.client.get(MYACCOUNT_URL)
+
+        later=token.created + timedelta(seconds=900)
+        with patch('user.authentication.timezone.now', return_value=later), \
+                self.assertNumQueries(1):
+            self.client.get(MYACCOUNT_URL)
+
+        token.refresh_from_db()
+        self.assertEqual(token.last_used, later)
+        self.assertEqual(token.expires, later + timedelta(seconds=3600))
+
+    @override_settings(AUTH_TOKENS={'TTL':3600, 'MAX_AGE':86400, 'TOUCH_INTERVAL':600})
+    def test_token_revoked_elsewhere_rejected_on_touch(self):
+        """test a token deleted by another process fails once its use is saved"""
+        token, key=AuthToken.objects.create_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        self.client.get(MYACCOUNT_URL)
+
+        # the deleting process only evicts the token from its own cache
+        with patch('user.signals.get_token_cache', return_value=LRUTokenCache()):
+            token.delete()
+
+        later=token.created + timedelta(seconds=900)
+        with patch('user.authentication.timezone.now', return_value=later):
+            response=self.client.get(MYACCOUNT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(get_token_cache().get(token.digest))
+
+    @override_settings(AUTH_TOKENS={'TTL':3600, 'MAX_AGE':5400, 'TOUCH_INTERVAL':600})
+    def test_expiry_capped_by_max_age(self):
+        token, key=AuthToken.objects.create_token(self.user)
+
+        touch=token.get_touch(token.created + timedelta(seconds=3000))
+
+        self.assertEqual(touch['expires'], token.created + timedelta(seconds=5400))
+
+    def test_rotate_token(self):
+        """test rotation issues a new token and revokes the old one"""
+        self.client.get(MYACCOUNT_URL)
+
+        response=self.client.post(ROTATE_URL)
+        key=response.data['token']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(key, self.key)
+        self.assertFalse(AuthToken.objects.filter(pk=self.token.pk).exists())
+
+        response=self.client.get(MYACCOUNT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        response=self.client.get(MYACCOUNT_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_clear_expired_tokens(self):
+        """test the cleanup deletes expired tokens in batches"""
+        past=timezone.now() - timedelta(days=1)
+        AuthToken.objects.bulk_create([
+            AuthToken(user=self.user, digest=f'{index:064x}', created=past,
+                      last_used=past, expires=past)
+            for index in range(5)
+        ])
+        out=io.StringIO()
+
+        call_command('cleartokens', batch_size=2, stdout=out)
+
+        self.assertIn('deleted 5 expired tokens', out.getvalue())
+        self.assertEqual(list(AuthToken.objects.values_list('pk', flat=True)), [self.token.pk])
+
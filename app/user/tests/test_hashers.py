@@ -0,0 +1,112 @@
+"""tests for password hashing off request threads"""
+from django.test import SimpleTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, is_password_usable
+from user.hashers import (HashingUnavailable, PasswordHashingPool, TunedArgon2PasswordHasher,
+                          get_hashing_pool, hash_password, reset_hashing_pool,
+                          verify_password)
+from unittest.mock import patch
+import threading
+
+
+SCRYPT_HASHERS=['user.hashers.TunedScryptPasswordHasher',
+                'django.contrib.auth.hashers.PBKDF2PasswordHasher']
+
+FAST_SCRYPT={'SCRYPT_WORK_FACTOR':2 ** 10, 'WORKERS':1, 'QUEUE_SIZE':1, 'TIMEOUT':1}
+
+
+class TestPasswordHashingPool(SimpleTestCase):
+
+    def test_runs_on_worker_thread(self):
+        pool=PasswordHashingPool(workers=1)
+        self.addCleanup(pool.shutdown)
+
+        name=pool.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('password-hashing'))
+        self.assertEqual(pool.hashes, 1)
+        self.assertEqual(pool.in_flight, 0)
+
+    def test_rejects_when_queue_is_full(self):
+        pool=PasswordHashingPool(workers=1, queue_size=0, timeout=0.01)
+        self.addCleanup(pool.shutdown)
+        started, release=threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread=threading.Thread(target=pool.run, args=[block])
+        thread.start()
+        started.wait(5)
+
+        try:
+            with self.assertRaises(HashingUnavailable):
+                pool.run(lambda: None)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(pool.rejected, 1)
+
+
+@override_settings(PASSWORD_HASHERS=SCRYPT_HASHERS, PASSWORD_HASHING=FAST_SCRYPT)
+class TestPasswordHashing(SimpleTestCase):
+
+    def setUp(self):
+        reset_hashing_pool()
+        self.addCleanup(reset_hashing_pool)
+
+    def test_hash_password_uses_pool(self):
+        encoded=hash_password('secret-password')
+
+        self.assertTrue(encoded.startswith('scrypt$1024$'))
+        self.assertEqual(get_hashing_pool().hashes, 1)
+
+    def test_hash_none_is_unusable(self):
+        self.assertFalse(is_password_usable(hash_password(None)))
+
+    @override_settings(PASSWORD_HASHING={**FAST_SCRYPT, 'WORKERS':0})
+    def test_without_workers_hashes_inline(self):
+        self.assertIsNone(get_hashing_pool())
+        self.assertTrue(hash_password('secret-password').startswith('scrypt$'))
+
+    def test_user_password_round_trip(self):
+        user=get_user_model()(email='user@example.com')
+        user.set_password('secret-password')
+
+        with patch.object(user, 'save') as save:
+            self.assertTrue(user.check_password('secret-password'))
+            self.assertFalse(user.check_password('wrong-password'))
+
+        save.assert_not_called()
+
+    def test_outdated_password_is_rehashed(self):
+        """test a correct password of an older hasher is saved with the preferred one"""
+        user=get_user_model()(email='user@example.com')
+        user.password=get_hasher('pbkdf2_sha256').encode('secret-password', 'salt')
+
+        with patch.object(user, 'save') as save:
+            self.assertTrue(verify_password(user, 'secret-password'))
+
+        save.assert_called_once_with(update_fields=['password'])
+        self.assertTrue(user.password.startswith('scrypt$1024$'))
+
+    def test_changed_cost_is_rehashed(self):
+        user=get_user_model()(email='user@example.com')
+        user.set_password('secret-password')
+
+        with override_settings(PASSWORD_HASHING={**FAST_SCRYPT, 'SCRYPT_WORK_FACTOR':2 ** 11}), \
+                patch.object(user, 'save') as save:
+            self.assertTrue(user.check_password('secret-password'))
+
+        save.assert_called_once()
+        self.assertTrue(user.password.startswith('scrypt$2048$'))
+
+    @override_settings(PASSWORD_HASHING={'ARGON2_TIME_COST':3, 'ARGON2_MEMORY_COST':1024,
+                                         'ARGON2_PARALLELISM':2})
+    def test_argon2_cost_from_settings(self):
+        hasher=TunedArgon2PasswordHasher()
+
+        self.assertEqual((hasher.time_cost, hasher.memory_cost, hasher.parallelism),
+                         (3, 1024, 2))
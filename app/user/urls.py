@@ -6,5 +6,6 @@ app_name='user'
 urlpatterns=(
     path('create/', views.CreateUserApi.as_view(), name='create'),
     path('token/',views.CreateAuthTokenApi.as_view(), name='token'),
+    path('token/rotate/', views.RotateAuthTokenApi.as_view(), name='token-rotate'),
     path('myaccount/', views.ManageUserApi.as_view(), name='myaccount'),
 )
\ No newline at end of file
@@ -1,25 +1,54 @@
-from rest_framework import generics, authentication, permissions
+from django.db import transaction
+from rest_framework import generics, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .serializers import UserSerializer, TokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
-class CreateUserApi(generics.CreateAPIView):
+from .authentication import CachedTokenAuthentication
+from core.metrics import InstrumentedViewMixin
+from core.models import AuthToken
+
+class CreateUserApi(InstrumentedViewMixin, generics.CreateAPIView):
     """creating user api endpoint"""
     serializer_class=UserSerializer
 
-class CreateAuthTokenApi(ObtainAuthToken):
+class CreateAuthTokenApi(InstrumentedViewMixin, ObtainAuthToken):
     """creates auth token for user"""
     serializer_class=TokenSerializer
     renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES
 
-class ManageUserApi(generics.RetrieveUpdateAPIView):
+    def post(self, request, *args, **kwargs):
+        """issues a new expiring token, its key is only ever shown here"""
+        serializer=self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token, key=AuthToken.objects.create_token(serializer.validated_data['user'])
+
+        return Response({'token':key, 'expires':token.expires})
+
+class RotateAuthTokenApi(InstrumentedViewMixin, APIView):
+    """replaces the token of the request with a new one"""
+    authentication_classes=[CachedTokenAuthentication]
+    permission_classes=[permissions.IsAuthenticated]
+
+    def post(self, request):
+        """issues a new token and revokes the one used for this request"""
+        with transaction.atomic():
+            token, key=AuthToken.objects.create_token(request.user)
+            request.auth.delete()
+
+        return Response({'token':key, 'expires':token.expires})
+
+class ManageUserApi(InstrumentedViewMixin, generics.RetrieveUpdateAPIView):
     """api view for updating and getting authenticated users info"""
 
     serializer_class=UserSerializer
-    authentication_classes=[authentication.TokenAuthentication]
+    authentication_classes=[CachedTokenAuthentication]
     permission_classes=[permissions.IsAuthenticated]
 
     def get_object(self):
         """returns the authenticated user"""
         return self.request.user
     
-    
\ No newline at end of file
+    